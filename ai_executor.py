@@ -0,0 +1,184 @@
+import os
+import queue
+import logging
+import threading
+from time import monotonic
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+# AI call concurrency configuration
+AI_MAX_CONCURRENCY = int(os.environ.get("AI_MAX_CONCURRENCY", "8"))
+AI_MAX_QUEUE = int(os.environ.get("AI_MAX_QUEUE", "16"))
+AI_CALL_TIMEOUT = float(os.environ.get("AI_CALL_TIMEOUT", "30"))
+AI_RETRY_AFTER = int(os.environ.get("AI_RETRY_AFTER", "5"))
+# Streaming calls: longest gap between chunks and longest whole stream
+AI_STREAM_IDLE_TIMEOUT = float(os.environ.get("AI_STREAM_IDLE_TIMEOUT", "30"))
+AI_STREAM_TIMEOUT = float(os.environ.get("AI_STREAM_TIMEOUT", "120"))
+
+_STREAM_END = object()
+
+
+class AIOverloadedError(Exception):
+    """Raised when the AI call queue is full and the request should be retried later"""
+
+    def __init__(self, retry_after=AI_RETRY_AFTER):
+        super().__init__('AI service is busy, please retry later')
+        self.retry_after = retry_after
+
+
+class AITimeoutError(Exception):
+    """Raised when an AI call does not finish within its timeout"""
+
+
+class AIExecutor:
+    """
+    Shared executor for upstream AI calls.
+
+    At most max_concurrency calls run at once and at most max_queue more may
+    wait for a slot; anything beyond that is rejected immediately with
+    AIOverloadedError instead of tying up another request thread.
+    """
+
+    def __init__(self, max_concurrency=AI_MAX_CONCURRENCY, max_queue=AI_MAX_QUEUE, timeout=AI_CALL_TIMEOUT):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='ai-call')
+        self._admission = threading.BoundedSemaphore(max_concurrency + max_queue)
+        self._running = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self.admitted = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def call(self, fn, *args, timeout=None, **kwargs):
+        """Run fn on the executor and wait for its result"""
+        timeout = self.timeout if timeout is None else timeout
+        self._admit()
+        try:
+            future = self._executor.submit(self._run, fn, args, kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # A call still queued is dropped and gives its admission back;
+            # a running one keeps its slot until the upstream request returns
+            if future.cancel():
+                self._release()
+            with self._lock:
+                self.timeouts += 1
+            raise AITimeoutError(f'AI call timed out after {timeout}s')
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold a concurrency slot in the calling thread, e.g. while streaming"""
+        timeout = self.timeout if timeout is None else timeout
+        self._admit()
+        try:
+            if not self._running.acquire(timeout=timeout):
+                with self._lock:
+                    self.timeouts += 1
+                raise AITimeoutError(f'No AI slot available after {timeout}s')
+            try:
+                with self._lock:
+                    self.active += 1
+                yield
+            finally:
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                self._running.release()
+        finally:
+            self._release()
+
+    def stream(self, fn, *args, idle_timeout=AI_STREAM_IDLE_TIMEOUT, deadline=AI_STREAM_TIMEOUT, **kwargs):
+        """
+        Iterate the chunks of a streaming call while holding a slot. The
+        stream is read on a helper thread so a stalled upstream cannot hold
+        the slot: AITimeoutError is raised, and the slot released, when no
+        chunk arrives for idle_timeout seconds or the stream outlasts deadline.
+        """
+        with self.slot():
+            chunks = queue.Queue()
+            stopped = threading.Event()
+
+            def read():
+                try:
+                    for chunk in fn(*args, **kwargs):
+                        if stopped.is_set():
+                            return
+                        chunks.put((chunk, None))
+                    chunks.put((_STREAM_END, None))
+                except Exception as e:
+                    chunks.put((None, e))
+
+            threading.Thread(target=read, name='ai-stream', daemon=True).start()
+            ends_at = monotonic() + deadline
+            try:
+                while True:
+                    remaining = ends_at - monotonic()
+                    try:
+                        chunk, error = chunks.get(timeout=max(0.0, min(idle_timeout, remaining)))
+                    except queue.Empty:
+                        with self._lock:
+                            self.timeouts += 1
+                        if remaining <= idle_timeout:
+                            raise AITimeoutError(f'AI stream did not finish within {deadline}s')
+                        raise AITimeoutError(f'AI stream stalled for {idle_timeout}s')
+                    if error is not None:
+                        raise error
+                    if chunk is _STREAM_END:
+                        return
+                    yield chunk
+            finally:
+                # An abandoned reader drops whatever the upstream still sends
+                stopped.set()
+
+    def stats(self):
+        """Return concurrency and queue counters"""
+        with self._lock:
+            return {
+                'max_concurrency': self.max_concurrency,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'queued': self.admitted - self.active,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'timeouts': self.timeouts
+            }
+
+    def _admit(self):
+        if not self._admission.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            logging.warning("AI call rejected: concurrency and queue limits reached")
+            raise AIOverloadedError()
+        with self._lock:
+            self.admitted += 1
+
+    def _release(self):
+        with self._lock:
+            self.admitted -= 1
+        self._admission.release()
+
+    def _run(self, fn, args, kwargs):
+        try:
+            with self._running:
+                with self._lock:
+                    self.active += 1
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    with self._lock:
+                        self.active -= 1
+                        self.completed += 1
+        finally:
+            self._release()
+
+
+ai_executor = AIExecutor()
@@ -1,25 +1,53 @@
 import os
 import json
 import logging
-import pytesseract
-from PIL import Image
 import re
 import requests
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from translation_cache import translation_cache, make_cache_key, normalize_text
+from language_detect import detect_script_language
+from ai_executor import ai_executor, AIOverloadedError, AITimeoutError, AI_STREAM_TIMEOUT
+from metrics import metrics
+from singleflight import coalesce
+from emergency import is_emergency, emergency_guidance
+from ocr_service import ocr_service
+from text_extraction import extract_medications, extract_dosages, extract_frequencies, extract_suggestions as extract_text_suggestions
 
-try:
-    import google.generativeai as genai
-    # Google Gemini AI configuration
-    GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
-    if GOOGLE_API_KEY:
-        genai.configure(api_key=GOOGLE_API_KEY)
-        model = genai.GenerativeModel('gemini-1.5-flash')
-    else:
-        model = None
+# Google Gemini AI configuration. The client library takes most of a second
+# to import, so it is loaded and configured on first use (see get_model).
+GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY")
+GEMINI_MODEL = 'gemini-1.5-flash'
+
+_model = None
+_model_loaded = False
+_model_lock = threading.Lock()
+
+def get_model():
+    """Return the Gemini model, importing and configuring it on first use; None when unavailable"""
+    global _model, _model_loaded
+    if _model_loaded:
+        return _model
+
+    with _model_lock:
+        if not _model_loaded:
+            _model = _load_model()
+            _model_loaded = True
+    return _model
+
+def _load_model():
+    if not GOOGLE_API_KEY:
         logging.warning("GOOGLE_API_KEY not found")
-except ImportError:
-    logging.error("Google Generative AI package not installed")
-    model = None
+        return None
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        logging.error("Google Generative AI package not installed")
+        return None
+    genai.configure(api_key=GOOGLE_API_KEY)
+    return genai.GenerativeModel(GEMINI_MODEL)
 
 # Enhanced language mapping with more Indian languages
 LANGUAGE_MAPPING = {
@@ -38,12 +66,59 @@ LANGUAGE_MAPPING = {
     'ur': 'Urdu (اردو)'
 }
 
+# Chatbot replies when Gemini is not configured or fails
+UNAVAILABLE_RESPONSES = {
+    'en': "I'm currently unavailable. For medical emergencies, call 108 immediately. For non-urgent care, please consult a healthcare professional.",
+    'hi': "मैं अभी उपलब्ध नहीं हूं। चिकित्सा आपातकाल के लिए, तुरंत 108 पर कॉल करें। गैर-जरूरी देखभाल के लिए, कृपया एक स्वास्थ्य पेशेवर से सलाह लें।"
+}
+
+FALLBACK_RESPONSES = {
+    'en': "I'm having technical difficulties. For medical emergencies, call 108. For other health concerns, please consult a healthcare professional.",
+    'hi': "मुझे तकनीकी समस्या हो रही है। चिकित्सा आपातकाल के लिए 108 पर कॉल करें। अन्य स्वास्थ्य चिंताओं के लिए, कृपया एक स्वास्थ्य पेशेवर से सलाह लें।"
+}
+
+# Approximate prompt token budget for one batched translation call
+BATCH_TOKEN_BUDGET = int(os.environ.get("BATCH_TOKEN_BUDGET", "2000"))
+
+# Per-item calls allowed for texts a batch response left out, per translate_batch
+BATCH_MAX_ITEM_RETRIES = int(os.environ.get("BATCH_MAX_ITEM_RETRIES", "5"))
+
+# Local language detection below this confidence falls back to Gemini
+LANGUAGE_DETECT_MIN_CONFIDENCE = float(os.environ.get("LANGUAGE_DETECT_MIN_CONFIDENCE", "0.8"))
+
+# Worker pool size for multi-language fan-out translation
+FANOUT_MAX_WORKERS = int(os.environ.get("FANOUT_MAX_WORKERS", "6"))
+
+def generate_content(prompt, function='other', **kwargs):
+    """
+    Call Gemini through the shared AI executor (bounded concurrency and
+    timeout); function labels the call's latency and error metrics
+    """
+    with metrics.ai_call(function):
+        return ai_executor.call(get_model().generate_content, prompt, **kwargs)
+
+def _translation_key(text, source_lang='en', target_lang='hi'):
+    return make_cache_key(text, source_lang, target_lang)
+
+def _chat_key(message, language='en', context=None):
+    return (normalize_text(message).casefold(), language, normalize_text(context or ''))
+
+def _detection_key(text):
+    return normalize_text(text)
+
+@coalesce('translate', _translation_key)
 def translate_text(text, source_lang='en', target_lang='hi'):
     """
     Enhanced translate text using Google Gemini with medical context awareness
     """
     try:
-        if not model:
+        # Serve repeated phrases from the cache without a Gemini round trip
+        if text and text.strip():
+            cached = translation_cache.get(text, source_lang, target_lang)
+            if cached is not None:
+                return cached
+
+        if not get_model():
             return {
                 'error': 'Translation service unavailable',
                 'translated_text': f"Service unavailable. Original text: {text}",
@@ -80,13 +155,13 @@ def translate_text(text, source_lang='en', target_lang='hi'):
         Important: Provide ONLY the translation without explanations, prefixes, or additional text.
         """
         
-        response = model.generate_content(prompt)
+        response = generate_content(prompt, function='translate')
         translated_text = response.text.strip()
         
         # Remove any quotation marks or extra formatting
         translated_text = translated_text.strip('"\'')
         
-        return {
+        result = {
             'translated_text': translated_text,
             'source_lang': source_lang,
             'target_lang': target_lang,
@@ -95,7 +170,12 @@ def translate_text(text, source_lang='en', target_lang='hi'):
             'confidence': 'high',
             'timestamp': datetime.now().isoformat()
         }
+        translation_cache.put(text, source_lang, target_lang, result)
+        
+        return result
     
+    except AIOverloadedError:
+        raise
     except Exception as e:
         logging.error(f"Translation error: {str(e)}")
         return {
@@ -104,18 +184,261 @@ def translate_text(text, source_lang='en', target_lang='hi'):
             'needs_api_key': 'GOOGLE_API_KEY' in str(e)
         }
 
+def estimate_tokens(text):
+    """Rough token estimate used for prompt budgeting (about 4 chars per token)"""
+    return len(text or '') // 4 + 1
+
+def split_batches(items, token_budget=None):
+    """Split (index, text) pairs into batches that fit the token budget"""
+    token_budget = token_budget or BATCH_TOKEN_BUDGET
+    batches = []
+    current = []
+    current_tokens = 0
+    
+    for index, text in items:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > token_budget:
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, text))
+        current_tokens += tokens
+    
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_numbered_json(response_text):
+    """Parse a {"1": "...", "2": "..."} style model response"""
+    cleaned = response_text.strip()
+    if cleaned.startswith('```'):
+        cleaned = re.sub(r'^```(?:json)?\s*|\s*```$', '', cleaned)
+    
+    data = json.loads(cleaned)
+    if isinstance(data, list):
+        data = {str(item.get('id')): item.get('translation') for item in data if isinstance(item, dict)}
+    if not isinstance(data, dict):
+        return {}
+    
+    return {str(key).strip(): value for key, value in data.items() if isinstance(value, str) and value.strip()}
+
+def _translate_batch_call(batch, source_name, target_name):
+    """Translate one batch of (index, text) pairs with a single Gemini call"""
+    numbered = {str(position): text for position, (_, text) in enumerate(batch, 1)}
+    
+    prompt = f"""
+    You are an expert medical translator specializing in healthcare communication for Indian users.
+    
+    Task: Translate each numbered {source_name} text below to {target_name}
+    
+    Guidelines:
+    - Maintain medical accuracy while using simple, clear language
+    - Use terms that rural and urban users can understand
+    - Preserve medical terminology context
+    - Ensure cultural sensitivity in medical contexts
+    - Translate every item independently
+    
+    Texts to translate (JSON object of number to text):
+    {json.dumps(numbered, ensure_ascii=False)}
+    
+    Important: Return ONLY a valid JSON object mapping each number to its translation, e.g. {{"1": "...", "2": "..."}}.
+    """
+    
+    response = generate_content(prompt, function='translate')
+    try:
+        translations = parse_numbered_json(response.text)
+    except (ValueError, AttributeError):
+        logging.warning("Batch translation returned invalid JSON, falling back to per-item calls")
+        translations = {}
+    
+    return {index: translations[str(position)].strip().strip('"\'')
+            for position, (index, _) in enumerate(batch, 1)
+            if str(position) in translations}
+
+def translate_batch(texts, source_lang='en', target_lang='hi'):
+    """
+    Translate many texts with as few Gemini calls as possible.
+    Cache hits are served locally, the rest are packed into numbered JSON
+    prompts, and up to BATCH_MAX_ITEM_RETRIES items the model drops are
+    retried one by one. A batch call that fails is retried once (not after
+    a timeout); if it fails again its items get an error result.
+    """
+    results = [None] * len(texts)
+    pending = []
+    
+    for index, text in enumerate(texts):
+        if not text or not text.strip():
+            results[index] = {
+                'error': 'Empty text provided',
+                'translated_text': '',
+                'needs_api_key': False
+            }
+            continue
+        
+        cached = translation_cache.get(text, source_lang, target_lang)
+        if cached is not None:
+            results[index] = cached
+        else:
+            pending.append((index, text))
+    
+    if not pending:
+        return results
+    
+    if not get_model():
+        for index, text in pending:
+            results[index] = translate_text(text, source_lang, target_lang)
+        return results
+    
+    source_name = LANGUAGE_MAPPING.get(source_lang, 'English')
+    target_name = LANGUAGE_MAPPING.get(target_lang, 'Hindi')
+    
+    item_retries = BATCH_MAX_ITEM_RETRIES
+    for batch in split_batches(pending):
+        translations = None
+        for _ in range(2):
+            try:
+                translations = _translate_batch_call(batch, source_name, target_name)
+                break
+            except AIOverloadedError:
+                raise
+            except Exception as e:
+                logging.error(f"Batch translation error: {str(e)}")
+                if isinstance(e, AITimeoutError):
+                    break
+        
+        for index, text in batch:
+            if translations is None:
+                results[index] = {
+                    'error': 'Translation failed',
+                    'translated_text': '',
+                    'needs_api_key': False
+                }
+                continue
+            if index not in translations:
+                if item_retries <= 0:
+                    results[index] = {
+                        'error': 'Translation incomplete, please retry',
+                        'translated_text': '',
+                        'needs_api_key': False
+                    }
+                    continue
+                # The model dropped this item, translate it on its own
+                item_retries -= 1
+                results[index] = translate_text(text, source_lang, target_lang)
+                continue
+            
+            result = {
+                'translated_text': translations[index],
+                'source_lang': source_lang,
+                'target_lang': target_lang,
+                'source_name': source_name,
+                'target_name': target_name,
+                'confidence': 'high',
+                'timestamp': datetime.now().isoformat()
+            }
+            translation_cache.put(text, source_lang, target_lang, result)
+            results[index] = result
+    
+    return results
+
+def iter_translate_fanout(text, source_lang='en', target_langs=None, max_workers=None):
+    """
+    Translate one text into several target languages concurrently.
+    Yields each language's result as soon as it completes, with its latency.
+    """
+    if target_langs is None:
+        target_langs = [code for code in LANGUAGE_MAPPING if code != source_lang]
+    target_langs = list(dict.fromkeys(target_langs))
+    if not target_langs:
+        return
+    
+    def timed_translate(target_lang):
+        started = time.perf_counter()
+        result = translate_text(text, source_lang, target_lang)
+        result['latency_ms'] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+    
+    workers = min(max_workers or FANOUT_MAX_WORKERS, len(target_langs))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='fanout') as executor:
+        futures = {executor.submit(timed_translate, lang): lang for lang in target_langs}
+        for future in as_completed(futures):
+            target_lang = futures[future]
+            try:
+                result = future.result()
+            except AIOverloadedError as e:
+                result = {
+                    'error': 'Translation service busy',
+                    'translated_text': '',
+                    'needs_api_key': False,
+                    'retry_after': e.retry_after
+                }
+            except Exception as e:
+                logging.error(f"Fan-out translation error for {target_lang}: {str(e)}")
+                result = {
+                    'error': 'Translation failed',
+                    'translated_text': '',
+                    'needs_api_key': False
+                }
+            result['target_lang'] = target_lang
+            yield target_lang, result
+
+def translate_fanout(text, source_lang='en', target_langs=None, max_workers=None):
+    """Translate one text into several languages and return all results by language code"""
+    started = time.perf_counter()
+    results = dict(iter_translate_fanout(text, source_lang, target_langs, max_workers))
+    return {
+        'results': results,
+        'wall_time_ms': round((time.perf_counter() - started) * 1000, 2)
+    }
+
+def build_chat_prompt(message, language='en', context=None):
+    """Build the MediBot prompt for a user message"""
+    # Language-specific response instructions
+    lang_instruction = ""
+    if language == 'hi':
+        lang_instruction = "Respond in Hindi (Devanagari script) using simple, clear language. "
+    elif language != 'en':
+        lang_name = LANGUAGE_MAPPING.get(language, 'the user language')
+        lang_instruction = f"Respond in {lang_name} using simple, clear language. "
+    else:
+        lang_instruction = "Respond in English using simple, clear language. "
+    
+    # Context-aware prompt
+    context_info = ""
+    if context:
+        context_info = f"Previous conversation context: {context}\n\n"
+    
+    return f"""
+    You are MediBot, an AI healthcare assistant designed for Indian users, especially those in rural areas.
+    
+    {lang_instruction}
+    
+    {context_info}Guidelines:
+    - Provide helpful, accurate medical information in simple language
+    - Always emphasize consulting healthcare professionals for diagnosis and treatment
+    - Be culturally sensitive and aware of Indian healthcare practices
+    - For symptoms, provide general guidance but stress professional consultation
+    - Offer practical home remedies when appropriate, with safety warnings
+    - Recognize emergency situations and advise immediate medical attention
+    - Use everyday language that people without medical background can understand
+    - Be empathetic and supportive in your tone
+    - Provide step-by-step instructions for basic health queries
+    - Include relevant dietary and lifestyle suggestions when appropriate
+    
+    IMPORTANT: You are not a replacement for professional medical advice. Always recommend consulting qualified healthcare providers.
+    
+    User message: {message}
+    """
+
+@coalesce('chat', _chat_key)
 def get_chatbot_response(message, language='en', context=None):
     """
     Enhanced healthcare chatbot response using Google Gemini
     """
     try:
-        if not model:
-            emergency_response = {
-                'en': "I'm currently unavailable. For medical emergencies, call 108 immediately. For non-urgent care, please consult a healthcare professional.",
-                'hi': "मैं अभी उपलब्ध नहीं हूं। चिकित्सा आपातकाल के लिए, तुरंत 108 पर कॉल करें। गैर-जरूरी देखभाल के लिए, कृपया एक स्वास्थ्य पेशेवर से सलाह लें।"
-            }
+        if not get_model():
             return {
-                'response': emergency_response.get(language, emergency_response['en']),
+                'response': UNAVAILABLE_RESPONSES.get(language, UNAVAILABLE_RESPONSES['en']),
                 'needs_api_key': True,
                 'emergency_detected': False
             }
@@ -127,53 +450,10 @@ def get_chatbot_response(message, language='en', context=None):
                 'emergency_detected': False
             }
         
-        # Enhanced emergency keyword detection
-        emergency_keywords = {
-            'en': ['emergency', 'urgent', 'help', 'pain', 'bleeding', 'chest pain', 'heart attack', 'stroke', 'unconscious', 'breathing problem', 'severe', 'critical'],
-            'hi': ['आपातकाल', 'जरूरी', 'मदद', 'दर्द', 'खून', 'सीने में दर्द', 'दिल का दौरा', 'स्ट्रोक', 'बेहोश', 'सांस की समस्या', 'गंभीर']
-        }
-        
-        emergency_detected = any(keyword.lower() in message.lower() 
-                               for keyword in emergency_keywords.get(language, emergency_keywords['en']))
-        
-        # Language-specific response instructions
-        lang_instruction = ""
-        if language == 'hi':
-            lang_instruction = "Respond in Hindi (Devanagari script) using simple, clear language. "
-        elif language != 'en':
-            lang_name = LANGUAGE_MAPPING.get(language, 'the user language')
-            lang_instruction = f"Respond in {lang_name} using simple, clear language. "
-        else:
-            lang_instruction = "Respond in English using simple, clear language. "
-        
-        # Context-aware prompt
-        context_info = ""
-        if context:
-            context_info = f"Previous conversation context: {context}\n\n"
-        
-        prompt = f"""
-        You are MediBot, an AI healthcare assistant designed for Indian users, especially those in rural areas.
-        
-        {lang_instruction}
-        
-        {context_info}Guidelines:
-        - Provide helpful, accurate medical information in simple language
-        - Always emphasize consulting healthcare professionals for diagnosis and treatment
-        - Be culturally sensitive and aware of Indian healthcare practices
-        - For symptoms, provide general guidance but stress professional consultation
-        - Offer practical home remedies when appropriate, with safety warnings
-        - Recognize emergency situations and advise immediate medical attention
-        - Use everyday language that people without medical background can understand
-        - Be empathetic and supportive in your tone
-        - Provide step-by-step instructions for basic health queries
-        - Include relevant dietary and lifestyle suggestions when appropriate
-        
-        IMPORTANT: You are not a replacement for professional medical advice. Always recommend consulting qualified healthcare providers.
+        emergency_detected = is_emergency(message)
+        prompt = build_chat_prompt(message, language, context)
         
-        User message: {message}
-        """
-        
-        response = model.generate_content(prompt)
+        response = generate_content(prompt, function='chat')
         bot_response = response.text.strip()
         
         return {
@@ -185,34 +465,125 @@ def get_chatbot_response(message, language='en', context=None):
             'suggestions': extract_suggestions(bot_response) if not emergency_detected else []
         }
     
+    except AIOverloadedError:
+        raise
     except Exception as e:
         logging.error(f"Chatbot error: {str(e)}")
-        fallback_responses = {
-            'en': "I'm having technical difficulties. For medical emergencies, call 108. For other health concerns, please consult a healthcare professional.",
-            'hi': "मुझे तकनीकी समस्या हो रही है। चिकित्सा आपातकाल के लिए 108 पर कॉल करें। अन्य स्वास्थ्य चिंताओं के लिए, कृपया एक स्वास्थ्य पेशेवर से सलाह लें।"
-        }
         return {
-            'response': fallback_responses.get(language, fallback_responses['en']),
+            'response': FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSES['en']),
             'needs_api_key': 'GOOGLE_API_KEY' in str(e),
             'emergency_detected': False,
             'error': str(e)
         }
 
-def extract_prescription_text(image_file):
+def stream_chatbot_response(message, language='en', context=None):
     """
-    Enhanced prescription text extraction using OCR and Google Gemini processing
+    Stream a healthcare chatbot response as a sequence of events.
+    The first event carries emergency detection (and 108 guidance) so it can be
+    shown before the model has produced anything, then 'token' events follow
+    and a final 'done' event carries the full response.
+    """
+    emergency_detected = is_emergency(message)
+    yield {
+        'event': 'meta',
+        'language': language,
+        'emergency_detected': emergency_detected,
+        'guidance': emergency_guidance(language) if emergency_detected else None
+    }
+    
+    if not get_model():
+        yield {
+            'event': 'error',
+            'response': UNAVAILABLE_RESPONSES.get(language, UNAVAILABLE_RESPONSES['en']),
+            'needs_api_key': True
+        }
+        return
+    
+    chunks = []
+    try:
+        prompt = build_chat_prompt(message, language, context)
+        with metrics.ai_call('chat'):
+            # The executor bounds stalls and total time; the request timeout
+            # also makes the SDK drop the upstream connection
+            for chunk in ai_executor.stream(get_model().generate_content, prompt, stream=True,
+                                            request_options={'timeout': AI_STREAM_TIMEOUT}):
+                text = getattr(chunk, 'text', '')
+                if text:
+                    chunks.append(text)
+                    yield {'event': 'token', 'text': text}
+    except AIOverloadedError as e:
+        yield {
+            'event': 'error',
+            'response': FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSES['en']),
+            'needs_api_key': False,
+            'retry_after': e.retry_after
+        }
+        return
+    except Exception as e:
+        logging.error(f"Chatbot streaming error: {str(e)}")
+        yield {
+            'event': 'error',
+            'response': FALLBACK_RESPONSES.get(language, FALLBACK_RESPONSES['en']),
+            'needs_api_key': 'GOOGLE_API_KEY' in str(e),
+            'partial_response': ''.join(chunks)
+        }
+        return
+    
+    bot_response = ''.join(chunks).strip()
+    yield {
+        'event': 'done',
+        'response': bot_response,
+        'language': language,
+        'emergency_detected': emergency_detected,
+        'confidence': 'high',
+        'timestamp': datetime.now().isoformat(),
+        'suggestions': extract_suggestions(bot_response) if not emergency_detected else []
+    }
+
+def ocr_error_result(error):
+    """Result returned when an image cannot be OCR'd"""
+    return {
+        'error': f'Failed to process prescription image: {str(error)}',
+        'raw_text': '',
+        'medications': [],
+        'dosages': [],
+        'instructions': 'Please try again with a clearer image or enter details manually.',
+        'confidence': 'low'
+    }
+
+def extract_prescription_text(image_file, timings=None):
+    """
+    Enhanced prescription text extraction using OCR and Google Gemini processing.
+    Accepts an uploaded file or image bytes; when a timings dict is given it
+    is filled with per-stage durations in milliseconds.
+    """
+    timings = {} if timings is None else timings
+    try:
+        # Preprocess and OCR on the worker pool
+        data = image_file.read() if hasattr(image_file, 'read') else image_file
+        started = time.perf_counter()
+        raw_text, preprocessing = ocr_service.ocr_image(data)
+        timings['ocr'] = round((time.perf_counter() - started) * 1000, 2)
+        timings['preprocessing'] = preprocessing['timings']
+        logging.debug(f"OCR preprocessing: {preprocessing}")
+    except AIOverloadedError:
+        raise
+    except Exception as e:
+        logging.error(f"OCR extraction error: {str(e)}")
+        return ocr_error_result(e)
+
+    started = time.perf_counter()
+    try:
+        return analyze_prescription_text(raw_text)
+    finally:
+        timings['analysis'] = round((time.perf_counter() - started) * 1000, 2)
+
+def analyze_prescription_text(raw_text):
+    """
+    Structure OCR text from a prescription with Gemini, falling back to
+    local extraction when the model is unavailable
     """
     try:
-        # Open and preprocess image
-        image = Image.open(image_file.stream)
-        
-        # Enhance image for better OCR
-        image = image.convert('RGB')
-        
-        # Use Tesseract OCR with enhanced configuration
-        custom_config = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,:-/() '
-        raw_text = pytesseract.image_to_string(image, lang='eng', config=custom_config)
-        
         if not raw_text.strip():
             return {
                 'error': 'No text could be extracted from the image. Please ensure the image is clear and contains readable text.',
@@ -223,14 +594,14 @@ def extract_prescription_text(image_file):
                 'confidence': 'low'
             }
         
-        if not model:
+        if not get_model():
             # Return enhanced OCR results if AI model is unavailable
             return {
                 'raw_text': raw_text,
                 'medications': extract_basic_medications(raw_text),
                 'dosages': extract_basic_dosages(raw_text),
                 'instructions': 'AI processing unavailable. Please review the extracted text manually.',
-                'frequency': [],
+                'frequency': extract_frequencies(raw_text),
                 'confidence': 'medium',
                 'needs_api_key': True
             }
@@ -265,7 +636,7 @@ def extract_prescription_text(image_file):
         Return only valid JSON without any additional text.
         """
         
-        response = model.generate_content(analysis_prompt)
+        response = generate_content(analysis_prompt, function='prescription')
         
         try:
             extracted_data = json.loads(response.text.strip())
@@ -289,16 +660,18 @@ def extract_prescription_text(image_file):
                 'medications': extract_basic_medications(raw_text),
                 'dosages': extract_basic_dosages(raw_text),
                 'instructions': response.text.strip(),
-                'frequency': [],
+                'frequency': extract_frequencies(raw_text),
                 'confidence': 'medium',
                 'processing_time': datetime.now().isoformat()
             }
     
+    except AIOverloadedError:
+        raise
     except Exception as e:
-        logging.error(f"OCR extraction error: {str(e)}")
+        logging.error(f"Prescription analysis error: {str(e)}")
         return {
-            'error': f'Failed to process prescription image: {str(e)}',
-            'raw_text': '',
+            'error': f'Failed to analyze prescription text: {str(e)}',
+            'raw_text': raw_text,
             'medications': [],
             'dosages': [],
             'instructions': 'Please try again with a clearer image or enter details manually.',
@@ -307,48 +680,15 @@ def extract_prescription_text(image_file):
 
 def extract_basic_medications(text):
     """Extract basic medication names from text using pattern matching"""
-    medication_patterns = [
-        r'\b[A-Z][a-z]+(?:cillin|mycin|pril|sartan|olol|pine|zide|statin)\b',
-        r'\b(?:Tab|Tablet|Cap|Capsule|Syrup|Injection)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b'
-    ]
-    
-    medications = []
-    for pattern in medication_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        medications.extend(matches)
-    
-    return list(set(medications))
+    return extract_medications(text)
 
 def extract_basic_dosages(text):
     """Extract basic dosage information from text"""
-    dosage_patterns = [
-        r'\b\d+\s*(?:mg|ml|g|mcg|units?)\b',
-        r'\b\d+/\d+\s*(?:mg|ml|g|mcg)\b'
-    ]
-    
-    dosages = []
-    for pattern in dosage_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        dosages.extend(matches)
-    
-    return list(set(dosages))
+    return extract_dosages(text)
 
 def extract_suggestions(response_text):
     """Extract actionable suggestions from chatbot response"""
-    suggestions = []
-    
-    # Look for common suggestion patterns
-    suggestion_patterns = [
-        r'try\s+([^.]+)',
-        r'consider\s+([^.]+)',
-        r'you\s+(?:should|could|might)\s+([^.]+)'
-    ]
-    
-    for pattern in suggestion_patterns:
-        matches = re.findall(pattern, response_text, re.IGNORECASE)
-        suggestions.extend([match.strip() for match in matches[:3]])  # Limit to 3 suggestions
-    
-    return suggestions
+    return extract_text_suggestions(response_text)
 
 def get_voice_synthesis_url(text, language='en'):
     """
@@ -372,31 +712,47 @@ def get_voice_synthesis_url(text, language='en'):
             'error': str(e)
         }
 
+@coalesce('detect', _detection_key)
 def detect_language(text):
     """
-    Detect the language of input text
+    Detect the language of input text locally from its script, asking
+    Gemini only when the local detector is not confident
     """
     try:
-        if not model:
-            return 'en'  # Default fallback
-            
-        prompt = f"""
-        Detect the language of this text and return only the language code (en, hi, ta, te, bn, gu, mr, kn, ml, or, pa, as, ur).
-        
-        Text: "{text}"
+        local = detect_script_language(text)
+        if local.confidence >= LANGUAGE_DETECT_MIN_CONFIDENCE:
+            return local.language
         
-        Return only the two-letter language code.
-        """
-        
-        response = model.generate_content(prompt)
-        detected_lang = response.text.strip().lower()
+        fallback = local.language if local.script else 'en'
+        if not get_model():
+            return fallback
         
-        # Validate the detected language
-        if detected_lang in LANGUAGE_MAPPING:
-            return detected_lang
-        else:
-            return 'en'  # Default fallback
+        try:
+            return detect_language_llm(text) or fallback
+        except AIOverloadedError:
+            # A busy AI service should not fail the whole request
+            return fallback
             
     except Exception as e:
         logging.error(f"Language detection error: {str(e)}")
-        return 'en'  # Default fallback
\ No newline at end of file
+        return 'en'  # Default fallback
+
+def detect_language_llm(text):
+    """
+    Detect the language of input text with Gemini, returning None if unsure
+    """
+    prompt = f"""
+    Detect the language of this text and return only the language code (en, hi, ta, te, bn, gu, mr, kn, ml, or, pa, as, ur).
+    
+    Text: "{text}"
+    
+    Return only the two-letter language code.
+    """
+    
+    response = generate_content(prompt, function='detect')
+    detected_lang = response.text.strip().lower()
+    
+    # Validate the detected language
+    if detected_lang in LANGUAGE_MAPPING:
+        return detected_lang
+    return None
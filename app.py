@@ -1,6 +1,7 @@
 import os
 import logging
-from flask import Flask
+import threading
+from flask import Flask, appcontext_pushed
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
@@ -29,10 +30,125 @@ app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 # Initialize the app with the extension
 db.init_app(app)
 
-with app.app_context():
-    # Import models to ensure tables are created
-    import models
-    db.create_all()
+# Back the translation cache with the TranslationHistory table
+from translation_cache import translation_cache
+translation_cache.init_app(app)
+
+# Import models; the schema is brought up to date on first use (see migrations.py)
+import models
+import migrations
+
+# WARM_UP=1 loads everything at import instead, e.g. in a preloading master process
+WARM_UP = os.environ.get("WARM_UP", "0").lower() in ('1', 'true', 'yes', 'on')
+
+_schema_lock = threading.RLock()
+_schema_state = None  # None, 'upgrading' or 'ready'
+
+def init_db(sender=None, **extra):
+    """Apply pending migrations once per process, before the first app context is used"""
+    global _schema_state
+    if _schema_state == 'ready':
+        return
+    with _schema_lock:
+        # 'upgrading' means this thread is already inside the upgrade
+        if _schema_state is not None:
+            return
+        _schema_state = 'upgrading'
+        try:
+            with app.app_context():
+                migrations.upgrade(db)
+            _schema_state = 'ready'
+        except Exception:
+            _schema_state = None
+            raise
+
+# Every request and background worker runs in an app context
+appcontext_pushed.connect(init_db, app)
+
+# Background threads (history writer, reminder dispatcher, scan job workers)
+# run in the serving process. Under WARM_UP they are not started at import:
+# a preloading master only loads code, and each forked worker (or the first
+# request of an unforked process) starts its own, see start_background_services.
+start_threads = not WARM_UP
+
+# Start the write-behind history writer
+from history_writer import history_writer
+history_writer.init_app(app, start=start_threads)
+
+# Summarise long chat sessions in the background
+from conversation_context import conversation_context
+conversation_context.init_app(app)
+
+# Deliver due reminders to stream clients and push subscriptions
+from reminder_delivery import reminder_dispatcher
+reminder_dispatcher.init_app(app, start=start_threads)
+
+# Start the prescription scan job workers
+from scan_service import scan_jobs
+scan_jobs.init_app(app, start=start_threads)
+
+# Time requests and DB commits for /metrics
+from metrics import metrics
+metrics.init_app(app)
+
+# Serve fingerprinted, precompressed static files and compress responses
+from static_assets import static_assets
+from compression import response_compressor
+static_assets.init_app(app)
+response_compressor.init_app(app)
 
 # Import routes
 import routes
+
+_services_pid = os.getpid() if start_threads else None
+
+def start_background_services():
+    """Start this process's background threads, once per process"""
+    global _services_pid
+    if _services_pid == os.getpid():
+        return
+    _services_pid = os.getpid()
+    history_writer.start()
+    reminder_dispatcher.start()
+    scan_jobs.start()
+
+def _after_fork_in_child():
+    global _schema_lock, _schema_state
+    # Threads do not survive a fork: a migration one of them was running is
+    # restarted, and pooled connections must not be shared with the parent
+    _schema_lock = threading.RLock()
+    if _schema_state == 'upgrading':
+        _schema_state = None
+    try:
+        with app.app_context():
+            db.engine.dispose(close=False)
+    except Exception as e:
+        logging.error(f"Database reset after fork failed: {str(e)}")
+    start_background_services()
+
+os.register_at_fork(after_in_child=_after_fork_in_child)
+app.before_request(start_background_services)
+
+def warm_up():
+    """
+    Load what is otherwise initialised on first use: the schema, the Gemini
+    client and the imaging libraries. Set WARM_UP=1 (which also defers the
+    background threads to the workers) to run it at import in a preloading
+    master; workers then start their threads after the fork.
+    """
+    import ai_services
+    import image_preprocessing
+    from PIL import Image, ImageChops, ImageFilter, ImageOps, ImageStat
+
+    init_db()
+    with app.app_context():
+        # Forked workers must not share the master's connections
+        db.engine.dispose()
+    ai_services.get_model()
+    try:
+        import pytesseract
+    except ImportError:
+        pass
+
+if WARM_UP:
+    warm_up()
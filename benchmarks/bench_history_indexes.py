@@ -0,0 +1,206 @@
+"""
+Query latency benchmark for the history and reminder indexes.
+
+Seeds a scratch database with chat, translation and reminder history, times
+the application's query shapes without secondary indexes, then creates the
+indexes declared in models.py (as the migrations do) and times them again.
+
+The tables are emptied, so the benchmark never uses DATABASE_URL. It runs
+against BENCH_DATABASE_URL, which defaults to a scratch SQLite file in the
+temp directory, and refuses any other target whose database name does not
+contain "bench" or "scratch".
+
+Usage: python benchmarks/bench_history_indexes.py [--rows N] [--queries N]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_DATABASE_URL = os.environ.get('BENCH_DATABASE_URL',
+                                    'sqlite:///' + os.path.join(tempfile.gettempdir(), 'bench_history_indexes.db'))
+os.environ.setdefault('HISTORY_WRITE_BEHIND', '0')
+os.environ.setdefault('SCAN_JOB_WORKERS', '0')
+
+LANGUAGES = ['en', 'hi', 'mr', 'bn', 'ta', 'te', 'gu', 'kn']
+PHRASES = ['Take one tablet twice daily', 'Do not drive after this medicine', 'Drink plenty of water',
+           'Stop if you get a rash', 'Keep out of reach of children', 'Take with food']
+INDEXES = [
+    ('ChatHistory', 'chat_history', 'ix_chat_history_session_time'),
+    ('MedicationReminder', 'medication_reminder', 'ix_medication_reminder_active'),
+    ('TranslationHistory', 'translation_history', 'ix_translation_history_lookup'),
+    ('TranslationHistory', 'translation_history', 'ix_translation_history_time'),
+]
+
+
+def seed(db, rows, batch=20000):
+    """Fill the history tables with rows spread over the last 90 days"""
+    from sqlalchemy import delete, insert
+    from models import ChatHistory, MedicationReminder, TranslationHistory
+    from translation_cache import hash_text
+
+    rng = random.Random(7)
+    sessions = [str(uuid.uuid4()) for _ in range(max(1, rows // 50))]
+    texts = [f'{rng.choice(PHRASES)} ({index})' for index in range(max(1, rows // 20))]
+    start = datetime.utcnow() - timedelta(days=90)
+    span = 90 * 24 * 3600
+
+    def when():
+        return start + timedelta(seconds=rng.uniform(0, span))
+
+    def chat(count):
+        return [{'session_id': rng.choice(sessions), 'user_message': 'How should I take this?',
+                 'bot_response': 'Twice daily after meals.', 'language': 'en', 'timestamp': when()}
+                for _ in range(count)]
+
+    def translations(count):
+        result = []
+        for _ in range(count):
+            text = rng.choice(texts)
+            source, target = rng.sample(LANGUAGES, 2)
+            result.append({'original_text': text, 'translated_text': text, 'text_hash': hash_text(text),
+                           'source_language': source, 'target_language': target, 'timestamp': when()})
+        return result
+
+    def reminders(count):
+        # Most reminders in a long-lived database are finished courses
+        return [{'medication_name': 'Paracetamol', 'dosage': '500mg', 'frequency': 'daily',
+                 'time_slots': '08:00,20:00', 'start_date': when(), 'is_active': rng.random() < 0.05,
+                 'created_at': when()}
+                for _ in range(count)]
+
+    for model, make, total in ((ChatHistory, chat, rows), (TranslationHistory, translations, rows),
+                               (MedicationReminder, reminders, max(1, rows // 10))):
+        started = time.perf_counter()
+        db.session.execute(delete(model))
+        for offset in range(0, total, batch):
+            db.session.execute(insert(model), make(min(batch, total - offset)))
+        db.session.commit()
+        print(f"  seeded {total:>9,} {model.__tablename__:<22} {time.perf_counter() - started:6.1f} s")
+    return sessions, texts
+
+
+def workload(sessions, texts):
+    """The query shapes used by routes.py and the translation cache"""
+    from models import ChatHistory, MedicationReminder, TranslationHistory
+    from translation_cache import hash_text
+
+    rng = random.Random(11)
+    cutoff = datetime.utcnow() - timedelta(days=30)
+
+    def chat_by_session():
+        return (ChatHistory.query.filter(ChatHistory.session_id == rng.choice(sessions))
+                .order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc()).limit(20).all())
+
+    def active_reminders():
+        return MedicationReminder.query.filter_by(is_active=True).all()
+
+    def translation_lookup():
+        source, target = rng.sample(LANGUAGES, 2)
+        return (TranslationHistory.query
+                .filter(TranslationHistory.source_language == source,
+                        TranslationHistory.target_language == target,
+                        TranslationHistory.text_hash == hash_text(rng.choice(texts)),
+                        TranslationHistory.timestamp >= cutoff)
+                .order_by(TranslationHistory.timestamp.desc()).first())
+
+    def recent_translations():
+        return (TranslationHistory.query
+                .order_by(TranslationHistory.timestamp.desc(), TranslationHistory.id.desc()).limit(50).all())
+
+    return [('chat by session', chat_by_session), ('active reminders', active_reminders),
+            ('translation cache lookup', translation_lookup), ('recent translations', recent_translations)]
+
+
+def measure(db, queries, count):
+    """Mean and p50 latency in ms per query, after one warm-up execution"""
+    results = {}
+    for name, query in queries:
+        query()
+        db.session.rollback()
+        latencies = []
+        for _ in range(count):
+            started = time.perf_counter()
+            query()
+            latencies.append((time.perf_counter() - started) * 1000)
+            db.session.rollback()
+        latencies.sort()
+        results[name] = (statistics.mean(latencies), latencies[len(latencies) // 2])
+    return results
+
+
+def set_indexes(db, create):
+    """Drop or create the secondary indexes under test"""
+    import models
+    import migrations
+
+    with db.engine.begin() as connection:
+        for model, table, name in INDEXES:
+            if create:
+                migrations.create_index(connection, getattr(models, model), name)
+            else:
+                migrations.drop_index(connection, table, name)
+        if connection.dialect.name in ('sqlite', 'postgresql'):
+            connection.exec_driver_sql('ANALYZE')
+
+
+def scratch_database_error(url, app_url):
+    """Why url must not be benchmarked against, or None when it is a scratch database"""
+    from sqlalchemy.engine import make_url
+
+    target = make_url(url)
+    if app_url and make_url(app_url) == target:
+        return 'BENCH_DATABASE_URL is the application database (DATABASE_URL)'
+    name = target.database or ''
+    if target.get_backend_name() == 'sqlite':
+        if not name or name == ':memory:':
+            return None
+        if os.path.dirname(os.path.abspath(name)) == os.path.abspath(tempfile.gettempdir()):
+            return None
+    if 'bench' in os.path.basename(name).lower() or 'scratch' in os.path.basename(name).lower():
+        return None
+    return f'{target.render_as_string(hide_password=True)} does not look like a scratch database'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000, help='chat and translation rows (reminders get a tenth)')
+    parser.add_argument('--queries', type=int, default=50, help='executions of each query per phase')
+    args = parser.parse_args()
+
+    error = scratch_database_error(BENCH_DATABASE_URL, os.environ.get('DATABASE_URL'))
+    if error:
+        parser.exit(2, f"refusing to run: {error}; its tables would be emptied\n")
+    os.environ['DATABASE_URL'] = BENCH_DATABASE_URL
+
+    from app import app, db
+
+    with app.app_context():
+        print(f"database: {db.engine.url.render_as_string(hide_password=True)}")
+        set_indexes(db, create=False)
+        sessions, texts = seed(db, args.rows)
+        queries = workload(sessions, texts)
+
+        before = measure(db, queries, args.queries)
+        started = time.perf_counter()
+        set_indexes(db, create=True)
+        print(f"  created indexes in {time.perf_counter() - started:.1f} s")
+        after = measure(db, queries, args.queries)
+
+    print(f"\n{'query':<26}{'before (ms)':>14}{'after (ms)':>14}{'speedup':>10}")
+    for name, _ in queries:
+        mean_before, p50_before = before[name]
+        mean_after, p50_after = after[name]
+        print(f"{name:<26}{mean_before:>14.3f}{mean_after:>14.3f}{mean_before / max(mean_after, 1e-6):>9.1f}x")
+        print(f"{'  p50':<26}{p50_before:>14.3f}{p50_after:>14.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Accuracy and latency benchmark for language detection.
+
+Compares the local script/n-gram detector with the Gemini detection path.
+The Gemini path is only measured when GOOGLE_API_KEY is configured.
+Romanized Hindi ("Hinglish") and mixed-script samples are expected to fall
+below the confidence threshold: the local detector only answers English for
+Latin text, so a confident answer on them is a wrong answer nobody checks.
+
+Usage: python benchmarks/bench_language_detect.py [--rounds N]
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from language_detect import detect_script_language
+
+# Held-out samples (not part of the detector's seed corpora)
+SAMPLES = [
+    ('en', 'Take one tablet twice daily after meals.'),
+    ('en', 'Call 108 if the chest pain does not stop.'),
+    ('hi', 'कृपया यह दवा रोज़ रात को सोने से पहले लें।'),
+    ('hi', 'मेरी माँ को कई दिनों से खांसी है।'),
+    ('hi', 'क्या मुझे खाली पेट दवा लेनी चाहिए?'),
+    ('mr', 'कृपया हे औषध रोज रात्री झोपण्यापूर्वी घ्या.'),
+    ('mr', 'माझ्या आईला बऱ्याच दिवसांपासून खोकला आहे.'),
+    ('mr', 'मी उपाशी पोटी औषध घ्यावे का?'),
+    ('bn', 'দয়া করে এই ওষুধটি প্রতিদিন রাতে ঘুমানোর আগে খান।'),
+    ('bn', 'আমার মায়ের অনেক দিন ধরে কাশি হচ্ছে।'),
+    ('bn', 'আমার কি খালি পেটে ওষুধ খাওয়া উচিত?'),
+    ('as', 'অনুগ্ৰহ কৰি এই দৰবটো প্ৰতিদিনে ৰাতি শোৱাৰ আগতে খাব।'),
+    ('as', 'মোৰ মাৰ বহুদিনৰ পৰা কাহ হৈ আছে।'),
+    ('as', 'মই খালী পেটত দৰব খাব লাগিবনে?'),
+    ('ta', 'இந்த மருந்தை உணவுக்குப் பிறகு சாப்பிடுங்கள்.'),
+    ('te', 'ఈ మందును భోజనం తర్వాత తీసుకోండి.'),
+    ('gu', 'આ દવા જમ્યા પછી લો.'),
+    ('kn', 'ಈ ಔಷಧಿಯನ್ನು ಊಟದ ನಂತರ ತೆಗೆದುಕೊಳ್ಳಿ.'),
+    ('ml', 'ഈ മരുന്ന് ഭക്ഷണത്തിന് ശേഷം കഴിക്കുക.'),
+    ('or', 'ଏହି ଔଷଧ ଖାଇବା ପରେ ନିଅନ୍ତୁ।'),
+    ('pa', 'ਇਹ ਦਵਾਈ ਖਾਣੇ ਤੋਂ ਬਾਅਦ ਲਓ।'),
+    ('ur', 'یہ دوا کھانے کے بعد لیں۔'),
+    # Romanized Hindi and mixed scripts, left to Gemini
+    ('hi', 'Kya main yeh dawai khali pet le sakta hoon?'),
+    ('hi', 'Mera beta do din se bimar hai, kya karun?'),
+    ('hi', 'BP ki goli kab leni hai?'),
+    ('hi', 'Paracetamol 500mg लें'),
+    ('hi', 'Doctor ne बोला है कि आराम करो'),
+]
+
+
+def run(name, detect, rounds):
+    """Run a detector over the samples and print accuracy and latency"""
+    latencies = []
+    correct = 0
+    misses = []
+
+    for _ in range(rounds):
+        for expected, text in SAMPLES:
+            started = time.perf_counter()
+            detected = detect(text)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if detected == expected:
+                correct += 1
+            elif len(misses) < 10:
+                misses.append((expected, detected, text))
+
+    total = rounds * len(SAMPLES)
+    latencies.sort()
+    print(f"{name}")
+    print(f"  accuracy      {correct / total:.1%} ({correct}/{total})")
+    print(f"  mean latency  {statistics.mean(latencies):.3f} ms")
+    print(f"  p50 latency   {latencies[len(latencies) // 2]:.3f} ms")
+    print(f"  p99 latency   {latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]:.3f} ms")
+    for expected, detected, text in misses:
+        print(f"  miss: expected {expected}, got {detected}: {text}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=200, help='passes over the sample set for the local detector')
+    args = parser.parse_args()
+
+    import ai_services
+
+    run('local detector', lambda text: detect_script_language(text).language, args.rounds)
+
+    threshold = ai_services.LANGUAGE_DETECT_MIN_CONFIDENCE
+    results = [(expected, text, detect_script_language(text)) for expected, text in SAMPLES]
+    low_confidence = sum(1 for _, _, result in results if result.confidence < threshold)
+    print(f"  LLM fallbacks {low_confidence}/{len(SAMPLES)} samples below confidence threshold")
+    confident_misses = [(expected, text, result) for expected, text, result in results
+                        if result.confidence >= threshold and result.language != expected]
+    print(f"  confident misses {len(confident_misses)}/{len(SAMPLES)} wrong answers above the threshold")
+    for expected, text, result in confident_misses:
+        print(f"  confident miss: expected {expected}, got {result.language} ({result.confidence:.2f}): {text}")
+
+    if ai_services.get_model() is None:
+        print("gemini detector\n  skipped: GOOGLE_API_KEY is not configured")
+        return
+    run('gemini detector', ai_services.detect_language_llm, 1)
+
+
+if __name__ == '__main__':
+    main()
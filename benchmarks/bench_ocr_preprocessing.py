@@ -0,0 +1,151 @@
+"""
+OCR latency and accuracy benchmark for the image preprocessing pipeline.
+
+Renders synthetic prescriptions as phone-camera-like JPEGs (large, tinted,
+unevenly lit, noisy and slightly rotated), then OCRs them with and without
+preprocessing and reports latency and character accuracy. OCR is skipped,
+and only preprocessing cost is reported, when the tesseract binary is not
+installed.
+
+When tesseract is available it also compares OCR throughput in the calling
+thread with the persistent worker pool in ocr_service.
+
+Usage: python benchmarks/bench_ocr_preprocessing.py [--images N] [--workers N]
+"""
+import argparse
+import difflib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont
+
+from image_preprocessing import DEFAULT_CONFIG, preprocess_for_ocr
+from bench_text_extraction import synthetic_prescription
+
+OCR_CONFIG = r'--oem 3 --psm 6 -c tessedit_char_whitelist=0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz.,:-/() '
+
+
+def render_photo(text, rng, size=(3024, 4032)):
+    """Render text as a JPEG resembling a phone photo of a paper prescription"""
+    page = Image.new('L', (1240, 1754), 255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=34)
+    y = 160
+    for line in text.splitlines():
+        draw.text((120, y), line, fill=20, font=font)
+        y += 64
+
+    page = page.rotate(rng.uniform(-3, 3), resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+    page = page.resize(size, Image.Resampling.BICUBIC)
+
+    # Uneven lighting: darken towards one corner
+    shade = Image.linear_gradient('L').rotate(rng.choice([0, 90, 180, 270])).resize(size).point(lambda v: 255 - v // 3)
+    page = ImageChops.multiply(page, shade)
+    page = Image.eval(page, lambda v: v * 0.85 + 20)
+    noise = Image.effect_noise(size, 18)
+    page = Image.blend(page, noise, 0.12).filter(ImageFilter.GaussianBlur(1.2))
+
+    photo = Image.merge('RGB', (page, page.point(lambda v: v * 0.95), page.point(lambda v: v * 0.85)))
+    buffer = io.BytesIO()
+    photo.save(buffer, 'JPEG', quality=88, dpi=(72, 72))
+    return buffer.getvalue()
+
+
+def character_accuracy(expected, actual):
+    normalize = lambda text: ' '.join(text.split()).lower()
+    return difflib.SequenceMatcher(None, normalize(expected), normalize(actual)).ratio()
+
+
+def tesseract_available():
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def run(name, samples, config, ocr):
+    import pytesseract
+
+    prep_times = []
+    ocr_times = []
+    accuracies = []
+    pixels = []
+    for text, data in samples:
+        started = time.perf_counter()
+        image, _ = preprocess_for_ocr(data, config)
+        prep_times.append((time.perf_counter() - started) * 1000)
+        pixels.append(image.width * image.height)
+
+        if ocr:
+            started = time.perf_counter()
+            result = pytesseract.image_to_string(image, lang='eng', config=OCR_CONFIG)
+            ocr_times.append((time.perf_counter() - started) * 1000)
+            accuracies.append(character_accuracy(text, result))
+
+    print(f"{name}")
+    print(f"  decode+preprocess  {statistics.mean(prep_times):8.1f} ms mean")
+    print(f"  pixels to OCR      {statistics.mean(pixels) / 1e6:8.2f} MP mean")
+    if ocr:
+        print(f"  tesseract          {statistics.mean(ocr_times):8.1f} ms mean")
+        print(f"  total              {statistics.mean(prep_times) + statistics.mean(ocr_times):8.1f} ms mean")
+        print(f"  char accuracy      {statistics.mean(accuracies):8.1%}")
+
+
+def bench_pool(samples, workers):
+    """Throughput of per-request OCR in the calling thread versus the worker pool"""
+    import pytesseract
+    from ocr_service import OCRService
+
+    started = time.perf_counter()
+    for _, data in samples:
+        image, _ = preprocess_for_ocr(data, DEFAULT_CONFIG)
+        pytesseract.image_to_string(image, lang='eng', config=OCR_CONFIG)
+    serial = time.perf_counter() - started
+
+    service = OCRService(workers=workers, max_pending=len(samples))
+    service.ocr_image(samples[0][1])  # start the workers outside the timing
+    started = time.perf_counter()
+    futures = [service.submit(data) for _, data in samples]
+    for future in futures:
+        future.result()
+    pooled = time.perf_counter() - started
+    engine = service.stats()['engine']
+    service.shutdown()
+
+    print(f"in-thread pytesseract        {len(samples) / serial:8.2f} images/s")
+    print(f"OCR pool ({workers} workers, {engine}) {len(samples) / pooled:8.2f} images/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', type=int, default=5, help='synthetic prescription photos to process')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='OCR pool size for the throughput comparison')
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    samples = []
+    for _ in range(args.images):
+        text = synthetic_prescription(rng)
+        samples.append((text, render_photo(text, rng)))
+
+    ocr = tesseract_available()
+    if not ocr:
+        print("tesseract binary not found: reporting preprocessing cost only\n")
+
+    run('baseline (full decode, RGB)', samples, DEFAULT_CONFIG._replace(enabled=False), ocr)
+    run('preprocessed', samples, DEFAULT_CONFIG, ocr)
+    if ocr:
+        print()
+        bench_pool(samples, args.workers)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Startup benchmark: cold import of the app and first-request latency.
+
+Each run starts a fresh interpreter against a new scratch SQLite database
+and times importing app.py, the first request (which applies the schema
+migrations), a second request, and loading the Gemini client through
+ai_services.get_model (only when GOOGLE_API_KEY is set; any value will do,
+no request is made). With --warm-up the app is imported with WARM_UP=1,
+which moves that work into the import, as a preloading master would.
+
+Usage: python benchmarks/bench_startup.py [--runs N] [--path /] [--warm-up]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line of timings in milliseconds
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+status = client.get({path!r}).status_code
+first = time.perf_counter()
+client.get({path!r})
+second = time.perf_counter()
+loaded = 'google.generativeai' in sys.modules
+import ai_services
+configured = ai_services.get_model() is not None
+model = time.perf_counter()
+print(json.dumps({{
+    'import': (imported - started) * 1000,
+    'first_request': (first - imported) * 1000,
+    'second_request': (second - first) * 1000,
+    'gemini_client': (model - second) * 1000,
+    'gemini_loaded_at_import': loaded,
+    'gemini_configured': configured,
+    'status': status
+}}))
+"""
+
+
+def run_once(path, warm_up):
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ,
+                   DATABASE_URL='sqlite:///' + os.path.join(directory, 'bench_startup.db'),
+                   SCAN_JOB_WORKERS='0', WARM_UP='1' if warm_up else '0')
+        output = subprocess.run([sys.executable, '-c', CHILD.format(root=ROOT, path=path)], env=env,
+                                cwd=directory, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to start')
+    parser.add_argument('--path', default='/', help='page requested first')
+    parser.add_argument('--warm-up', action='store_true', help='import with WARM_UP=1')
+    args = parser.parse_args()
+
+    results = [run_once(args.path, args.warm_up) for _ in range(args.runs)]
+    print(f"{args.runs} runs, GET {args.path} -> {results[0]['status']}, WARM_UP={'1' if args.warm_up else '0'}")
+    print(f"Gemini client imported at startup: {'yes' if results[0]['gemini_loaded_at_import'] else 'no'}")
+    if not results[0]['gemini_configured']:
+        print("  GOOGLE_API_KEY is not set, so the client is never loaded; set any value to time it")
+    for key in ('import', 'first_request', 'second_request', 'gemini_client'):
+        values = [result[key] for result in results]
+        print(f"{key:16} median {statistics.median(values):8.1f} ms   min {min(values):8.1f} ms   max {max(values):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Throughput benchmark for prescription text extraction.
+
+Compares the previous per-pattern regex extraction (patterns recompiled and
+the text rescanned once per pattern) with the single-pass ExtractionEngine,
+and measures backfill throughput over PrescriptionScan rows in a scratch
+SQLite database.
+
+Usage: python benchmarks/bench_text_extraction.py [--texts N] [--rows N]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from text_extraction import extraction_engine
+
+DRUGS = ['Amoxicillin', 'Azithromycin', 'Lisinopril', 'Losartan', 'Metoprolol', 'Amlodipine',
+         'Hydrochlorothiazide', 'Atorvastatin', 'Paracetamol', 'Omeprazole', 'Metformin', 'Cetirizine']
+FORMS = ['Tab', 'Tablet', 'Cap', 'Capsule', 'Syrup', 'Injection']
+DOSES = ['500 mg', '250mg', '10 mg', '5 ml', '1/2 ml', '20 mg', '100 mcg', '10 units']
+FREQUENCIES = ['twice daily', 'once a day', 'OD', 'BD', 'TDS', '1-0-1', 'after meals', 'at bedtime', 'every 8 hours']
+NOISE = ['Dr. R. Sharma MBBS', 'Reg No 44521', 'Date: 12/03/2024', 'Patient: S. Kumar, 45 yrs',
+         'Review after 7 days', 'Avoid oily food', 'Drink plenty of fluids']
+
+
+def synthetic_prescription(rng):
+    lines = [rng.choice(NOISE), rng.choice(NOISE)]
+    for _ in range(rng.randint(2, 6)):
+        lines.append(f"{rng.choice(FORMS)} {rng.choice(DRUGS)} {rng.choice(DOSES)} {rng.choice(FREQUENCIES)}")
+    lines.append(rng.choice(NOISE))
+    return '\n'.join(lines)
+
+
+def legacy_extract(text):
+    """The per-pattern extraction used before ExtractionEngine"""
+    medications = []
+    for pattern in [r'\b[A-Z][a-z]+(?:cillin|mycin|pril|sartan|olol|pine|zide|statin)\b',
+                    r'\b(?:Tab|Tablet|Cap|Capsule|Syrup|Injection)\s+([A-Z][a-z]+(?:\s+[A-Z][a-z]+)?)\b']:
+        medications.extend(re.findall(pattern, text, re.IGNORECASE))
+    dosages = []
+    for pattern in [r'\b\d+\s*(?:mg|ml|g|mcg|units?)\b', r'\b\d+/\d+\s*(?:mg|ml|g|mcg)\b']:
+        dosages.extend(re.findall(pattern, text, re.IGNORECASE))
+    suggestions = []
+    for pattern in [r'try\s+([^.]+)', r'consider\s+([^.]+)', r'you\s+(?:should|could|might)\s+([^.]+)']:
+        suggestions.extend(match.strip() for match in re.findall(pattern, text, re.IGNORECASE)[:3])
+    return list(set(medications)), list(set(dosages)), suggestions
+
+
+def report(name, seconds, count, total_bytes):
+    print(f"{name}")
+    print(f"  {count / seconds:,.0f} texts/s   {total_bytes / seconds / 1e6:.2f} MB/s   ({seconds:.3f} s)")
+
+
+def bench_texts(count):
+    rng = random.Random(42)
+    texts = [synthetic_prescription(rng) for _ in range(count)]
+    total_bytes = sum(len(text.encode('utf-8')) for text in texts)
+
+    # Defeat the re module's pattern cache to reflect per-call recompilation
+    started = time.perf_counter()
+    for text in texts:
+        re.purge()
+        legacy_extract(text)
+    report('legacy per-pattern extraction (cold pattern cache)', time.perf_counter() - started, count, total_bytes)
+
+    started = time.perf_counter()
+    for text in texts:
+        legacy_extract(text)
+    report('legacy per-pattern extraction (warm pattern cache)', time.perf_counter() - started, count, total_bytes)
+
+    started = time.perf_counter()
+    extraction_engine.extract_batch(texts)
+    report('single-pass ExtractionEngine.extract_batch', time.perf_counter() - started, count, total_bytes)
+
+
+def bench_backfill(rows):
+    database = os.path.join(tempfile.mkdtemp(), 'bench_extraction.db')
+    os.environ['DATABASE_URL'] = f'sqlite:///{database}'
+
+    from app import app, db
+    from models import PrescriptionScan
+    from text_extraction import backfill_prescription_scans
+
+    rng = random.Random(7)
+    with app.app_context():
+        db.create_all()
+        db.session.execute(db.insert(PrescriptionScan), [
+            {'extracted_text': synthetic_prescription(rng)} for _ in range(rows)
+        ])
+        db.session.commit()
+
+        started = time.perf_counter()
+        updated = backfill_prescription_scans(batch_size=1000)
+        seconds = time.perf_counter() - started
+
+    print(f"backfill over {rows:,} PrescriptionScan rows")
+    print(f"  {updated / seconds:,.0f} rows/s   ({updated:,} rows updated in {seconds:.3f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--texts', type=int, default=20000, help='synthetic texts for the extraction benchmark')
+    parser.add_argument('--rows', type=int, default=20000, help='rows for the backfill benchmark (0 to skip)')
+    args = parser.parse_args()
+
+    bench_texts(args.texts)
+    if args.rows:
+        bench_backfill(args.rows)
+
+
+if __name__ == '__main__':
+    main()
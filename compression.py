@@ -0,0 +1,109 @@
+import os
+import gzip
+import threading
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Response compression configuration
+COMPRESSION = os.environ.get("COMPRESSION", "1").lower() in ('1', 'true', 'yes', 'on')
+COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", "500"))
+COMPRESS_GZIP_LEVEL = int(os.environ.get("COMPRESS_GZIP_LEVEL", "6"))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get("COMPRESS_BROTLI_QUALITY", "5"))
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'application/manifest+json',
+                      'application/xml', 'image/svg+xml')
+
+
+def is_compressible(mimetype):
+    """True for text-like content types that shrink well"""
+    return bool(mimetype) and (mimetype.startswith('text/') or mimetype in COMPRESSIBLE_TYPES)
+
+
+def supported_encodings():
+    """Encodings this process can produce, most preferred first"""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(encodings=None):
+    """Best encoding the client accepts from encodings, or None for identity"""
+    return request.accept_encodings.best_match(encodings or supported_encodings())
+
+
+def compress(data, encoding, level=None):
+    """Compress bytes with 'gzip' or 'br'; level defaults to the fast dynamic setting"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=COMPRESS_BROTLI_QUALITY if level is None else level)
+    # mtime=0 keeps the output stable for identical input
+    return gzip.compress(data, compresslevel=COMPRESS_GZIP_LEVEL if level is None else level, mtime=0)
+
+
+class ResponseCompressor:
+    """
+    Negotiated gzip/brotli compression of dynamic responses.
+
+    Runs as an after_request hook on text, HTML and JSON bodies above
+    COMPRESS_MIN_SIZE. Streamed responses (SSE, streaming chat) and responses
+    that already carry a Content-Encoding, such as precompressed static
+    assets, pass through untouched. Brotli is used when the optional brotli
+    package is installed and the client asks for it.
+    """
+
+    def __init__(self, enabled=COMPRESSION, min_size=COMPRESS_MIN_SIZE):
+        self.enabled = enabled
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self.compressed = {}
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def init_app(self, app):
+        app.after_request(self.after_request)
+
+    def after_request(self, response):
+        if (not self.enabled or response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers or not is_compressible(response.mimetype)):
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding()
+        if not encoding:
+            return response
+
+        body = compress(data, encoding)
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The compressed bytes differ from the ones the strong tag describes
+            response.set_etag(etag, weak=True)
+
+        with self._lock:
+            self.compressed[encoding] = self.compressed.get(encoding, 0) + 1
+            self.bytes_in += len(data)
+            self.bytes_out += len(body)
+        return response
+
+    def stats(self):
+        """Return compression counters and the overall ratio"""
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'encodings': supported_encodings(),
+                'compressed': dict(self.compressed),
+                'bytes_in': self.bytes_in,
+                'bytes_out': self.bytes_out,
+                'ratio': round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0
+            }
+
+
+response_compressor = ResponseCompressor()
@@ -0,0 +1,215 @@
+import os
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+import ai_services
+from ai_services import estimate_tokens
+
+# Conversation context configuration
+CHAT_CONTEXT_TOKENS = int(os.environ.get("CHAT_CONTEXT_TOKENS", "800"))
+CHAT_SUMMARY_TOKENS = int(os.environ.get("CHAT_SUMMARY_TOKENS", "300"))
+CHAT_SUMMARY_BATCH = int(os.environ.get("CHAT_SUMMARY_BATCH", "4"))
+CHAT_CONTEXT_MAX_TURNS = int(os.environ.get("CHAT_CONTEXT_MAX_TURNS", "40"))
+
+
+def format_turn(turn):
+    """One user/assistant exchange as prompt text"""
+    return f"User: {turn['user_message']}\nAssistant: {turn['bot_response']}"
+
+
+def split_window(turns, token_budget):
+    """
+    Split turns (oldest first) into (older, window): window is the longest
+    run of most recent turns that fits token_budget. The newest turn is
+    always kept, truncated if it alone exceeds the budget.
+    """
+    used = 0
+    start = len(turns)
+    for index in range(len(turns) - 1, -1, -1):
+        tokens = estimate_tokens(format_turn(turns[index]))
+        if start < len(turns) and used + tokens > token_budget:
+            break
+        used += tokens
+        start = index
+    return turns[:start], turns[start:]
+
+
+class ConversationContext:
+    """
+    Server-side chat context built from ChatHistory.
+
+    The prompt gets the most recent turns that fit a token budget plus a
+    rolling summary of everything older. The summary is stored per session
+    in ConversationSummary together with the position of the last turn it
+    covers, and is extended in the background once CHAT_SUMMARY_BATCH turns
+    have fallen out of the window, so each turn is summarised once and the
+    prompt stays roughly the same size however long the conversation runs.
+    """
+
+    def __init__(self, token_budget=CHAT_CONTEXT_TOKENS, summary_tokens=CHAT_SUMMARY_TOKENS,
+                 summary_batch=CHAT_SUMMARY_BATCH, max_turns=CHAT_CONTEXT_MAX_TURNS):
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summary_batch = max(1, summary_batch)
+        self.max_turns = max_turns
+        self._app = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='conversation-summary')
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self.builds = 0
+        self.total_tokens = 0
+        self.summaries = 0
+        self.summary_failures = 0
+
+    def init_app(self, app):
+        """Run summary updates against the given Flask app"""
+        self._app = app
+
+    def build(self, session_id):
+        """Return the context string for the session's next prompt ('' for a new conversation)"""
+        summary = self._load_summary(session_id)
+        turns = self._recent_turns(session_id, summary)
+        older, window = split_window(turns, self.token_budget)
+
+        # Fold older turns into the summary once enough have accumulated
+        if len([turn for turn in older if turn.get('id')]) >= self.summary_batch:
+            self._schedule_refresh(session_id)
+
+        parts = []
+        if summary and summary.summary:
+            parts.append(f"Summary of the earlier conversation: {summary.summary}")
+        if window:
+            recent = [format_turn(turn) for turn in window]
+            # Keep a single oversized turn within the budget
+            recent[-1] = recent[-1][:self.token_budget * 4]
+            parts.append("Recent messages:\n" + "\n".join(recent))
+        context = "\n\n".join(parts)
+
+        with self._lock:
+            self.builds += 1
+            self.total_tokens += estimate_tokens(context) if context else 0
+        return context
+
+    def refresh(self, session_id):
+        """Fold turns that have left the window into the session's summary"""
+        from app import db
+        from models import ConversationSummary
+
+        summary = self._load_summary(session_id)
+        older, _ = split_window(self._recent_turns(session_id, summary), self.token_budget)
+        # Queued rows have no id yet and are always recent; only persisted turns are folded
+        older = [turn for turn in older if turn.get('id')]
+        if len(older) < self.summary_batch:
+            return False
+
+        text = self._summarize(summary.summary if summary else '', older)
+        if text is None:
+            return False
+
+        last = older[-1]
+        if summary is None:
+            summary = ConversationSummary(session_id=session_id, turns=0)
+            db.session.add(summary)
+        summary.summary = text[:self.summary_tokens * 4]
+        summary.last_turn_id = last['id']
+        summary.last_turn_at = last['timestamp']
+        summary.turns = (summary.turns or 0) + len(older)
+        summary.updated_at = datetime.utcnow()
+        db.session.commit()
+
+        with self._lock:
+            self.summaries += 1
+        return True
+
+    def stats(self):
+        """Return context sizes and summary counters"""
+        with self._lock:
+            return {
+                'token_budget': self.token_budget,
+                'builds': self.builds,
+                'avg_context_tokens': round(self.total_tokens / self.builds, 1) if self.builds else 0.0,
+                'summaries': self.summaries,
+                'summary_failures': self.summary_failures,
+                'refreshing': len(self._refreshing)
+            }
+
+    def _load_summary(self, session_id):
+        from models import ConversationSummary
+
+        return ConversationSummary.query.filter_by(session_id=session_id).first()
+
+    def _recent_turns(self, session_id, summary):
+        """Turns after the summary position, oldest first, including rows still queued for writing"""
+        from models import ChatHistory
+        from history_writer import history_writer
+
+        query = ChatHistory.query.filter(ChatHistory.session_id == session_id,
+                                         ChatHistory.timestamp.isnot(None))
+        if summary and summary.last_turn_at:
+            query = query.filter(or_(ChatHistory.timestamp > summary.last_turn_at,
+                                     and_(ChatHistory.timestamp == summary.last_turn_at,
+                                          ChatHistory.id > summary.last_turn_id)))
+        rows = (query.order_by(ChatHistory.timestamp.desc(), ChatHistory.id.desc())
+                .limit(self.max_turns).all())
+
+        turns = [{'id': row.id, 'user_message': row.user_message, 'bot_response': row.bot_response,
+                  'timestamp': row.timestamp} for row in reversed(rows)]
+        seen = {(turn['timestamp'], turn['user_message']) for turn in turns}
+        for row in history_writer.pending(ChatHistory, session_id=session_id):
+            # A row being flushed can briefly be both queued and committed
+            if (row.get('timestamp'), row.get('user_message')) not in seen:
+                turns.append(dict(row, id=None))
+        return turns[-self.max_turns:]
+
+    def _summarize(self, previous, turns):
+        """Ask Gemini to extend the summary; None when it is unavailable"""
+        if not ai_services.get_model():
+            return None
+
+        words = max(20, self.summary_tokens * 3 // 4)
+        prompt = f"""
+        You maintain a running summary of a patient's conversation with MediBot, a healthcare assistant.
+        Update the summary with the new messages below. Keep symptoms, durations, ages, medicines,
+        allergies, conditions and the advice already given; drop greetings and repetition.
+        Write at most {words} words in English, as plain text.
+
+        Current summary: {previous or '(none)'}
+
+        New messages:
+        {chr(10).join(format_turn(turn) for turn in turns)}
+        """
+        try:
+            return ai_services.generate_content(prompt, function='summary').text.strip()
+        except Exception as e:
+            with self._lock:
+                self.summary_failures += 1
+            logging.warning(f"Conversation summary failed: {str(e)}")
+            return None
+
+    def _schedule_refresh(self, session_id):
+        if not ai_services.get_model():
+            return
+        with self._lock:
+            if session_id in self._refreshing or self._app is None:
+                return
+            self._refreshing.add(session_id)
+        self._executor.submit(self._run_refresh, session_id)
+
+    def _run_refresh(self, session_id):
+        try:
+            with self._app.app_context():
+                self.refresh(session_id)
+        except Exception as e:
+            with self._lock:
+                self.summary_failures += 1
+            logging.error(f"Conversation summary error: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(session_id)
+
+
+conversation_context = ConversationContext()
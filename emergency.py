@@ -0,0 +1,163 @@
+import unicodedata
+from collections import deque, namedtuple
+
+# Emergency keywords for every language in LANGUAGE_MAPPING
+EMERGENCY_KEYWORDS = {
+    'en': ['emergency', 'urgent', 'help', 'pain', 'bleeding', 'chest pain', 'heart attack', 'stroke',
+           'unconscious', 'breathing problem', "can't breathe", 'cannot breathe', 'difficulty breathing',
+           'severe', 'critical', 'seizure', 'fainted', 'poisoning', 'overdose', 'choking', 'suicide'],
+    'hi': ['आपातकाल', 'जरूरी', 'मदद', 'दर्द', 'खून', 'सीने में दर्द', 'दिल का दौरा', 'स्ट्रोक', 'बेहोश',
+           'सांस की समस्या', 'सांस नहीं', 'गंभीर', 'जहर', 'ज़हर', 'बचाओ', 'आत्महत्या'],
+    'ta': ['அவசரம்', 'உதவி', 'வலி', 'இரத்தப்போக்கு', 'நெஞ்சு வலி', 'மாரடைப்பு', 'பக்கவாதம்', 'மயக்கம்',
+           'மூச்சுத் திணறல்', 'கடுமையான', 'விஷம்'],
+    'te': ['అత్యవసరం', 'సహాయం', 'నొప్పి', 'రక్తస్రావం', 'ఛాతీ నొప్పి', 'గుండెపోటు', 'పక్షవాతం', 'స్పృహ తప్పి',
+           'శ్వాస తీసుకోవడం కష్టం', 'తీవ్రమైన', 'విషం'],
+    'bn': ['জরুরি', 'সাহায্য', 'ব্যথা', 'রক্তপাত', 'বুকে ব্যথা', 'হার্ট অ্যাটাক', 'স্ট্রোক', 'অজ্ঞান', 'শ্বাসকষ্ট',
+           'গুরুতর', 'বিষ'],
+    'gu': ['કટોકટી', 'મદદ', 'દુખાવો', 'રક્તસ્રાવ', 'છાતીમાં દુખાવો', 'હાર્ટ એટેક', 'સ્ટ્રોક', 'બેભાન',
+           'શ્વાસ લેવામાં તકલીફ', 'ગંભીર', 'ઝેર'],
+    'mr': ['आणीबाणी', 'तातडी', 'मदत', 'वेदना', 'दुखत', 'रक्तस्त्राव', 'छातीत दुखणे', 'हृदयविकाराचा झटका',
+           'स्ट्रोक', 'बेशुद्ध', 'श्वास घेण्यास त्रास', 'गंभीर', 'विष'],
+    'kn': ['ತುರ್ತು', 'ಸಹಾಯ', 'ನೋವು', 'ರಕ್ತಸ್ರಾವ', 'ಎದೆ ನೋವು', 'ಹೃದಯಾಘಾತ', 'ಪಾರ್ಶ್ವವಾಯು', 'ಪ್ರಜ್ಞೆ ತಪ್ಪಿ',
+           'ಉಸಿರಾಟದ ತೊಂದರೆ', 'ಗಂಭೀರ', 'ವಿಷ'],
+    'ml': ['അടിയന്തരം', 'സഹായം', 'വേദന', 'രക്തസ്രാവം', 'നെഞ്ചുവേദന', 'ഹൃദയാഘാതം', 'പക്ഷാഘാതം', 'ബോധം',
+           'ശ്വാസതടസ്സം', 'ഗുരുതരം', 'വിഷം'],
+    'or': ['ଜରୁରୀ', 'ସାହାଯ୍ୟ', 'ଯନ୍ତ୍ରଣା', 'ରକ୍ତସ୍ରାବ', 'ଛାତି ଯନ୍ତ୍ରଣା', 'ହୃଦଘାତ', 'ଷ୍ଟ୍ରୋକ', 'ଚେତାଶୂନ୍ୟ',
+           'ଶ୍ୱାସକଷ୍ଟ', 'ଗୁରୁତର', 'ବିଷ'],
+    'pa': ['ਐਮਰਜੈਂਸੀ', 'ਮਦਦ', 'ਦਰਦ', 'ਖੂਨ ਵਗਣਾ', 'ਛਾਤੀ ਵਿੱਚ ਦਰਦ', 'ਦਿਲ ਦਾ ਦੌਰਾ', 'ਸਟ੍ਰੋਕ', 'ਬੇਹੋਸ਼',
+           'ਸਾਹ ਲੈਣ ਵਿੱਚ ਤਕਲੀਫ਼', 'ਗੰਭੀਰ', 'ਜ਼ਹਿਰ'],
+    'as': ['জৰুৰী', 'সহায়', 'বিষ', 'তেজ ওলোৱা', 'বুকুৰ বিষ', 'হৃদৰোগৰ আক্ৰমণ', 'ষ্ট্ৰোক', 'অচেতন',
+           'উশাহ লোৱাত কষ্ট', 'গুৰুতৰ', 'বিহ'],
+    'ur': ['ایمرجنسی', 'ہنگامی', 'مدد', 'درد', 'خون بہنا', 'سینے میں درد', 'دل کا دورہ', 'فالج', 'بے ہوش',
+           'سانس لینے میں دشواری', 'شدید', 'زہر'],
+}
+
+# Agglutinative languages attach suffixes to the keyword, so only the start
+# of the word must line up with the keyword for these
+PREFIX_MATCH_LANGUAGES = {'ta', 'te', 'kn', 'ml'}
+
+# Inflectional suffixes a keyword may carry in other languages ("chest pains",
+# "seizures", "overdosed"); the start of the word must still line up, so
+# "helpful" does not match "help"
+KEYWORD_SUFFIXES = {
+    'en': ('s', 'es', 'd', 'ed', 'ing'),
+}
+
+# Guidance shown ahead of any model output when an emergency is detected
+EMERGENCY_GUIDANCE = {
+    'en': "This may be a medical emergency. Call 108 immediately or go to the nearest hospital.",
+    'hi': "यह चिकित्सा आपातकाल हो सकता है। तुरंत 108 पर कॉल करें या नज़दीकी अस्पताल जाएं।"
+}
+
+EmergencyMatch = namedtuple('EmergencyMatch', ['keyword', 'language', 'start', 'end'])
+
+
+def _normalize(text):
+    return unicodedata.normalize('NFC', text).casefold()
+
+
+def _is_word_char(char):
+    """Letters, combining marks (Indic vowel signs, viramas) and digits belong to a word"""
+    return unicodedata.category(char)[0] in 'LMN'
+
+
+class KeywordAutomaton:
+    """
+    Aho-Corasick automaton over a fixed keyword set.
+
+    Matching is a single pass over the text, linear in its length plus the
+    number of matches, regardless of how many keywords are loaded.
+    """
+
+    def __init__(self, entries):
+        # entries: iterable of (keyword, language, suffixes), where suffixes
+        # is True for any word continuation or a tuple of allowed suffixes
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+
+        for keyword, language, suffixes in entries:
+            self._add(_normalize(keyword), language, suffixes)
+        self._build_failure_links()
+
+    def _add(self, keyword, language, suffixes):
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state].append((keyword, language, suffixes))
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Inherit the outputs reachable through the failure link
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def iter_matches(self, text):
+        """
+        Yield EmergencyMatch for every keyword occurring on word boundaries.
+        Offsets refer to the NFC-normalized, casefolded text.
+        """
+        text = _normalize(text)
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        length = len(text)
+        state = 0
+
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for keyword, language, suffixes in output[state]:
+                start = position - len(keyword) + 1
+                end = position + 1
+                if start > 0 and _is_word_char(text[start - 1]):
+                    continue
+                if suffixes is not True and end < length and _is_word_char(text[end]):
+                    word_end = end
+                    while word_end < length and _is_word_char(text[word_end]):
+                        word_end += 1
+                    if text[end:word_end] not in suffixes:
+                        continue
+                yield EmergencyMatch(keyword, language, start, end)
+
+
+_automaton = KeywordAutomaton(
+    (keyword, language, True if language in PREFIX_MATCH_LANGUAGES else KEYWORD_SUFFIXES.get(language, ()))
+    for language, keywords in EMERGENCY_KEYWORDS.items()
+    for keyword in keywords
+)
+
+
+def find_emergency_keywords(message):
+    """Return every emergency keyword match in the message"""
+    if not message:
+        return []
+    return list(_automaton.iter_matches(message))
+
+
+def is_emergency(message):
+    """Check a message for emergency keywords in any supported language"""
+    if not message:
+        return False
+    return next(_automaton.iter_matches(message), None) is not None
+
+
+def emergency_guidance(language='en'):
+    """108 guidance text for the given language"""
+    return EMERGENCY_GUIDANCE.get(language, EMERGENCY_GUIDANCE['en'])
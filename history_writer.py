@@ -0,0 +1,209 @@
+import os
+import time
+import atexit
+import logging
+import threading
+from collections import deque
+
+from sqlalchemy import insert
+
+# Write-behind history configuration
+HISTORY_WRITE_BEHIND = os.environ.get("HISTORY_WRITE_BEHIND", "1").lower() in ('1', 'true', 'yes', 'on')
+HISTORY_FLUSH_SIZE = int(os.environ.get("HISTORY_FLUSH_SIZE", "100"))
+HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL", "1.0"))
+HISTORY_MAX_QUEUE = int(os.environ.get("HISTORY_MAX_QUEUE", "10000"))
+
+
+class HistoryWriter:
+    """
+    Write-behind queue for history rows.
+
+    Requests enqueue plain column dicts and return immediately; a background
+    thread writes them with one bulk INSERT per model whenever flush_size
+    rows are waiting or flush_interval seconds have passed. Remaining rows
+    are written at shutdown. When the queue is full the caller flushes
+    inline rather than dropping history.
+    """
+
+    def __init__(self, enabled=HISTORY_WRITE_BEHIND, flush_size=HISTORY_FLUSH_SIZE,
+                 flush_interval=HISTORY_FLUSH_INTERVAL, max_queue=HISTORY_MAX_QUEUE):
+        self.enabled = enabled
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._app = None
+        self._thread = None
+        self._queue = deque()
+        self._inflight = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopping = False
+        self._atexit = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+        self.inline_flushes = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self.total_flush_ms = 0.0
+
+    def init_app(self, app, start=True):
+        """Use the given Flask app and, unless start is False, start the writer thread"""
+        self._app = app
+        if start:
+            self.start()
+
+    def start(self):
+        """Start the writer thread in this process; call again in a forked child, which inherits no threads"""
+        if not self.enabled or (self._thread and self._thread.is_alive()):
+            return
+        if self._thread:
+            # The old thread is gone (e.g. left behind by a fork) and may have held these
+            self._condition = threading.Condition()
+            self._flush_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+        self._thread.start()
+        if not self._atexit:
+            atexit.register(self.close)
+            self._atexit = True
+
+    def add(self, model, **values):
+        """Queue one row for model"""
+        self.add_many(model, [values])
+
+    def add_many(self, model, rows):
+        """Queue several rows for model"""
+        rows = list(rows)
+        if not rows:
+            return
+
+        with self._condition:
+            self._queue.extend((model, row) for row in rows)
+            self.enqueued += len(rows)
+            depth = len(self._queue)
+            if depth >= self.flush_size:
+                self._condition.notify()
+
+        if not self._thread:
+            # Write-behind disabled: write in the caller
+            self.flush()
+        elif depth >= self.max_queue:
+            with self._condition:
+                self.inline_flushes += 1
+            logging.warning(f"History queue full ({depth} rows), flushing inline")
+            self.flush()
+
+    def pending(self, model, **match):
+        """Queued or in-flight rows for model whose values equal match, oldest first"""
+        with self._condition:
+            return [dict(row) for queued_model, row in self._inflight + list(self._queue)
+                    if queued_model is model and all(row.get(key) == value for key, value in match.items())]
+
+    def flush(self):
+        """Write every queued row now and return how many were written"""
+        with self._flush_lock:
+            with self._condition:
+                batch = self._inflight = list(self._queue)
+                self._queue.clear()
+            if not batch:
+                return 0
+
+            started = time.perf_counter()
+            try:
+                written = self._write(batch)
+            finally:
+                elapsed = (time.perf_counter() - started) * 1000
+                with self._condition:
+                    self._inflight = []
+
+            with self._condition:
+                self.flushes += 1
+                self.written += written
+                self.dropped += len(batch) - written
+                self.last_flush_ms = round(elapsed, 2)
+                self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+                self.total_flush_ms += elapsed
+            return written
+
+    def close(self):
+        """Stop the writer thread and write whatever is still queued"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=max(5.0, self.flush_interval * 2))
+        self.flush()
+
+    def stats(self):
+        """Return queue depth, throughput and flush latency"""
+        with self._condition:
+            return {
+                'enabled': bool(self._thread),
+                'queue_depth': len(self._queue),
+                'enqueued': self.enqueued,
+                'written': self.written,
+                'dropped': self.dropped,
+                'flushes': self.flushes,
+                'failed_flushes': self.failed_flushes,
+                'inline_flushes': self.inline_flushes,
+                'last_flush_ms': self.last_flush_ms,
+                'max_flush_ms': self.max_flush_ms,
+                'avg_flush_ms': round(self.total_flush_ms / self.flushes, 2) if self.flushes else 0.0
+            }
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if not self._stopping and len(self._queue) < self.flush_size:
+                    self._condition.wait(self.flush_interval)
+                stopping = self._stopping
+
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"History writer error: {str(e)}")
+            if stopping:
+                return
+
+    def _write(self, batch):
+        """Bulk insert the batch, one statement per model. Returns rows written."""
+        from app import db
+
+        grouped = {}
+        for model, row in batch:
+            grouped.setdefault(model, []).append(row)
+
+        with self._app.app_context():
+            written = 0
+            for model, rows in grouped.items():
+                try:
+                    db.session.execute(insert(model), rows)
+                    db.session.commit()
+                    written += len(rows)
+                except Exception as e:
+                    db.session.rollback()
+                    with self._condition:
+                        self.failed_flushes += 1
+                    logging.error(f"History bulk insert into {model.__tablename__} failed: {str(e)}")
+                    written += self._write_rows(model, rows)
+            return written
+
+    def _write_rows(self, model, rows):
+        """Fallback after a failed bulk insert: write rows one by one, skipping bad ones"""
+        from app import db
+
+        written = 0
+        for row in rows:
+            try:
+                db.session.execute(insert(model), [row])
+                db.session.commit()
+                written += 1
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Dropping {model.__tablename__} history row: {str(e)}")
+        return written
+
+
+history_writer = HistoryWriter()
@@ -0,0 +1,257 @@
+import io
+import os
+import time
+import hashlib
+from collections import namedtuple
+
+# PIL is imported inside the functions that use it, so importing this module
+# (for its config and hash helpers) does not load the imaging library.
+
+PreprocessConfig = namedtuple('PreprocessConfig', [
+    'enabled',           # run the pipeline at all
+    'draft',             # reduced-resolution JPEG decode
+    'max_dimension',     # cap on the longest side, in pixels
+    'target_dpi',        # downscale images scanned above this resolution
+    'binarize',          # adaptive (local background) thresholding
+    'binarize_radius',   # reduction factor of the background estimate
+    'binarize_offset',   # how much darker than the background counts as ink
+    'deskew',            # straighten rotated photos
+    'max_skew',          # largest skew angle searched, in degrees
+    'skew_step',         # angle resolution of the skew search
+    'crop',              # crop to the bounding box of the text
+    'crop_margin',       # margin kept around the text, in pixels
+])
+
+Fingerprint = namedtuple('Fingerprint', ['content_hash', 'perceptual_hash'])
+
+# Longest side of the decode used for fingerprinting
+FINGERPRINT_DIMENSION = 1024
+# The perceptual hash compares PERCEPTUAL_HASH_GRID x PERCEPTUAL_HASH_GRID cells
+PERCEPTUAL_HASH_GRID = 16
+
+DEFAULT_CONFIG = PreprocessConfig(
+    enabled=True,
+    draft=True,
+    max_dimension=2000,
+    target_dpi=300,
+    binarize=True,
+    binarize_radius=16,
+    binarize_offset=30,
+    deskew=True,
+    max_skew=5.0,
+    skew_step=0.5,
+    crop=True,
+    crop_margin=20,
+)
+
+
+def load_preprocess_config():
+    """Build the preprocessing configuration from OCR_* environment variables"""
+    def flag(name, default):
+        return os.environ.get(name, '1' if default else '0').lower() in ('1', 'true', 'yes', 'on')
+
+    return DEFAULT_CONFIG._replace(
+        enabled=flag('OCR_PREPROCESS', DEFAULT_CONFIG.enabled),
+        draft=flag('OCR_DRAFT_DECODE', DEFAULT_CONFIG.draft),
+        max_dimension=int(os.environ.get('OCR_MAX_DIMENSION', DEFAULT_CONFIG.max_dimension)),
+        target_dpi=int(os.environ.get('OCR_TARGET_DPI', DEFAULT_CONFIG.target_dpi)),
+        binarize=flag('OCR_BINARIZE', DEFAULT_CONFIG.binarize),
+        deskew=flag('OCR_DESKEW', DEFAULT_CONFIG.deskew),
+        crop=flag('OCR_CROP', DEFAULT_CONFIG.crop),
+    )
+
+
+def open_image(source, config=DEFAULT_CONFIG):
+    """
+    Open an image from bytes or a file-like object. JPEGs are decoded in
+    draft mode, which lets libjpeg scale down by a power of two while
+    decoding instead of materialising every pixel of a phone photo.
+    """
+    from PIL import Image
+
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    image = Image.open(source)
+
+    if config.enabled and config.draft and image.format == 'JPEG':
+        original_width = image.width
+        scale = config.max_dimension / max(image.size)
+        if scale < 1:
+            image.draft('L', (int(image.width * scale), int(image.height * scale)))
+            # Keep the reported DPI consistent with the reduced pixel size
+            dpi = image.info.get('dpi')
+            if dpi and image.width != original_width:
+                factor = image.width / original_width
+                image.info['dpi'] = (dpi[0] * factor, dpi[1] * factor)
+    return image
+
+
+def downscale(image, config=DEFAULT_CONFIG):
+    """Shrink to the target DPI (when the image reports one) and the size cap"""
+    from PIL import Image
+
+    factor = 1.0
+    dpi = image.info.get('dpi')
+    if dpi and dpi[0] and dpi[0] > config.target_dpi:
+        factor = config.target_dpi / float(dpi[0])
+    factor = min(factor, config.max_dimension / max(image.size))
+
+    if factor < 1:
+        size = (max(1, int(image.width * factor)), max(1, int(image.height * factor)))
+        image = image.resize(size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+    return image
+
+
+def adaptive_binarize(image, radius=16, offset=30):
+    """
+    Threshold each pixel against an estimate of the paper brightness around
+    it, which copes with uneven lighting and shadows far better than a global
+    threshold. The background is estimated on a copy reduced by radius, where
+    a max filter removes the text strokes, and scaled back up. Returns black
+    text on a white background.
+    """
+    from PIL import Image, ImageChops, ImageFilter
+
+    factor = max(1, min(radius, image.width // 8, image.height // 8))
+    background = (image.reduce(factor)
+                  .filter(ImageFilter.MaxFilter(3))
+                  .filter(ImageFilter.BoxBlur(1))
+                  .resize(image.size, Image.Resampling.BILINEAR))
+    darkness = ImageChops.subtract(background, image)
+    return darkness.point([0 if value > offset else 255 for value in range(256)])
+
+
+def estimate_skew(binary, max_skew=5.0, step=0.5):
+    """
+    Find the rotation that makes text lines horizontal by maximising the
+    variance of the row ink profile, computed on a small thumbnail. A coarse
+    search over whole degrees is refined around the best candidate.
+    """
+    from PIL import Image, ImageOps, ImageStat
+
+    ink = ImageOps.invert(binary)
+    ink.thumbnail((600, 600))
+    height = ink.height
+    scores = {}
+
+    def score(angle):
+        if angle not in scores:
+            rotated = ink.rotate(angle, resample=Image.Resampling.NEAREST, fillcolor=0)
+            profile = rotated.resize((1, height), Image.Resampling.BOX)
+            scores[angle] = ImageStat.Stat(profile).var[0]
+        return scores[angle]
+
+    coarse = max(step, 1.0)
+    steps = int(max_skew // coarse)
+    best_angle = max((index * coarse for index in range(-steps, steps + 1)), key=score)
+
+    fine = int(round(coarse / step))
+    candidates = [best_angle + index * step for index in range(-fine + 1, fine)]
+    return max((angle for angle in candidates if abs(angle) <= max_skew), key=score)
+
+
+def crop_to_text(binary, margin=20):
+    """Crop to the bounding box of the ink, ignoring isolated specks"""
+    from PIL import ImageOps
+
+    # Specks are filtered on a reduced copy; a 4x box reduction turns a
+    # lone dark pixel into a faint grey that the threshold drops
+    ink = ImageOps.invert(binary).reduce(4).point([255 if value > 96 else 0 for value in range(256)])
+    bbox = ink.getbbox()
+    if not bbox:
+        return binary
+    left, top, right, bottom = (edge * 4 for edge in bbox)
+    return binary.crop((max(0, left - margin), max(0, top - margin),
+                        min(binary.width, right + margin), min(binary.height, bottom + margin)))
+
+
+def preprocess_for_ocr(source, config=None):
+    """
+    Prepare a prescription photo for Tesseract: reduced decode, downscale,
+    grayscale, adaptive binarization, crop to the text region and deskew.
+    Returns the processed image and per-stage timings in milliseconds.
+    """
+    from PIL import Image, ImageOps
+
+    config = config or DEFAULT_CONFIG
+    timings = {}
+
+    started = time.perf_counter()
+    image = open_image(source, config)
+    image = ImageOps.exif_transpose(image)
+    if not config.enabled:
+        image = image.convert('RGB')
+        timings['decode'] = round((time.perf_counter() - started) * 1000, 2)
+        return image, {'timings': timings, 'skew': 0.0, 'size': image.size}
+
+    image = image.convert('L')
+    timings['decode'] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    image = downscale(image, config)
+    timings['downscale'] = round((time.perf_counter() - started) * 1000, 2)
+
+    if config.binarize:
+        started = time.perf_counter()
+        image = adaptive_binarize(image, config.binarize_radius, config.binarize_offset)
+        timings['binarize'] = round((time.perf_counter() - started) * 1000, 2)
+
+    # Cropping first keeps the rotation to the text region only
+    if config.crop and config.binarize:
+        started = time.perf_counter()
+        image = crop_to_text(image, config.crop_margin)
+        timings['crop'] = round((time.perf_counter() - started) * 1000, 2)
+
+    skew = 0.0
+    if config.deskew and config.binarize:
+        started = time.perf_counter()
+        skew = estimate_skew(image, config.max_skew, config.skew_step)
+        if skew:
+            image = image.rotate(skew, resample=Image.Resampling.BICUBIC, expand=True, fillcolor=255)
+            image = image.point([0 if value < 128 else 255 for value in range(256)])
+        timings['deskew'] = round((time.perf_counter() - started) * 1000, 2)
+
+    return image, {'timings': timings, 'skew': skew, 'size': image.size}
+
+
+def image_fingerprint(source, perceptual=True):
+    """
+    Identify an image by its pixels rather than its file bytes.
+
+    The content hash is a SHA-256 of the decoded, EXIF-oriented grayscale
+    pixels, so a re-upload with different metadata still matches. The
+    perceptual hash is a 256-bit difference hash of the binarized, cropped
+    and deskewed text region, which changes by only a few bits when the same
+    page is re-encoded or re-photographed. Both are hex strings; with
+    perceptual=False the costly perceptual hash is skipped and left None.
+    """
+    from PIL import Image, ImageOps
+
+    config = DEFAULT_CONFIG._replace(max_dimension=FINGERPRINT_DIMENSION)
+    image = ImageOps.exif_transpose(open_image(source, config)).convert('L')
+    image = downscale(image, config._replace(target_dpi=float('inf')))
+
+    digest = hashlib.sha256(f'{image.width}x{image.height}:'.encode())
+    digest.update(image.tobytes())
+    if not perceptual:
+        return Fingerprint(digest.hexdigest(), None)
+
+    text = crop_to_text(adaptive_binarize(image, config.binarize_radius, config.binarize_offset), 0)
+    skew = estimate_skew(text, config.max_skew, config.skew_step)
+    if skew:
+        text = crop_to_text(text.rotate(skew, fillcolor=255, expand=True), 0)
+
+    # Each bit records whether a grid cell holds less ink than its right neighbour
+    size = PERCEPTUAL_HASH_GRID
+    cells = text.resize((size + 1, size), Image.Resampling.BOX).tobytes()
+    bits = 0
+    for row in range(size):
+        for column in range(size):
+            index = row * (size + 1) + column
+            bits = (bits << 1) | (cells[index] > cells[index + 1])
+    return Fingerprint(digest.hexdigest(), f'{bits:0{size * size // 4}x}')
+
+
+def hash_distance(first, second):
+    """Number of differing bits between two hex perceptual hashes"""
+    return (int(first, 16) ^ int(second, 16)).bit_count()
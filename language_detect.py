@@ -0,0 +1,205 @@
+import math
+from bisect import bisect_right
+from collections import Counter, namedtuple
+
+# Unicode blocks for the scripts used by LANGUAGE_MAPPING
+SCRIPT_RANGES = [
+    (0x0041, 0x005A, 'latin'),
+    (0x0061, 0x007A, 'latin'),
+    (0x00C0, 0x024F, 'latin'),
+    (0x0600, 0x06FF, 'arabic'),
+    (0x0750, 0x077F, 'arabic'),
+    (0x0900, 0x097F, 'devanagari'),
+    (0x0980, 0x09FF, 'bengali'),
+    (0x0A00, 0x0A7F, 'gurmukhi'),
+    (0x0A80, 0x0AFF, 'gujarati'),
+    (0x0B00, 0x0B7F, 'oriya'),
+    (0x0B80, 0x0BFF, 'tamil'),
+    (0x0C00, 0x0C7F, 'telugu'),
+    (0x0C80, 0x0CFF, 'kannada'),
+    (0x0D00, 0x0D7F, 'malayalam'),
+    (0xFB50, 0xFDFF, 'arabic'),
+    (0xFE70, 0xFEFF, 'arabic'),
+]
+_RANGE_STARTS = [start for start, _, _ in SCRIPT_RANGES]
+
+# Languages written in each script
+SCRIPT_LANGUAGES = {
+    'latin': ['en'],
+    'arabic': ['ur'],
+    'devanagari': ['hi', 'mr'],
+    'bengali': ['bn', 'as'],
+    'gurmukhi': ['pa'],
+    'gujarati': ['gu'],
+    'oriya': ['or'],
+    'tamil': ['ta'],
+    'telugu': ['te'],
+    'kannada': ['kn'],
+    'malayalam': ['ml'],
+}
+
+# Latin text is English or an Indian language typed in Latin letters
+# (romanized Hindi, "Hinglish"); only English is detected locally, so the
+# romanized profile exists to take confidence away from it
+ROMANIZED = 'romanized'
+LATIN_PROFILES = ['en', ROMANIZED]
+
+# Seed text for the character n-gram profiles of same-script languages
+PROFILE_CORPORA = {
+    'en': """
+        Take this medicine twice a day after meals. I have a fever and my head is hurting.
+        The doctor said that you should rest. Can you help me with this?
+        The child has a cough and a cold. Drink plenty of water and sleep on time.
+        My stomach hurts a lot, what should I do? This tablet is to be taken morning and evening.
+        If you have trouble breathing go to the hospital immediately. Diabetic patients should eat less sugar.
+        Your blood pressure is higher than normal. I have not been feeling well since yesterday.
+        She is feeling dizzy and has been vomiting too. It is important to finish the full course of the medicine.
+    """,
+    ROMANIZED: """
+        Yeh dawa din mein do baar khane ke baad lein. Mujhe bukhar hai aur sir mein dard ho raha hai.
+        Doctor ne kaha ki aapko aaram karna chahiye. Kya aap meri madad kar sakte hain?
+        Bachche ko khansi aur jukam hai. Paani zyada piyen aur samay par soyen.
+        Mere pet mein bahut dard hai, main kya karun? Yeh goli subah aur shaam ko leni hai.
+        Agar saans lene mein takleef ho to turant aspatal jaayen. Sugar ke mareezon ko meetha kam khana chahiye.
+        Aapka BP normal se zyada hai. Main kal se theek mehsoos nahi kar raha hoon.
+        Use chakkar aa rahe hain aur ulti bhi ho rahi hai. Dawai ka poora course khatam karna zaroori hai.
+        Mala taap aahe ani doka dukhat aahe. Amar jwor hoyeche aar matha byatha korche.
+    """,
+    'hi': """
+        यह दवा दिन में दो बार खाने के बाद लें। मुझे बुखार है और सिर में दर्द हो रहा है।
+        डॉक्टर ने कहा कि आपको आराम करना चाहिए। क्या आप मेरी मदद कर सकते हैं?
+        बच्चे को खांसी और जुकाम है। पानी ज्यादा पिएं और समय पर सोएं।
+        मेरे पेट में बहुत दर्द है, मैं क्या करूं? यह गोली सुबह और शाम को लेनी है।
+        अगर सांस लेने में तकलीफ हो तो तुरंत अस्पताल जाएं। मधुमेह के मरीजों को मीठा कम खाना चाहिए।
+        आपका रक्तचाप सामान्य से अधिक है। मैं कल से ठीक महसूस नहीं कर रहा हूं।
+        उसे चक्कर आ रहे हैं और उल्टी भी हो रही है। दवा का पूरा कोर्स खत्म करना ज़रूरी है।
+    """,
+    'mr': """
+        हे औषध दिवसातून दोन वेळा जेवणानंतर घ्या. मला ताप आहे आणि डोकं दुखत आहे.
+        डॉक्टरांनी सांगितले की तुम्ही विश्रांती घ्यावी. तुम्ही मला मदत करू शकता का?
+        मुलाला खोकला आणि सर्दी झाली आहे. भरपूर पाणी प्या आणि वेळेवर झोपा.
+        माझ्या पोटात खूप दुखत आहे, मी काय करू? ही गोळी सकाळी आणि संध्याकाळी घ्यायची आहे.
+        श्वास घेण्यास त्रास होत असेल तर लगेच रुग्णालयात जा. मधुमेहाच्या रुग्णांनी गोड कमी खावे.
+        तुमचा रक्तदाब सामान्यपेक्षा जास्त आहे. मला कालपासून बरं वाटत नाही.
+        त्याला चक्कर येत आहे आणि उलटी पण होत आहे. औषधाचा पूर्ण कोर्स संपवणे आवश्यक आहे.
+    """,
+    'bn': """
+        এই ওষুধটি দিনে দুইবার খাবারের পরে খাবেন। আমার জ্বর হয়েছে এবং মাথা ব্যথা করছে।
+        ডাক্তার বলেছেন আপনার বিশ্রাম নেওয়া উচিত। আপনি কি আমাকে সাহায্য করতে পারবেন?
+        বাচ্চার কাশি আর সর্দি হয়েছে। বেশি করে জল খান এবং সময়মতো ঘুমান।
+        আমার পেটে খুব ব্যথা করছে, আমি কী করব? এই বড়িটি সকালে আর সন্ধ্যায় খেতে হবে।
+        শ্বাস নিতে কষ্ট হলে এখনই হাসপাতালে যান। ডায়াবেটিস রোগীদের মিষ্টি কম খাওয়া উচিত।
+        আপনার রক্তচাপ স্বাভাবিকের চেয়ে বেশি। আমি গতকাল থেকে ভালো বোধ করছি না।
+        তার মাথা ঘুরছে এবং বমিও হচ্ছে। ওষুধের পুরো কোর্স শেষ করা দরকার।
+    """,
+    'as': """
+        এই দৰবটো দিনটোত দুবাৰ খোৱাৰ পিছত খাব। মোৰ জ্বৰ হৈছে আৰু মূৰ বিষাইছে।
+        ডাক্তৰে কৈছে যে আপুনি জিৰণি লোৱা উচিত। আপুনি মোক সহায় কৰিব পাৰিবনে?
+        কেঁচুৱাটোৰ কাহ আৰু চৰ্দি হৈছে। বেছিকৈ পানী খাওক আৰু সময়মতে শুওক।
+        মোৰ পেটত বৰ বিষ হৈছে, মই কি কৰিম? এই বড়িটো ৰাতিপুৱা আৰু সন্ধিয়া খাব লাগিব।
+        উশাহ ল'বলৈ কষ্ট হ'লে এতিয়াই চিকিৎসালয়লৈ যাওক। মধুমেহৰ ৰোগীয়ে মিঠা কম খাব লাগে।
+        আপোনাৰ ৰক্তচাপ স্বাভাৱিকতকৈ বেছি। মই কালিৰ পৰা ভাল পোৱা নাই।
+        তেওঁৰ মূৰ ঘূৰাইছে আৰু বমিও হৈছে। দৰবৰ সম্পূৰ্ণ কোৰ্চ শেষ কৰাটো প্ৰয়োজনীয়।
+    """,
+}
+
+NGRAM_SIZES = (1, 2, 3)
+WORD_PUNCTUATION = '.,;:!?।॥()"\''
+
+DetectionResult = namedtuple('DetectionResult', ['language', 'confidence', 'script'])
+
+
+def char_script(char):
+    """Return the script name of a character, or None for digits/punctuation"""
+    code = ord(char)
+    position = bisect_right(_RANGE_STARTS, code) - 1
+    if position >= 0:
+        start, end, script = SCRIPT_RANGES[position]
+        if start <= code <= end:
+            return script
+    return None
+
+
+def script_histogram(text):
+    """Count letters per script in the text"""
+    histogram = Counter()
+    for char in text:
+        script = char_script(char)
+        if script:
+            histogram[script] += 1
+    return histogram
+
+
+def extract_ngrams(text):
+    """Character n-grams of each word, padded with word boundaries"""
+    ngrams = []
+    for word in text.split():
+        word = ' ' + word.strip(WORD_PUNCTUATION) + ' '
+        for size in NGRAM_SIZES:
+            ngrams.extend(word[i:i + size] for i in range(len(word) - size + 1))
+    return ngrams
+
+
+class NgramProfile:
+    """Smoothed character n-gram log-probabilities for one language"""
+
+    def __init__(self, corpus):
+        counts = Counter(extract_ngrams(corpus))
+        self.total = sum(counts.values())
+        self.vocabulary = len(counts) + 1
+        self.log_probs = {gram: math.log((count + 1) / (self.total + self.vocabulary))
+                          for gram, count in counts.items()}
+        self.unseen = math.log(1 / (self.total + self.vocabulary))
+
+    def score(self, ngrams):
+        log_probs = self.log_probs
+        unseen = self.unseen
+        return sum(log_probs.get(gram, unseen) for gram in ngrams)
+
+
+PROFILES = {lang: NgramProfile(corpus) for lang, corpus in PROFILE_CORPORA.items()}
+
+
+def _disambiguate(text, languages):
+    """Pick between same-script languages (or Latin profiles) using the n-gram profiles"""
+    ngrams = extract_ngrams(text)
+    if not ngrams:
+        return languages[0], 0.0
+
+    scores = sorted(((PROFILES[lang].score(ngrams), lang) for lang in languages), reverse=True)
+    best_score, best_lang = scores[0]
+    # Overlapping n-gram orders are not independent, so damp the ratio
+    margin = (best_score - scores[1][0]) / len(NGRAM_SIZES)
+    # Logistic of the log-likelihood ratio: the posterior for equal priors
+    confidence = 1 / (1 + math.exp(-min(margin, 50)))
+    return best_lang, confidence
+
+
+def detect_script_language(text):
+    """
+    Detect the language of text locally from its Unicode script histogram,
+    using n-gram profiles to separate languages that share a script.
+
+    The confidence is the share of the main script times the profile
+    posterior, so mixed-script text and Latin text that reads like romanized
+    Hindi come out below the caller's threshold and are left to Gemini.
+    """
+    histogram = script_histogram(text or '')
+    letters = sum(histogram.values())
+    if not letters:
+        return DetectionResult('en', 0.0, None)
+
+    script, count = histogram.most_common(1)[0]
+    script_share = count / letters
+    languages = SCRIPT_LANGUAGES[script]
+
+    if script == 'latin':
+        language, confidence = _disambiguate(text, LATIN_PROFILES)
+        english = confidence if language == 'en' else 1 - confidence
+        return DetectionResult('en', script_share * english, script)
+
+    if len(languages) == 1:
+        return DetectionResult(languages[0], script_share, script)
+
+    language, confidence = _disambiguate(text, languages)
+    return DetectionResult(language, script_share * confidence, script)
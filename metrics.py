@@ -0,0 +1,249 @@
+import os
+import re
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import g, request
+
+# Metrics configuration
+METRICS = os.environ.get("METRICS", "1").lower() in ('1', 'true', 'yes', 'on')
+METRICS_PREFIX = 'meditranslate_'
+
+# Histogram upper bounds in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def metric_name(*parts):
+    """Prometheus-safe metric name from dotted/free-form parts"""
+    return METRICS_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', '_'.join(parts)).lower()
+
+
+class _Metric:
+    """
+    Base for metrics with labels. Each label combination has its own child
+    values and each metric its own lock, held only for the few additions of
+    an update, so collection costs about as much as a dict lookup.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = METRICS_PREFIX + name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            values = [(labels, self._snapshot(value)) for labels, value in self._values.items()]
+        for labels, value in sorted(values, key=lambda item: item[0]):
+            lines.extend(self._render_child(labels, value))
+        return lines
+
+    def _snapshot(self, value):
+        return value
+
+    def _render_child(self, labels, value):
+        return [f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        # The bucket is found before taking the lock
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._values.get(labels)
+            if child is None:
+                child = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            child[0][index] += 1
+            child[1] += value
+            child[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def _snapshot(self, value):
+        return list(value[0]), value[1], value[2]
+
+    def _render_child(self, labels, value):
+        counts, total, count = value
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, [("le", _number(bound))])} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}')
+        lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {count}')
+        return lines
+
+
+class Metrics:
+    """
+    In-process metrics in the Prometheus text format.
+
+    Request latency and in-flight gauges come from Flask request hooks, DB
+    commit time from SQLAlchemy session events, and AI and OCR timings from
+    their call sites. The existing stats() of the caches and services are
+    added as gauges at scrape time, so the hot paths pay nothing for them.
+    """
+
+    def __init__(self, enabled=METRICS):
+        self.enabled = enabled
+        self.request_duration = Histogram('http_request_duration_seconds', 'Request latency by route',
+                                          ('method', 'route', 'status'))
+        self.requests_in_flight = Gauge('http_requests_in_flight', 'Requests being handled by route', ('route',))
+        self.ai_duration = Histogram('ai_call_duration_seconds', 'Gemini call latency by function', ('function',))
+        self.ai_errors = Counter('ai_call_errors_total', 'Failed Gemini calls by function and error',
+                                 ('function', 'error'))
+        self.ocr_duration = Histogram('ocr_duration_seconds', 'OCR latency per image, queueing included')
+        self.ocr_stage_duration = Histogram('ocr_stage_duration_seconds', 'OCR worker time per stage', ('stage',),
+                                            buckets=FAST_BUCKETS + (2.5, 5.0, 10.0))
+        self.db_commit_duration = Histogram('db_commit_duration_seconds', 'Session commit latency',
+                                            buckets=FAST_BUCKETS)
+        self._metrics = [self.request_duration, self.requests_in_flight, self.ai_duration, self.ai_errors,
+                         self.ocr_duration, self.ocr_stage_duration, self.db_commit_duration]
+
+    def init_app(self, app):
+        """Time requests and DB commits for the given Flask app"""
+        if not self.enabled:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.orm import Session
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        event.listen(Session, 'before_commit', self._before_commit)
+        event.listen(Session, 'after_commit', self._after_commit)
+        event.listen(Session, 'after_soft_rollback', self._after_rollback)
+
+    @contextmanager
+    def ai_call(self, function):
+        """Time one Gemini call and count it as an error if it raises"""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.ai_errors.inc(function, type(e).__name__)
+            raise
+        finally:
+            self.ai_duration.observe(time.perf_counter() - started, function)
+
+    def observe_ocr(self, seconds, timings=None):
+        """Record an OCR result; timings are the worker's per-stage milliseconds"""
+        self.ocr_duration.observe(seconds)
+        for stage, milliseconds in (timings or {}).items():
+            self.ocr_stage_duration.observe(milliseconds / 1000.0, stage)
+
+    def render(self, sources=None):
+        """Prometheus text exposition of every metric plus gauges from the stats() sources"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for source, stats in (sources or {}).items():
+            lines.extend(self._render_stats(source, stats))
+        return '\n'.join(lines) + '\n'
+
+    def _render_stats(self, prefix, stats):
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                lines.extend(self._render_stats(f'{prefix}_{key}', value))
+                continue
+            if isinstance(value, bool):
+                value = int(value)
+            if not isinstance(value, (int, float)):
+                continue
+            name = metric_name(prefix, key)
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {_number(value)}')
+        return lines
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.metrics_route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        self.requests_in_flight.inc(g.metrics_route)
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, error=None):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        route = g.pop('metrics_route')
+        self.requests_in_flight.dec(route)
+        # A streamed response is torn down once its generator finishes
+        status = g.pop('metrics_status', 500)
+        self.request_duration.observe(time.perf_counter() - started, request.method, route, str(status))
+
+    def _before_commit(self, session):
+        session.info['metrics_commit_started'] = time.perf_counter()
+
+    def _after_commit(self, session):
+        started = session.info.pop('metrics_commit_started', None)
+        if started is not None:
+            self.db_commit_duration.observe(time.perf_counter() - started)
+
+    def _after_rollback(self, session, previous_transaction):
+        session.info.pop('metrics_commit_started', None)
+
+
+metrics = Metrics()
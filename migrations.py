@@ -0,0 +1,200 @@
+import logging
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, bindparam, inspect, select, text, update
+from sqlalchemy.exc import IntegrityError
+
+# Applied migrations are recorded here, one row per version
+_metadata = MetaData()
+schema_migrations = Table(
+    'schema_migrations', _metadata,
+    Column('version', Integer, primary_key=True),
+    Column('name', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def add_column(connection, table, column, column_type):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    existing = {info['name'] for info in inspect(connection).get_columns(table)}
+    if column not in existing:
+        connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+
+
+def create_index(connection, model, name):
+    """Create one of the model's declared indexes unless it already exists"""
+    index = next(index for index in model.__table__.indexes if index.name == name)
+    index.create(bind=connection, checkfirst=True)
+
+
+def drop_index(connection, table, name):
+    """Drop an index if it exists"""
+    if any(index['name'] == name for index in inspect(connection).get_indexes(table)):
+        connection.execute(text(f'DROP INDEX {name}' if connection.dialect.name != 'mysql'
+                                else f'DROP INDEX {name} ON {table}'))
+
+
+def _baseline(connection, db):
+    """Tables as defined in models.py; existing tables are left alone"""
+    db.metadata.create_all(bind=connection)
+    # Columns missing from databases created by early versions of the app
+    add_column(connection, 'chat_history', 'language', 'VARCHAR(10)')
+    add_column(connection, 'chat_history', 'timestamp', 'DATETIME')
+
+
+def _prescription_fingerprints(connection, db):
+    from models import PrescriptionScan
+
+    add_column(connection, 'prescription_scan', 'content_hash', 'VARCHAR(64)')
+    add_column(connection, 'prescription_scan', 'perceptual_hash', 'VARCHAR(64)')
+    add_column(connection, 'prescription_scan', 'result_json', 'TEXT')
+    create_index(connection, PrescriptionScan, 'ix_prescription_scan_content_hash')
+
+
+def _history_indexes(connection, db):
+    from models import ChatHistory, MedicationReminder, ScanJob
+
+    create_index(connection, ChatHistory, 'ix_chat_history_session_time')
+    create_index(connection, MedicationReminder, 'ix_medication_reminder_active')
+    drop_index(connection, 'scan_job', 'ix_scan_job_status')
+    create_index(connection, ScanJob, 'ix_scan_job_claim')
+
+
+def _translation_text_hash(connection, db):
+    from models import TranslationHistory
+    from translation_cache import hash_text
+
+    add_column(connection, 'translation_history', 'text_hash', 'VARCHAR(64)')
+
+    # Backfill existing rows in id order, a batch at a time
+    table = TranslationHistory.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.original_text)
+            .where(table.c.id > last_id, table.c.text_hash.is_(None))
+            .order_by(table.c.id)
+            .limit(5000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        connection.execute(
+            update(table).where(table.c.id == bindparam('row_id')).values(text_hash=bindparam('hash')),
+            [{'row_id': row.id, 'hash': hash_text(row.original_text)} for row in rows]
+        )
+
+    create_index(connection, TranslationHistory, 'ix_translation_history_lookup')
+    create_index(connection, TranslationHistory, 'ix_translation_history_time')
+
+
+def _history_owners(connection, db):
+    from models import TranslationHistory
+
+    add_column(connection, 'translation_history', 'user_id', 'VARCHAR(100)')
+    create_index(connection, TranslationHistory, 'ix_translation_history_user_time')
+
+    # Chat rows from databases that predate the timestamp column cannot be
+    # paginated; early versions recorded the time as created_at
+    columns = {info['name'] for info in inspect(connection).get_columns('chat_history')}
+    if 'created_at' in columns:
+        connection.execute(text('UPDATE chat_history SET timestamp = created_at WHERE timestamp IS NULL'))
+
+
+def _conversation_summaries(connection, db):
+    from models import ConversationSummary
+
+    ConversationSummary.__table__.create(bind=connection, checkfirst=True)
+
+
+def _reminder_time_slots(connection, db):
+    from models import MedicationReminder, ReminderTimeSlot
+    from reminder_scheduler import parse_time_slots
+
+    ReminderTimeSlot.__table__.create(bind=connection, checkfirst=True)
+    add_column(connection, 'medication_reminder', 'updated_at', 'DATETIME')
+    connection.execute(text('UPDATE medication_reminder SET updated_at = created_at WHERE updated_at IS NULL'))
+    create_index(connection, MedicationReminder, 'ix_medication_reminder_updated')
+
+    # Normalise the time_slots JSON of existing reminders, a batch at a time
+    reminders = MedicationReminder.__table__
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            select(reminders.c.id, reminders.c.time_slots)
+            .where(reminders.c.id > last_id)
+            .order_by(reminders.c.id)
+            .limit(5000)
+        ).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        slots = [{'reminder_id': row.id, 'minute_of_day': minute}
+                 for row in rows for minute in parse_time_slots(row.time_slots)]
+        if slots:
+            connection.execute(ReminderTimeSlot.__table__.insert(), slots)
+
+
+def _push_delivery(connection, db):
+    from models import PushSubscription, ReminderDelivery
+
+    PushSubscription.__table__.create(bind=connection, checkfirst=True)
+    ReminderDelivery.__table__.create(bind=connection, checkfirst=True)
+
+
+def _cache_versions(connection, db):
+    from models import CacheVersion
+
+    CacheVersion.__table__.create(bind=connection, checkfirst=True)
+    connection.execute(CacheVersion.__table__.insert().values(
+        name='reminders', version=0, updated_at=datetime.utcnow()))
+
+
+# Ordered list of (version, name, function). Append new migrations; never
+# renumber or edit one that has shipped.
+MIGRATIONS = [
+    (1, 'baseline schema', _baseline),
+    (2, 'prescription scan fingerprints', _prescription_fingerprints),
+    (3, 'history and queue indexes', _history_indexes),
+    (4, 'translation history text hash', _translation_text_hash),
+    (5, 'translation history owner', _history_owners),
+    (6, 'conversation summaries', _conversation_summaries),
+    (7, 'reminder time slots', _reminder_time_slots),
+    (8, 'push subscriptions and reminder deliveries', _push_delivery),
+    (9, 'page cache versions', _cache_versions),
+]
+
+
+def current_version(connection):
+    """Highest applied migration version, 0 for a database that has none"""
+    _metadata.create_all(bind=connection)
+    return connection.execute(select(schema_migrations.c.version)
+                              .order_by(schema_migrations.c.version.desc())
+                              .limit(1)).scalar() or 0
+
+
+def upgrade(db, target=None):
+    """
+    Apply pending migrations in order, each in its own transaction together
+    with its schema_migrations row. Returns the list of versions applied.
+    """
+    engine = db.engine
+    with engine.begin() as connection:
+        version = current_version(connection)
+
+    applied = []
+    for number, name, migrate in MIGRATIONS:
+        if number <= version or (target is not None and number > target):
+            continue
+        try:
+            with engine.begin() as connection:
+                migrate(connection, db)
+                connection.execute(schema_migrations.insert().values(
+                    version=number, name=name, applied_at=datetime.utcnow()))
+        except IntegrityError:
+            # Another process applied this version concurrently
+            logging.info(f"Migration {number} already applied")
+            continue
+        logging.info(f"Applied migration {number}: {name}")
+        applied.append(number)
+    return applied
@@ -1,6 +1,11 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Integer, String, DateTime, Text, Boolean
+from sqlalchemy import Integer, String, DateTime, Text, Boolean, LargeBinary, ForeignKey, Index, UniqueConstraint
+from translation_cache import hash_text
+
+def _translation_text_hash(context):
+    """Default for TranslationHistory.text_hash, also applied to bulk inserts"""
+    return hash_text(context.get_current_parameters().get('original_text'))
 
 class MedicationReminder(db.Model):
     id = db.Column(Integer, primary_key=True)
@@ -13,6 +18,25 @@ class MedicationReminder(db.Model):
     is_active = db.Column(Boolean, default=True)
     notes = db.Column(Text, nullable=True)
     created_at = db.Column(DateTime, default=datetime.utcnow)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        # Pages list active reminders
+        Index('ix_medication_reminder_active', 'is_active'),
+        # The reminder scheduler picks up changes made by other processes
+        Index('ix_medication_reminder_updated', 'updated_at'),
+    )
+
+class ReminderTimeSlot(db.Model):
+    id = db.Column(Integer, primary_key=True)
+    reminder_id = db.Column(Integer, ForeignKey('medication_reminder.id'), nullable=False)
+    minute_of_day = db.Column(Integer, nullable=False)  # local time of the dose, minutes after midnight
+
+    __table_args__ = (
+        Index('ix_reminder_time_slot_reminder', 'reminder_id'),
+        # Doses by time of day
+        Index('ix_reminder_time_slot_minute', 'minute_of_day', 'reminder_id'),
+    )
 
 class ChatHistory(db.Model):
     id = db.Column(Integer, primary_key=True)
@@ -22,6 +46,41 @@ class ChatHistory(db.Model):
     language = db.Column(String(10), default='en')
     timestamp = db.Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # A session's conversation in time order
+        Index('ix_chat_history_session_time', 'session_id', 'timestamp', 'id'),
+    )
+
+class PushSubscription(db.Model):
+    id = db.Column(Integer, primary_key=True)
+    endpoint = db.Column(String(1000), unique=True, nullable=False)  # push service URL of the browser
+    p256dh = db.Column(String(200), nullable=True)  # client public key for payload encryption
+    auth = db.Column(String(100), nullable=True)
+    failures = db.Column(Integer, nullable=False, default=0)  # consecutive failed sends
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    last_sent_at = db.Column(DateTime, nullable=True)
+
+class ReminderDelivery(db.Model):
+    id = db.Column(Integer, primary_key=True)
+    reminder_id = db.Column(Integer, nullable=False)
+    due_at = db.Column(DateTime, nullable=False)  # UTC
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        # One process claims each dose before pushing it
+        UniqueConstraint('reminder_id', 'due_at', name='uq_reminder_delivery_dose'),
+        Index('ix_reminder_delivery_created', 'created_at'),
+    )
+
+class ConversationSummary(db.Model):
+    id = db.Column(Integer, primary_key=True)
+    session_id = db.Column(String(100), unique=True, nullable=False)
+    summary = db.Column(Text, nullable=True)  # rolling summary of turns up to last_turn
+    last_turn_id = db.Column(Integer, nullable=True)  # newest ChatHistory row covered
+    last_turn_at = db.Column(DateTime, nullable=True)
+    turns = db.Column(Integer, nullable=False, default=0)  # number of turns summarised
+    updated_at = db.Column(DateTime, default=datetime.utcnow)
+
 class TranslationHistory(db.Model):
     id = db.Column(Integer, primary_key=True)
     original_text = db.Column(Text, nullable=False)
@@ -29,6 +88,17 @@ class TranslationHistory(db.Model):
     source_language = db.Column(String(10), nullable=False)
     target_language = db.Column(String(10), nullable=False)
     timestamp = db.Column(DateTime, default=datetime.utcnow)
+    text_hash = db.Column(String(64), nullable=True, default=_translation_text_hash)  # hash of the normalized original text
+    user_id = db.Column(String(100), nullable=True)  # browser or signed-in user the translation was made for
+
+    __table_args__ = (
+        # Translation cache lookups: language pair + text, newest first
+        Index('ix_translation_history_lookup', 'source_language', 'target_language', 'text_hash', 'timestamp'),
+        # History listing, newest first
+        Index('ix_translation_history_time', 'timestamp', 'id'),
+        # A user's history, newest first
+        Index('ix_translation_history_user_time', 'user_id', 'timestamp', 'id'),
+    )
 
 class PrescriptionScan(db.Model):
     id = db.Column(Integer, primary_key=True)
@@ -37,6 +107,29 @@ class PrescriptionScan(db.Model):
     dosages = db.Column(Text, nullable=True)  # JSON string
     instructions = db.Column(Text, nullable=True)
     timestamp = db.Column(DateTime, default=datetime.utcnow)
+    content_hash = db.Column(String(64), nullable=True, index=True)  # SHA-256 of the decoded pixels
+    perceptual_hash = db.Column(String(64), nullable=True)  # dHash of the text region, hex
+    result_json = db.Column(Text, nullable=True)  # structured result served to repeat uploads
+
+class ScanJob(db.Model):
+    id = db.Column(String(36), primary_key=True)  # UUID handed to the client
+    status = db.Column(String(20), nullable=False, default='queued')  # queued, running, done, failed
+    filename = db.Column(String(255), nullable=True)
+    image_data = db.Column(LargeBinary, nullable=True)  # cleared once the job finishes
+    attempts = db.Column(Integer, nullable=False, default=0)
+    stage_timings = db.Column(Text, nullable=True)  # JSON string
+    result = db.Column(Text, nullable=True)  # JSON string
+    error = db.Column(Text, nullable=True)
+    scan_id = db.Column(Integer, ForeignKey('prescription_scan.id'), nullable=True)
+    available_at = db.Column(DateTime, nullable=False, default=datetime.utcnow)  # not claimed before this time
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    started_at = db.Column(DateTime, nullable=True)
+    finished_at = db.Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        # Workers claim the oldest available queued job
+        Index('ix_scan_job_claim', 'status', 'available_at', 'created_at'),
+    )
 
 class UserSettings(db.Model):
     id = db.Column(Integer, primary_key=True)
@@ -47,3 +140,8 @@ class UserSettings(db.Model):
     notifications_enabled = db.Column(Boolean, default=True)
     settings_data = db.Column(Text, nullable=True)  # JSON string for compatibility
     updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class CacheVersion(db.Model):
+    name = db.Column(String(50), primary_key=True)  # data set a cached page depends on, e.g. 'reminders'
+    version = db.Column(Integer, nullable=False, default=0)  # bumped with every change to the data set
+    updated_at = db.Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,230 @@
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from ai_executor import AIOverloadedError
+from metrics import metrics
+from image_preprocessing import preprocess_for_ocr, load_preprocess_config
+
+# OCR worker pool configuration
+OCR_POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", str(os.cpu_count() or 1)))
+OCR_MAX_PENDING = int(os.environ.get("OCR_MAX_PENDING", str(OCR_POOL_SIZE * 2)))
+OCR_TIMEOUT = float(os.environ.get("OCR_TIMEOUT", "60"))
+OCR_RETRY_AFTER = int(os.environ.get("OCR_RETRY_AFTER", "5"))
+
+OCR_LANGUAGE = 'eng'
+# Tesseract page segmentation mode; 6 (a single uniform block of text) is the
+# mode scans have always used
+OCR_PSM = int(os.environ.get("OCR_PSM", "6"))
+# Optional character whitelist. Off by default: a whitelist drops characters
+# prescriptions do use, such as %, µ and non-Latin script
+OCR_CHAR_WHITELIST = os.environ.get("OCR_CHAR_WHITELIST", "")
+
+TESSERACT_CONFIG = f'--oem 3 --psm {OCR_PSM}'
+if OCR_CHAR_WHITELIST:
+    TESSERACT_CONFIG += f' -c tessedit_char_whitelist={OCR_CHAR_WHITELIST}'
+
+
+class OCRPoolSaturated(AIOverloadedError):
+    """Raised when every OCR worker is busy and the pending queue is full"""
+
+    def __init__(self, retry_after=OCR_RETRY_AFTER):
+        super().__init__(retry_after)
+        self.args = ('OCR service is busy, please retry later',)
+
+
+# Per-process worker state, set up once by _init_worker
+_engine = None
+_tesseract_api = None
+
+
+def _init_worker():
+    """
+    Load the OCR engine once per worker process. tesserocr keeps the eng
+    traineddata resident and reads images from memory; without it the
+    worker falls back to pytesseract, which shells out per image.
+    """
+    global _engine, _tesseract_api
+    try:
+        import tesserocr
+        _tesseract_api = tesserocr.PyTessBaseAPI(lang=OCR_LANGUAGE, psm=OCR_PSM, oem=tesserocr.OEM.DEFAULT)
+        if OCR_CHAR_WHITELIST:
+            _tesseract_api.SetVariable('tessedit_char_whitelist', OCR_CHAR_WHITELIST)
+        _engine = 'tesserocr'
+    except Exception:
+        _tesseract_api = None
+        _engine = 'pytesseract'
+
+
+def _ocr_worker(data, config):
+    """Preprocess and OCR one image inside a worker process"""
+    image, preprocessing = preprocess_for_ocr(data, config)
+
+    started = time.perf_counter()
+    if _tesseract_api is not None:
+        _tesseract_api.SetImage(image)
+        text = _tesseract_api.GetUTF8Text()
+    else:
+        import pytesseract
+        text = pytesseract.image_to_string(image, lang=OCR_LANGUAGE, config=TESSERACT_CONFIG)
+    preprocessing['timings']['ocr'] = round((time.perf_counter() - started) * 1000, 2)
+    preprocessing['engine'] = _engine
+    return text, preprocessing
+
+
+class OCRService:
+    """
+    Pool of long-lived OCR worker processes.
+
+    Each worker loads the OCR engine once and then takes image buffers from
+    the pool, so a scan costs preprocessing plus recognition instead of a
+    process spawn and model load. At most max_pending images may be queued
+    or running; beyond that callers get OCRPoolSaturated immediately.
+    """
+
+    def __init__(self, workers=OCR_POOL_SIZE, max_pending=OCR_MAX_PENDING, timeout=OCR_TIMEOUT):
+        self.workers = max(1, workers)
+        self.max_pending = max(self.workers, max_pending)
+        self.timeout = timeout
+        self.preprocess_config = load_preprocess_config()
+        self.engine = None
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.restarts = 0
+        self.total_ms = 0.0
+
+    def ocr_image(self, data, timeout=None):
+        """
+        Preprocess and OCR an in-memory image on the pool. Returns the raw
+        text and a dict of preprocessing details and stage timings.
+        """
+        return self.submit(data).result(timeout=self.timeout if timeout is None else timeout)
+
+    def ocr_pages(self, pages, timeout=None):
+        """
+        OCR several images in parallel and return their (text, details)
+        results in input order. Only the first page fails fast when the pool
+        is saturated; the rest wait for a free slot, so a long document
+        cannot monopolise the pending queue.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        futures = []
+        try:
+            for index, data in enumerate(pages):
+                futures.append(self.submit(data, block=index > 0, timeout=timeout))
+            return [future.result(timeout=timeout) for future in futures]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def submit(self, data, block=False, timeout=None):
+        """
+        Queue an image buffer for OCR and return its future. With block set,
+        wait up to timeout for a free slot instead of failing immediately.
+        """
+        if not self._slots.acquire(blocking=block, timeout=timeout if block else None):
+            with self._lock:
+                self.rejected += 1
+            logging.warning("OCR request rejected: worker pool saturated")
+            raise OCRPoolSaturated()
+
+        try:
+            future, executor = self._submit(bytes(data))
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.pending += 1
+        started = time.perf_counter()
+        future.add_done_callback(lambda done: self._finished(done, executor, started))
+        return future
+
+    def stats(self):
+        """Return pool size, utilisation and throughput counters"""
+        with self._lock:
+            busy = min(self.pending, self.workers)
+            return {
+                'workers': self.workers,
+                'engine': self.engine,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'queued': self.pending - busy,
+                'utilisation': round(busy / self.workers, 2),
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'restarts': self.restarts,
+                'avg_latency_ms': round(self.total_ms / self.completed, 2) if self.completed else 0.0
+            }
+
+    def shutdown(self):
+        """Stop the worker processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, data):
+        executor = self._get_executor()
+        try:
+            return executor.submit(_ocr_worker, data, self.preprocess_config), executor
+        except BrokenProcessPool:
+            self._discard(executor)
+            executor = self._get_executor()
+            return executor.submit(_ocr_worker, data, self.preprocess_config), executor
+
+    def _discard(self, executor):
+        """Drop a pool whose worker died (e.g. killed by the OOM killer) so the next call starts a fresh one"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        logging.error("OCR worker pool broken, restarting")
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Workers are spawned rather than forked so they never inherit
+                # locks held by request threads of the web server. A spawned
+                # worker re-imports __main__; main.py skips the app import there
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'),
+                                                     initializer=_init_worker)
+            return self._executor
+
+    def _finished(self, future, executor, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        error = None if future.cancelled() else future.exception()
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or error is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+                self.total_ms += elapsed
+                self.engine = future.result()[1]['engine']
+        self._slots.release()
+
+        if not future.cancelled() and error is None:
+            metrics.observe_ocr(elapsed / 1000.0, future.result()[1].get('timings'))
+
+        if isinstance(error, BrokenProcessPool):
+            self._discard(executor)
+
+
+ocr_service = OCRService()
+atexit.register(ocr_service.shutdown)
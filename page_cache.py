@@ -0,0 +1,140 @@
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone
+from time import monotonic
+
+from flask import Response, render_template, request
+
+# Page cache configuration
+PAGE_CACHE = os.environ.get("PAGE_CACHE", "1").lower() in ('1', 'true', 'yes', 'on')
+PAGE_CACHE_SIZE = int(os.environ.get("PAGE_CACHE_SIZE", "64"))
+PAGE_CACHE_VERSION_TTL = float(os.environ.get("PAGE_CACHE_VERSION_TTL", "1.0"))
+
+CachedPage = namedtuple('CachedPage', ['body', 'etag', 'last_modified'])
+
+
+class PageCache:
+    """
+    Rendered pages kept in memory.
+
+    A page is cached under its template and the versions of the data it
+    depends on, so the template only runs again after that data changes.
+    Versions live in the CacheVersion table and are bumped in the same
+    transaction as the change, which keeps every process consistent; each
+    process re-reads them at most every PAGE_CACHE_VERSION_TTL seconds.
+    Responses carry an ETag and Last-Modified, and repeat visits are
+    answered with 304 Not Modified.
+    """
+
+    def __init__(self, enabled=PAGE_CACHE, max_entries=PAGE_CACHE_SIZE, version_ttl=PAGE_CACHE_VERSION_TTL):
+        self.enabled = enabled
+        self.max_entries = max_entries
+        self.version_ttl = version_ttl
+        self.started_at = datetime.now(timezone.utc).replace(microsecond=0)
+        self._pages = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    def page(self, template, depends_on=(), context=None, status=200):
+        """
+        Response for template, rendered with context() only on a cache miss.
+        depends_on names the versions (e.g. 'reminders') the page reflects.
+        """
+        versions = tuple((name,) + self.version(name) for name in depends_on)
+        key = (template, request.script_root, status, tuple(version[:2] for version in versions))
+
+        with self._lock:
+            cached = self._pages.get(key) if self.enabled else None
+            if cached:
+                self._pages.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if not cached:
+            body = render_template(template, **(context() if context else {})).encode('utf-8')
+            last_modified = max([version[2] for version in versions if version[2]] + [self.started_at])
+            cached = CachedPage(body, hashlib.sha1(body).hexdigest(), last_modified)
+            if self.enabled:
+                with self._lock:
+                    self._pages[key] = cached
+                    while len(self._pages) > self.max_entries:
+                        self._pages.popitem(last=False)
+
+        response = Response(cached.body, status=status, mimetype='text/html')
+        if status != 200:
+            return response
+
+        response.set_etag(cached.etag)
+        response.last_modified = cached.last_modified
+        # Always revalidate, which costs a 304 when nothing changed
+        response.cache_control.no_cache = True
+        response.make_conditional(request)
+        if response.status_code == 304:
+            with self._lock:
+                self.not_modified += 1
+        return response
+
+    def version(self, name):
+        """(version, changed_at) of a named data set, re-read from the database after version_ttl seconds"""
+        from models import CacheVersion
+
+        with self._lock:
+            cached = self._versions.get(name)
+            if cached and monotonic() - cached[0] < self.version_ttl:
+                return cached[1]
+
+        try:
+            row = CacheVersion.query.filter_by(name=name).first()
+            value = (row.version, row.updated_at.replace(tzinfo=timezone.utc, microsecond=0)) if row else (0, None)
+        except Exception as e:
+            logging.warning(f"Cache version lookup failed for {name}: {str(e)}")
+            # An unknown version never matches a cached page
+            value = (monotonic(), None)
+
+        with self._lock:
+            self._versions[name] = (monotonic(), value)
+        return value
+
+    def bump(self, name):
+        """Advance a version inside the caller's transaction; commit it together with the change"""
+        from app import db
+        from models import CacheVersion
+
+        now = datetime.utcnow()
+        updated = (CacheVersion.query.filter_by(name=name)
+                   .update({CacheVersion.version: CacheVersion.version + 1, CacheVersion.updated_at: now},
+                           synchronize_session=False))
+        if not updated:
+            db.session.add(CacheVersion(name=name, version=1, updated_at=now))
+
+        # This process sees the new version on its next read
+        with self._lock:
+            self._versions.pop(name, None)
+
+    def clear(self):
+        with self._lock:
+            self._pages.clear()
+            self._versions.clear()
+
+    def stats(self):
+        """Return cache size and hit counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'entries': len(self._pages),
+                'hits': self.hits,
+                'misses': self.misses,
+                'not_modified': self.not_modified,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+
+page_cache = PageCache()
@@ -0,0 +1,65 @@
+import os
+import base64
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+# History page sizes
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", "20"))
+HISTORY_MAX_PAGE_SIZE = int(os.environ.get("HISTORY_MAX_PAGE_SIZE", "100"))
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not produced by encode_cursor"""
+
+
+def encode_cursor(timestamp, row_id):
+    """Opaque cursor for the row a page ended on"""
+    raw = f'{timestamp.isoformat()}|{row_id}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor: returns (timestamp, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise InvalidCursor('Invalid cursor')
+
+
+def page_size(value):
+    """Requested page size clamped to 1..HISTORY_MAX_PAGE_SIZE"""
+    try:
+        size = int(value) if value not in (None, '') else HISTORY_PAGE_SIZE
+    except (TypeError, ValueError):
+        size = HISTORY_PAGE_SIZE
+    return max(1, min(size, HISTORY_MAX_PAGE_SIZE))
+
+
+def keyset_page(query, timestamp_column, id_column, cursor=None, limit=HISTORY_PAGE_SIZE):
+    """
+    One page of query, newest first, continuing after cursor.
+
+    Rows are ordered by (timestamp, id) descending and the next page starts
+    strictly after the last row returned, so each page is an index range
+    scan of limit + 1 rows however deep the client pages, unlike OFFSET,
+    which reads and discards every earlier row. Rows without a timestamp
+    cannot be positioned and are skipped.
+
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    query = query.filter(timestamp_column.isnot(None))
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(timestamp_column < timestamp,
+                                 and_(timestamp_column == timestamp, id_column < row_id)))
+
+    rows = query.order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
@@ -0,0 +1,388 @@
+import os
+import json
+import queue
+import atexit
+import socket
+import logging
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlsplit
+
+import requests
+from sqlalchemy.exc import IntegrityError
+
+from reminder_scheduler import reminder_scheduler, REMINDER_SYNC_INTERVAL
+
+try:
+    from pywebpush import webpush, WebPushException
+except ImportError:
+    webpush = None
+    WebPushException = None
+
+# Reminder delivery configuration
+REMINDER_DELIVERY = os.environ.get("REMINDER_DELIVERY", "1").lower() in ('1', 'true', 'yes', 'on')
+REMINDER_MAX_LATENESS = int(os.environ.get("REMINDER_MAX_LATENESS", "900"))
+REMINDER_STREAM_QUEUE = int(os.environ.get("REMINDER_STREAM_QUEUE", "100"))
+# An open stream holds a server worker (a whole sync worker under gunicorn's
+# default worker class), so each one is closed after this many seconds and the
+# browser's EventSource reconnects on its own
+REMINDER_STREAM_MAX_AGE = int(os.environ.get("REMINDER_STREAM_MAX_AGE", "300"))
+
+# Web Push configuration. PUSH_TRANSPORT=webpush sends encrypted, VAPID-signed
+# messages through pywebpush; PUSH_TRANSPORT=plain POSTs the JSON payload as is
+# and is only meant for the local stand-in (scripts/push_standin.py).
+PUSH_TRANSPORT = os.environ.get("PUSH_TRANSPORT", "webpush")
+VAPID_PUBLIC_KEY = os.environ.get("VAPID_PUBLIC_KEY")
+VAPID_PRIVATE_KEY = os.environ.get("VAPID_PRIVATE_KEY")
+VAPID_SUBJECT = os.environ.get("VAPID_SUBJECT", "mailto:admin@meditranslate.local")
+PUSH_WORKERS = int(os.environ.get("PUSH_WORKERS", "4"))
+PUSH_TTL = int(os.environ.get("PUSH_TTL", "3600"))
+PUSH_TIMEOUT = float(os.environ.get("PUSH_TIMEOUT", "10"))
+PUSH_MAX_FAILURES = int(os.environ.get("PUSH_MAX_FAILURES", "5"))
+
+
+def dose_event(dose):
+    """JSON-ready description of a due dose, shared by the stream and push payloads"""
+    return {
+        'id': f"{dose.reminder.id}@{dose.due_at.astimezone(timezone.utc).isoformat()}",
+        'reminder_id': dose.reminder.id,
+        'medication_name': dose.reminder.medication_name,
+        'dosage': dose.reminder.dosage,
+        'notes': dose.reminder.notes,
+        'time': dose.time,
+        'due_at': dose.due_at.isoformat()
+    }
+
+
+class ReminderStream:
+    """
+    Fan-out of due-dose events to connected Server-Sent Events clients.
+
+    Every subscriber gets its own bounded queue. A client that stops reading
+    is dropped once its queue fills rather than holding up the others.
+    """
+
+    def __init__(self, max_queue=REMINDER_STREAM_QUEUE):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.dropped_clients = 0
+
+    def subscribe(self):
+        """Register a client and return the queue its events arrive on"""
+        events = queue.Queue(maxsize=self.max_queue)
+        with self._lock:
+            self._subscribers.add(events)
+        return events
+
+    def unsubscribe(self, events):
+        with self._lock:
+            self._subscribers.discard(events)
+
+    def publish(self, event):
+        """Queue an event for every connected client"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self.published += 1
+        for events in subscribers:
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                self.unsubscribe(events)
+                with self._lock:
+                    self.dropped_clients += 1
+                logging.warning("Dropping reminder stream client that stopped reading")
+
+    def stats(self):
+        with self._lock:
+            return {
+                'clients': len(self._subscribers),
+                'published': self.published,
+                'dropped_clients': self.dropped_clients
+            }
+
+
+class PushSender:
+    """
+    Web Push delivery to the stored PushSubscriptions.
+
+    Sends run on a small thread pool so a slow push service never delays
+    the dispatcher. Subscriptions the push service reports as gone (404 or
+    410), or that keep failing, are deleted.
+    """
+
+    def __init__(self, transport=PUSH_TRANSPORT, workers=PUSH_WORKERS):
+        self.transport = transport
+        self.workers = workers
+        self._app = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.expired = 0
+
+    @property
+    def enabled(self):
+        if self.transport == 'plain':
+            return True
+        return webpush is not None and bool(VAPID_PRIVATE_KEY)
+
+    def accepts(self, endpoint):
+        """
+        True for an endpoint this server may POST to. Real push services are
+        https on a host whose every address is public, so the host is
+        resolved here; plain http and local hosts are only allowed for the
+        plain transport's local stand-in. Checked on subscribe and again
+        before each send, as DNS may change in between.
+        """
+        try:
+            parts = urlsplit(endpoint)
+            host = parts.hostname
+        except ValueError:
+            return False
+        if not host:
+            return False
+        if self.transport == 'plain':
+            return parts.scheme in ('http', 'https')
+        if parts.scheme != 'https':
+            return False
+        try:
+            addresses = {info[4][0] for info in socket.getaddrinfo(host, parts.port or 443, proto=socket.IPPROTO_TCP)}
+        except (OSError, UnicodeError, ValueError):
+            return False
+        # Scoped IPv6 addresses come back as 'fe80::1%eth0'
+        return bool(addresses) and all(ipaddress.ip_address(address.split('%')[0]).is_global
+                                       for address in addresses)
+
+    def init_app(self, app):
+        self._app = app
+        if self.transport != 'plain' and not self.enabled:
+            logging.info("Web Push disabled: install pywebpush and set VAPID_PRIVATE_KEY/VAPID_PUBLIC_KEY")
+
+    def send_all(self, payload):
+        """Queue payload for every subscription"""
+        from models import PushSubscription
+
+        if not self.enabled:
+            return 0
+        subscriptions = [(row.id, row.endpoint, row.p256dh, row.auth) for row in PushSubscription.query.all()]
+        executor = self._get_executor()
+        for subscription in subscriptions:
+            executor.submit(self._send, subscription, payload)
+        return len(subscriptions)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'enabled': self.enabled,
+                'transport': self.transport,
+                'sent': self.sent,
+                'failed': self.failed,
+                'expired': self.expired
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=True, cancel_futures=False)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='web-push')
+            return self._executor
+
+    def _deliver(self, endpoint, p256dh, auth, data):
+        """Send one message and return the push service's HTTP status"""
+        if self.transport == 'plain':
+            response = requests.post(endpoint, data=data, timeout=PUSH_TIMEOUT,
+                                     headers={'Content-Type': 'application/json', 'TTL': str(PUSH_TTL)})
+            return response.status_code
+        try:
+            response = webpush(subscription_info={'endpoint': endpoint, 'keys': {'p256dh': p256dh, 'auth': auth}},
+                               data=data, vapid_private_key=VAPID_PRIVATE_KEY,
+                               vapid_claims={'sub': VAPID_SUBJECT}, ttl=PUSH_TTL, timeout=PUSH_TIMEOUT)
+            return response.status_code
+        except WebPushException as e:
+            if e.response is not None:
+                return e.response.status_code
+            raise
+
+    def _send(self, subscription, payload):
+        from app import db
+        from models import PushSubscription
+
+        subscription_id, endpoint, p256dh, auth = subscription
+        if not self.accepts(endpoint):
+            # Its host does not resolve (only) to public addresses now; this
+            # counts as a failure, and a subscription that keeps failing is dropped
+            logging.warning("Web Push endpoint rejected: not a public https host")
+            status = None
+        else:
+            try:
+                status = self._deliver(endpoint, p256dh, auth, json.dumps(payload, ensure_ascii=False))
+            except Exception as e:
+                logging.warning(f"Web Push send failed: {str(e)}")
+                status = None
+
+        delivered = status is not None and 200 <= status < 300
+        with self._lock:
+            if delivered:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+        try:
+            with self._app.app_context():
+                row = db.session.get(PushSubscription, subscription_id)
+                if row is None:
+                    return
+                if delivered:
+                    row.failures = 0
+                    row.last_sent_at = datetime.utcnow()
+                elif status in (404, 410) or (row.failures or 0) + 1 >= PUSH_MAX_FAILURES:
+                    db.session.delete(row)
+                    with self._lock:
+                        self.expired += 1
+                else:
+                    row.failures = (row.failures or 0) + 1
+                db.session.commit()
+        except Exception as e:
+            logging.error(f"Web Push bookkeeping failed: {str(e)}")
+
+
+class ReminderDispatcher:
+    """
+    Background thread that fires reminders on time.
+
+    It sleeps until the scheduler's next due dose (or until a reminder is
+    added or removed), then lets the scheduler fire every due dose. Fired
+    doses go to this process's stream clients, and to Web Push once per dose
+    across all processes: the first process to insert the ReminderDelivery
+    row sends it.
+    """
+
+    def __init__(self, stream, sender, max_lateness=REMINDER_MAX_LATENESS, idle_wait=REMINDER_SYNC_INTERVAL):
+        self.stream = stream
+        self.sender = sender
+        self.max_lateness = max_lateness
+        self.idle_wait = idle_wait
+        self._app = None
+        self._thread = None
+        self._stopping = False
+        self._enabled = False
+        self._atexit = False
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.late = 0
+        self.claimed_elsewhere = 0
+
+    def init_app(self, app, enabled=REMINDER_DELIVERY, start=True):
+        """Deliver fired doses for the given Flask app and, unless start is False, start the dispatcher thread"""
+        self._app = app
+        self._enabled = enabled
+        self.sender.init_app(app)
+        reminder_scheduler.add_listener(self.deliver)
+        if start:
+            self.start()
+
+    def start(self):
+        """Start the dispatcher thread in this process; call again in a forked child, which inherits no threads"""
+        if not self._enabled or (self._thread and self._thread.is_alive()):
+            return
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='reminder-dispatcher', daemon=True)
+        self._thread.start()
+        if not self._atexit:
+            atexit.register(self.close)
+            self._atexit = True
+
+    def deliver(self, doses):
+        """Send fired doses to stream clients and push subscriptions"""
+        now = datetime.now(timezone.utc)
+        for dose in doses:
+            if (now - dose.due_at).total_seconds() > self.max_lateness:
+                # The process was not running when this dose came due
+                with self._lock:
+                    self.late += 1
+                continue
+
+            event = dose_event(dose)
+            self.stream.publish(event)
+            with self._lock:
+                self.delivered += 1
+
+            if self.sender.enabled and self._claim(dose):
+                self.sender.send_all(dict(event, title='MediTranslate+ Reminder',
+                                          body=f"Time to take {dose.reminder.medication_name} - {dose.reminder.dosage}",
+                                          tag=f"medication-{dose.reminder.id}-{dose.time}"))
+
+    def close(self):
+        self._stopping = True
+        reminder_scheduler.wake()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=5)
+        self.sender.shutdown()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'running': bool(self._thread and self._thread.is_alive()),
+                'delivered': self.delivered,
+                'late': self.late,
+                'claimed_elsewhere': self.claimed_elsewhere,
+                'stream': self.stream.stats(),
+                'push': self.sender.stats()
+            }
+
+    def _claim(self, dose):
+        """Record the dose as pushed; False when another process got there first"""
+        from app import db
+        from models import ReminderDelivery
+
+        try:
+            db.session.add(ReminderDelivery(reminder_id=dose.reminder.id,
+                                            due_at=dose.due_at.astimezone(timezone.utc).replace(tzinfo=None)))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            with self._lock:
+                self.claimed_elsewhere += 1
+            return False
+
+    def _prune(self):
+        """Forget delivery claims older than a day"""
+        from app import db
+        from models import ReminderDelivery
+
+        cutoff = datetime.utcnow() - timedelta(days=1)
+        ReminderDelivery.query.filter(ReminderDelivery.created_at < cutoff).delete(synchronize_session=False)
+        db.session.commit()
+
+    def _run(self):
+        pruned_at = None
+        while not self._stopping:
+            wait = self.idle_wait
+            try:
+                with self._app.app_context():
+                    reminder_scheduler.fire_due()
+                    upcoming = reminder_scheduler.next_due()
+                    if upcoming:
+                        seconds = (upcoming.due_at - datetime.now(timezone.utc)).total_seconds()
+                        wait = max(0.0, min(wait, seconds))
+                    if pruned_at is None or datetime.utcnow() - pruned_at > timedelta(hours=1):
+                        self._prune()
+                        pruned_at = datetime.utcnow()
+            except Exception as e:
+                logging.error(f"Reminder dispatcher error: {str(e)}")
+            reminder_scheduler.wait_for_change(wait)
+
+
+reminder_stream = ReminderStream()
+push_sender = PushSender()
+reminder_dispatcher = ReminderDispatcher(reminder_stream, push_sender)
@@ -0,0 +1,371 @@
+import os
+import json
+import heapq
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+
+# Reminder scheduling configuration. Time slots are wall-clock times in
+# REMINDER_TIMEZONE; stored dates (start_date, end_date, updated_at) are UTC.
+REMINDER_TIMEZONE = os.environ.get("REMINDER_TIMEZONE", "Asia/Kolkata")
+REMINDER_SYNC_INTERVAL = float(os.environ.get("REMINDER_SYNC_INTERVAL", "5"))
+REMINDER_MAX_WINDOW = int(os.environ.get("REMINDER_MAX_WINDOW", str(24 * 60)))
+
+# Changes committed this long before the previous sync are picked up again,
+# covering transactions that commit after the sync read
+SYNC_OVERLAP = timedelta(seconds=5)
+
+ScheduledReminder = namedtuple('ScheduledReminder', [
+    'id', 'medication_name', 'dosage', 'notes', 'minutes', 'start', 'end', 'generation'
+])
+DueDose = namedtuple('DueDose', ['due_at', 'time', 'reminder'])
+
+
+def load_timezone(name=REMINDER_TIMEZONE):
+    """The configured reminder time zone, UTC if it is unknown"""
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception as e:
+        logging.warning(f"Unknown reminder time zone {name}, using UTC: {str(e)}")
+        return timezone.utc
+
+
+def parse_time_slot(value):
+    """'HH:MM' to minutes after midnight; raises ValueError for anything else"""
+    hours, minutes = str(value).strip().split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f'Invalid time slot: {value}')
+    return hours * 60 + minutes
+
+
+def format_time_slot(minute_of_day):
+    """Minutes after midnight to 'HH:MM'"""
+    return f'{minute_of_day // 60:02d}:{minute_of_day % 60:02d}'
+
+
+def parse_time_slots(time_slots_json):
+    """Minutes of day from a MedicationReminder.time_slots JSON string, skipping bad entries"""
+    try:
+        values = json.loads(time_slots_json or '[]')
+    except (TypeError, ValueError):
+        return []
+    if not isinstance(values, list):
+        values = [values]
+
+    minutes = set()
+    for value in values:
+        try:
+            minutes.add(parse_time_slot(value))
+        except (TypeError, ValueError):
+            continue
+    return sorted(minutes)
+
+
+def _utc(value):
+    """Naive UTC datetime from the database to an aware one"""
+    return value.replace(tzinfo=timezone.utc) if value else None
+
+
+class ReminderScheduler:
+    """
+    Min-heap of the next due dose of every active reminder time slot.
+
+    Each heap entry is (due_at, reminder_id, minute_of_day, generation).
+    Adding or changing a reminder bumps its generation and pushes fresh
+    entries; removing one only drops it from the reminder table, and entries
+    whose generation no longer matches are discarded when they surface
+    (lazy deletion). Entries that fall into the past are popped and
+    re-pushed for their next day, so answering "what is due in the next N
+    minutes" costs O(log n) per due dose rather than a pass over every
+    reminder. The heap is built once per process and kept in step with other
+    processes through the indexed MedicationReminder.updated_at column.
+
+    Doses are fired when the heap moves past them; listeners registered with
+    add_listener receive each fired dose once per process, always from
+    fire_due (the dispatcher thread). Queries that move the heap past a dose
+    only set it aside for fire_due, so answering a request never delivers.
+    """
+
+    def __init__(self, tz=None, sync_interval=REMINDER_SYNC_INTERVAL):
+        self.tz = tz or load_timezone()
+        self.sync_interval = sync_interval
+        self._heap = []
+        self._reminders = {}
+        self._generation = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._synced_at = None
+        self._checked_at = 0.0
+        self._listeners = []
+        self._pending = []
+        self._changed = threading.Event()
+        self.rebuilds = 0
+        self.syncs = 0
+        self.stale_entries = 0
+        self.queries = 0
+        self.fired = 0
+
+    def add_listener(self, callback):
+        """Call callback(doses) with every batch of doses that become due"""
+        self._listeners.append(callback)
+
+    def wait_for_change(self, timeout):
+        """Block until reminders are added or removed, or timeout seconds pass"""
+        changed = self._changed.wait(timeout)
+        self._changed.clear()
+        return changed
+
+    def wake(self):
+        """Release a thread blocked in wait_for_change"""
+        self._changed.set()
+
+    def add(self, reminder, minutes):
+        """Schedule (or reschedule) a MedicationReminder at the given minutes of day"""
+        with self._lock:
+            if not self._loaded:
+                # The first query loads it, including this reminder
+                return
+            self._add(reminder, minutes, datetime.now(timezone.utc))
+        self._changed.set()
+
+    def remove(self, reminder_id):
+        """Stop scheduling a reminder; its heap entries are dropped lazily"""
+        with self._lock:
+            self._reminders.pop(reminder_id, None)
+            self._compact()
+        self._changed.set()
+
+    def due(self, window_minutes, now=None):
+        """Doses due between now and now + window_minutes, soonest first"""
+        now = now or datetime.now(timezone.utc)
+        until = now + timedelta(minutes=window_minutes)
+
+        with self._lock:
+            fired = self._catch_up(now)
+            self.queries += 1
+
+            # Walk the heap from the root, only descending into entries that
+            # are within the window: O(k log k) for k entries in the window
+            heap = self._heap
+            frontier = [(heap[0], 0)] if heap else []
+            doses = []
+            while frontier:
+                entry, index = heapq.heappop(frontier)
+                due_at, reminder_id, minute, generation = entry
+                if due_at > until:
+                    break
+                reminder = self._reminders.get(reminder_id)
+                if reminder is not None and reminder.generation == generation:
+                    doses.append(DueDose(due_at.astimezone(self.tz), format_time_slot(minute), reminder))
+                for child in (2 * index + 1, 2 * index + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], child))
+        self._defer(fired)
+        return doses
+
+    def next_due(self, now=None):
+        """The next dose due after now, or None"""
+        now = now or datetime.now(timezone.utc)
+        upcoming = None
+        with self._lock:
+            fired = self._catch_up(now)
+            while self._heap:
+                due_at, reminder_id, minute, generation = self._heap[0]
+                reminder = self._reminders.get(reminder_id)
+                if reminder is not None and reminder.generation == generation:
+                    upcoming = DueDose(due_at.astimezone(self.tz), format_time_slot(minute), reminder)
+                    break
+                heapq.heappop(self._heap)
+                self.stale_entries += 1
+        self._defer(fired)
+        return upcoming
+
+    def fire_due(self, now=None):
+        """Fire every dose due by now, including those set aside by queries, and return them"""
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            fired = self._pending + self._catch_up(now)
+            self._pending = []
+        self._notify(fired)
+        return fired
+
+    def rebuild(self):
+        """Load every active reminder and heapify their next doses"""
+        from models import MedicationReminder
+
+        started_at = datetime.utcnow()
+        reminders = MedicationReminder.query.filter_by(is_active=True).all()
+        slots = self._load_slots([reminder.id for reminder in reminders])
+
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            self._heap = []
+            self._reminders = {}
+            for reminder in reminders:
+                self._add(reminder, slots.get(reminder.id, []), now, push=False)
+            heapq.heapify(self._heap)
+            self._loaded = True
+            self._synced_at = started_at
+            self._checked_at = monotonic()
+            self.rebuilds += 1
+        logging.info(f"Reminder scheduler loaded {len(self._reminders)} reminders, {len(self._heap)} doses")
+
+    def sync(self):
+        """Apply reminders added, changed or deactivated since the last sync"""
+        from models import MedicationReminder
+
+        started_at = datetime.utcnow()
+        changed = (MedicationReminder.query
+                   .filter(MedicationReminder.updated_at >= self._synced_at - SYNC_OVERLAP)
+                   .all())
+        slots = self._load_slots([reminder.id for reminder in changed if reminder.is_active])
+
+        with self._lock:
+            now = datetime.now(timezone.utc)
+            for reminder in changed:
+                if reminder.is_active:
+                    self._add(reminder, slots.get(reminder.id, []), now)
+                else:
+                    self._reminders.pop(reminder.id, None)
+            self._compact()
+            self._synced_at = started_at
+            self.syncs += 1
+        if changed:
+            self._changed.set()
+
+    def stats(self):
+        """Return heap size and scheduling counters"""
+        with self._lock:
+            live = sum(len(reminder.minutes) for reminder in self._reminders.values())
+            upcoming = self._heap[0][0].astimezone(self.tz).isoformat() if self._heap else None
+            return {
+                'loaded': self._loaded,
+                'timezone': str(self.tz),
+                'reminders': len(self._reminders),
+                'heap_size': len(self._heap),
+                'live_entries': live,
+                'stale_entries': self.stale_entries,
+                'next_entry_at': upcoming,
+                'rebuilds': self.rebuilds,
+                'syncs': self.syncs,
+                'queries': self.queries,
+                'fired': self.fired,
+                'pending': len(self._pending)
+            }
+
+    def _catch_up(self, now):
+        """Fire doses that are due, then pick up changes from other processes"""
+        fired = self._advance(now) if self._loaded else []
+        self._ensure_current()
+        return fired + self._advance(now)
+
+    def _defer(self, fired):
+        """Hand doses a query moved past to the next fire_due and wake its thread"""
+        if not fired or not self._listeners:
+            return
+        with self._lock:
+            self._pending.extend(fired)
+        self._changed.set()
+
+    def _notify(self, fired):
+        for callback in self._listeners if fired else ():
+            try:
+                callback(fired)
+            except Exception as e:
+                logging.error(f"Reminder listener error: {str(e)}")
+
+    def _ensure_current(self):
+        if not self._loaded:
+            self.rebuild()
+        elif monotonic() - self._checked_at >= self.sync_interval:
+            self._checked_at = monotonic()
+            try:
+                self.sync()
+            except Exception as e:
+                logging.error(f"Reminder scheduler sync failed: {str(e)}")
+
+    def _load_slots(self, reminder_ids):
+        """{reminder_id: sorted minutes of day} from ReminderTimeSlot"""
+        from models import ReminderTimeSlot
+
+        slots = {}
+        for offset in range(0, len(reminder_ids), 500):
+            chunk = reminder_ids[offset:offset + 500]
+            for reminder_id, minute in (ReminderTimeSlot.query
+                                        .with_entities(ReminderTimeSlot.reminder_id, ReminderTimeSlot.minute_of_day)
+                                        .filter(ReminderTimeSlot.reminder_id.in_(chunk))):
+                slots.setdefault(reminder_id, set()).add(minute)
+        return {reminder_id: sorted(minutes) for reminder_id, minutes in slots.items()}
+
+    def _add(self, reminder, minutes, now, push=True):
+        self._generation += 1
+        scheduled = ScheduledReminder(
+            id=reminder.id,
+            medication_name=reminder.medication_name,
+            dosage=reminder.dosage,
+            notes=reminder.notes or '',
+            minutes=tuple(sorted(set(minutes))),
+            start=_utc(reminder.start_date),
+            end=_utc(reminder.end_date),
+            generation=self._generation
+        )
+        self._reminders[reminder.id] = scheduled
+
+        after = max(now, scheduled.start) if scheduled.start else now
+        for minute in scheduled.minutes:
+            due_at = self._occurrence(minute, after)
+            if scheduled.end is None or due_at <= scheduled.end:
+                entry = (due_at, scheduled.id, minute, scheduled.generation)
+                if push:
+                    heapq.heappush(self._heap, entry)
+                else:
+                    self._heap.append(entry)
+
+    def _advance(self, now):
+        """Replace entries that are due with their next occurrence; returns the fired doses"""
+        fired = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, reminder_id, minute, generation = self._heap[0]
+            reminder = self._reminders.get(reminder_id)
+            if reminder is None or reminder.generation != generation:
+                heapq.heappop(self._heap)
+                self.stale_entries += 1
+                continue
+            fired.append(DueDose(due_at.astimezone(self.tz), format_time_slot(minute), reminder))
+            following = self._occurrence(minute, max(now, due_at + timedelta(minutes=1)))
+            if reminder.end is None or following <= reminder.end:
+                heapq.heapreplace(self._heap, (following, reminder_id, minute, generation))
+            else:
+                heapq.heappop(self._heap)
+        self.fired += len(fired)
+        return fired
+
+    def _compact(self):
+        """Rebuild the heap without stale entries once they outnumber live ones"""
+        live = sum(len(reminder.minutes) for reminder in self._reminders.values())
+        if len(self._heap) <= 2 * live + 64:
+            return
+        before = len(self._heap)
+        self._heap = [entry for entry in self._heap
+                      if entry[1] in self._reminders and self._reminders[entry[1]].generation == entry[3]]
+        heapq.heapify(self._heap)
+        self.stale_entries += before - len(self._heap)
+
+    def _occurrence(self, minute_of_day, after):
+        """First time at minute_of_day local time that is not before after (aware UTC)"""
+        local = after.astimezone(self.tz)
+        day = local.date()
+        for offset in range(3):
+            candidate = datetime(day.year, day.month, day.day, minute_of_day // 60, minute_of_day % 60,
+                                 tzinfo=self.tz) + timedelta(days=offset)
+            candidate = candidate.astimezone(timezone.utc)
+            if candidate >= after:
+                return candidate
+        return candidate
+
+
+reminder_scheduler = ReminderScheduler()
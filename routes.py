@@ -1,21 +1,78 @@
-from flask import render_template, request, jsonify, session, redirect, url_for
+from flask import request, jsonify, session, url_for, Response, stream_with_context
 from app import app, db
-from models import MedicationReminder, ChatHistory, TranslationHistory, PrescriptionScan, UserSettings
-from ai_services import translate_text, get_chatbot_response, extract_prescription_text, get_voice_synthesis_url, detect_language
+from models import MedicationReminder, ReminderTimeSlot, ChatHistory, TranslationHistory, ScanJob, PushSubscription
+from ai_services import translate_text, translate_batch, iter_translate_fanout, LANGUAGE_MAPPING, get_chatbot_response, stream_chatbot_response, get_voice_synthesis_url, detect_language
+from translation_cache import translation_cache
+from ai_executor import ai_executor, AIOverloadedError
+from singleflight import single_flight_stats
+from ocr_service import ocr_service, OCRPoolSaturated
+from history_writer import history_writer
+from scan_service import scan_jobs, scan_dedup, scan_prescription, scan_prescription_pages, build_scan, MAX_SCAN_PAGES
+from conversation_context import conversation_context
+from reminder_scheduler import reminder_scheduler, parse_time_slot, REMINDER_MAX_WINDOW
+from reminder_delivery import reminder_dispatcher, reminder_stream, push_sender, VAPID_PUBLIC_KEY, REMINDER_STREAM_MAX_AGE
+from pagination import keyset_page, page_size, InvalidCursor
+from page_cache import page_cache
+from settings_cache import settings_cache
+from static_assets import static_assets
+from compression import response_compressor
+from metrics import metrics
+from emergency import is_emergency, find_emergency_keywords, emergency_guidance
 import json
+import queue
+import time
 import uuid
 from datetime import datetime
 
+# Upper bound on texts accepted by /api/translate/batch
+MAX_BATCH_TEXTS = 100
+
+def _invalid_image_response(image_file):
+    """400 response for a missing or non-image upload, or None when it is acceptable"""
+    if image_file.filename == '':
+        return jsonify({'error': 'No image selected'}), 400
+    
+    # Validate file type
+    allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
+    filename = image_file.filename or ''
+    file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+    
+    if file_ext not in allowed_extensions:
+        return jsonify({
+            'error': 'Invalid file type',
+            'message': 'Please upload an image file (PNG, JPG, JPEG, GIF, BMP, TIFF)',
+            'filename': filename
+        }), 400
+    return None
+
+def _history_user_id():
+    """Owner recorded on translation history: the signed-in user, else a per-browser id"""
+    user_id = session.get('user_id')
+    if not user_id:
+        user_id = session.get('history_user') or str(uuid.uuid4())
+        session['history_user'] = user_id
+    return user_id
+
+def _overloaded_response(error):
+    """503 response asking the client to retry once AI or OCR capacity frees up"""
+    response = jsonify({
+        'error': 'OCR service is busy' if isinstance(error, OCRPoolSaturated) else 'AI service is busy',
+        'message': 'Too many requests are being processed. Please try again shortly.',
+        'retry_after': error.retry_after
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response
+
 @app.route('/')
 def home():
     """Home page with feature overview"""
-    reminders = MedicationReminder.query.filter_by(is_active=True).all()
-    return render_template('home.html', reminders=reminders)
+    return page_cache.page('home.html', depends_on=('reminders',), context=_active_reminders_context)
 
 @app.route('/translator')
 def translator():
     """AI Medical Translator page"""
-    return render_template('translator.html')
+    return page_cache.page('translator.html')
 
 @app.route('/chatbot')
 def chatbot():
@@ -23,28 +80,31 @@ def chatbot():
     # Generate session ID if not exists
     if 'chat_session' not in session:
         session['chat_session'] = str(uuid.uuid4())
-    return render_template('chatbot.html')
+    return page_cache.page('chatbot.html')
 
 @app.route('/prescription')
 def prescription():
     """Prescription Scanner page"""
-    return render_template('prescription.html')
+    return page_cache.page('prescription.html')
 
 @app.route('/reminders')
 def reminders():
     """Medication Reminders page"""
-    reminders = MedicationReminder.query.filter_by(is_active=True).all()
-    return render_template('reminders.html', reminders=reminders)
+    return page_cache.page('reminders.html', depends_on=('reminders',), context=_active_reminders_context)
 
 @app.route('/about')
 def about():
     """About page with team information"""
-    return render_template('about.html')
+    return page_cache.page('about.html')
 
 @app.route('/settings')
 def settings():
     """Settings and preferences page"""
-    return render_template('settings.html')
+    return page_cache.page('settings.html')
+
+def _active_reminders_context():
+    """Template context for pages listing reminders, loaded only when the cached page is stale"""
+    return {'reminders': MedicationReminder.query.filter_by(is_active=True).all()}
 
 # API Routes
 
@@ -79,19 +139,16 @@ def api_translate():
                 }), 503
             return jsonify({'error': translation_result['error']}), 500
         
-        # Save to history
-        try:
-            history = TranslationHistory(
-                original_text=text,
-                translated_text=translation_result['translated_text'],
-                source_language=source_lang,
-                target_language=target_lang,
-                timestamp=datetime.utcnow()
-            )
-            db.session.add(history)
-            db.session.commit()
-        except Exception as db_error:
-            app.logger.warning(f"Failed to save translation history: {str(db_error)}")
+        # Queue for the user's history
+        history_writer.add(
+            TranslationHistory,
+            original_text=text,
+            translated_text=translation_result['translated_text'],
+            source_language=source_lang,
+            target_language=target_lang,
+            user_id=_history_user_id(),
+            timestamp=datetime.utcnow()
+        )
         
         # Get voice synthesis info
         voice_info = get_voice_synthesis_url(
@@ -107,12 +164,15 @@ def api_translate():
             'source_name': translation_result.get('source_name', ''),
             'target_name': translation_result.get('target_name', ''),
             'confidence': translation_result.get('confidence', 'medium'),
+            'cached': translation_result.get('cached', False),
             'voice_available': voice_info.get('voice_available', False),
             'voice_synthesis': voice_info
         }
         
         return jsonify(response_data)
         
+    except AIOverloadedError as e:
+        return _overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Translation API error: {str(e)}")
         return jsonify({
@@ -120,6 +180,220 @@ def api_translate():
             'message': 'Please try again later'
         }), 500
 
+@app.route('/api/translate/batch', methods=['POST'])
+def api_translate_batch():
+    """Translate a list of texts for one language pair in a single request"""
+    try:
+        data = request.get_json()
+        texts = data.get('texts', [])
+        source_lang = data.get('source_lang', 'en')
+        target_lang = data.get('target_lang', 'hi')
+        
+        if not isinstance(texts, list) or not texts:
+            return jsonify({'error': 'A non-empty list of texts is required'}), 400
+        if len(texts) > MAX_BATCH_TEXTS:
+            return jsonify({'error': f'At most {MAX_BATCH_TEXTS} texts can be translated at once'}), 400
+        if not all(isinstance(text, str) for text in texts):
+            return jsonify({'error': 'Every text must be a string'}), 400
+        
+        results = translate_batch(texts, source_lang, target_lang)
+        
+        failed = [result for result in results if 'error' in result]
+        if len(failed) == len(results) and any(result.get('needs_api_key') for result in failed):
+            return jsonify({
+                'error': 'Translation service requires API key',
+                'needs_setup': True,
+                'message': 'Please configure GOOGLE_API_KEY to enable AI translation'
+            }), 503
+        
+        # Queue translations for the user's history
+        timestamp = datetime.utcnow()
+        user_id = _history_user_id()
+        history_writer.add_many(TranslationHistory, (
+            {
+                'original_text': text,
+                'translated_text': result['translated_text'],
+                'source_language': source_lang,
+                'target_language': target_lang,
+                'user_id': user_id,
+                'timestamp': timestamp
+            }
+            for text, result in zip(texts, results)
+            if 'error' not in result
+        ))
+        
+        items = []
+        for text, result in zip(texts, results):
+            if 'error' in result:
+                items.append({'original_text': text, 'error': result['error']})
+            else:
+                items.append({
+                    'original_text': text,
+                    'translated_text': result['translated_text'],
+                    'cached': result.get('cached', False)
+                })
+        
+        return jsonify({
+            'success': True,
+            'source_lang': source_lang,
+            'target_lang': target_lang,
+            'results': items
+        })
+        
+    except AIOverloadedError as e:
+        return _overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Batch translation API error: {str(e)}")
+        return jsonify({
+            'error': 'Translation service temporarily unavailable',
+            'message': 'Please try again later'
+        }), 500
+
+def _fanout_item(target_lang, result):
+    """Shape one fan-out result for the API response"""
+    if 'error' in result:
+        return {
+            'target_lang': target_lang,
+            'error': result['error'],
+            'latency_ms': result.get('latency_ms')
+        }
+    return {
+        'target_lang': target_lang,
+        'target_name': result.get('target_name', ''),
+        'translated_text': result['translated_text'],
+        'cached': result.get('cached', False),
+        'latency_ms': result.get('latency_ms')
+    }
+
+def _save_fanout_history(text, source_lang, completed, user_id):
+    """Queue fan-out translations for the user's history"""
+    timestamp = datetime.utcnow()
+    history_writer.add_many(TranslationHistory, (
+        {
+            'original_text': text,
+            'translated_text': result['translated_text'],
+            'source_language': source_lang,
+            'target_language': target_lang,
+            'user_id': user_id,
+            'timestamp': timestamp
+        }
+        for target_lang, result in completed
+        if 'error' not in result
+    ))
+
+@app.route('/api/translate/fanout', methods=['POST'])
+def api_translate_fanout():
+    """Translate one text into many languages concurrently"""
+    try:
+        data = request.get_json()
+        text = data.get('text', '')
+        source_lang = data.get('source_lang', 'en')
+        target_langs = data.get('target_langs') or [code for code in LANGUAGE_MAPPING if code != source_lang]
+        stream = data.get('stream', False)
+        
+        if not text.strip():
+            return jsonify({'error': 'Text is required'}), 400
+        
+        unknown = [code for code in target_langs if code not in LANGUAGE_MAPPING]
+        if unknown:
+            return jsonify({'error': f'Unsupported target languages: {", ".join(unknown)}'}), 400
+        
+        # Resolved up front: the session cannot change once streaming starts
+        user_id = _history_user_id()
+        
+        if stream:
+            # Stream one JSON line per language as soon as it completes
+            def generate():
+                completed = []
+                started = datetime.now()
+                for target_lang, result in iter_translate_fanout(text, source_lang, target_langs):
+                    completed.append((target_lang, result))
+                    yield json.dumps(_fanout_item(target_lang, result), ensure_ascii=False) + '\n'
+                _save_fanout_history(text, source_lang, completed, user_id)
+                wall_time_ms = round((datetime.now() - started).total_seconds() * 1000, 2)
+                yield json.dumps({'done': True, 'wall_time_ms': wall_time_ms}) + '\n'
+            
+            return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+        
+        started = datetime.now()
+        completed = list(iter_translate_fanout(text, source_lang, target_langs))
+        wall_time_ms = round((datetime.now() - started).total_seconds() * 1000, 2)
+        
+        if completed and all(result.get('retry_after') for _, result in completed):
+            return _overloaded_response(AIOverloadedError(completed[0][1]['retry_after']))
+        
+        if completed and all(result.get('needs_api_key') for _, result in completed):
+            return jsonify({
+                'error': 'Translation service requires API key',
+                'needs_setup': True,
+                'message': 'Please configure GOOGLE_API_KEY to enable AI translation'
+            }), 503
+        
+        _save_fanout_history(text, source_lang, completed, user_id)
+        
+        return jsonify({
+            'success': True,
+            'source_lang': source_lang,
+            'results': {target_lang: _fanout_item(target_lang, result) for target_lang, result in completed},
+            'wall_time_ms': wall_time_ms
+        })
+        
+    except AIOverloadedError as e:
+        return _overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Fan-out translation API error: {str(e)}")
+        return jsonify({
+            'error': 'Translation service temporarily unavailable',
+            'message': 'Please try again later'
+        }), 500
+
+def _translation_item(row, pending=False):
+    """Shape a TranslationHistory row (or queued row dict) for the history API"""
+    get = row.get if pending else lambda key: getattr(row, key)
+    timestamp = get('timestamp')
+    return {
+        'id': None if pending else row.id,
+        'original_text': get('original_text'),
+        'translated_text': get('translated_text'),
+        'source_lang': get('source_language'),
+        'target_lang': get('target_language'),
+        'timestamp': timestamp.isoformat() if timestamp else None,
+        'pending': pending
+    }
+
+@app.route('/api/translate/history', methods=['GET'])
+def api_translation_history():
+    """The current user's translations, newest first, one cursor page at a time"""
+    try:
+        user_id = _history_user_id()
+        cursor = request.args.get('cursor')
+        
+        query = TranslationHistory.query.filter(TranslationHistory.user_id == user_id)
+        rows, next_cursor = keyset_page(query, TranslationHistory.timestamp, TranslationHistory.id,
+                                        cursor, page_size(request.args.get('limit')))
+        
+        items = [_translation_item(row) for row in rows]
+        if not cursor:
+            # Translations still waiting in the write-behind queue are the newest
+            queued = history_writer.pending(TranslationHistory, user_id=user_id)
+            items = [_translation_item(row, pending=True) for row in reversed(queued)] + items
+        
+        return jsonify({
+            'success': True,
+            'items': items,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+        
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        app.logger.error(f"Translation history API error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to load translation history',
+            'message': 'Please try again later'
+        }), 500
+
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
     """Enhanced chatbot with context and voice support"""
@@ -127,7 +401,6 @@ def api_chat():
         data = request.get_json()
         message = data.get('message', '')
         language = data.get('language', 'en')
-        context = data.get('context', '')
         
         if not message.strip():
             return jsonify({'error': 'Message is required'}), 400
@@ -135,10 +408,32 @@ def api_chat():
         session_id = session.get('chat_session', str(uuid.uuid4()))
         session['chat_session'] = session_id
         
+        # Context comes from the stored conversation, not the client
+        context = conversation_context.build(session_id)
+        
+        # Flag emergencies before (and independently of) the LLM call
+        emergency_detected = is_emergency(message)
+        
         # Get chat response with context
-        chat_result = get_chatbot_response(message, language, context)
+        try:
+            chat_result = get_chatbot_response(message, language, context)
+        except AIOverloadedError:
+            if not emergency_detected:
+                raise
+            chat_result = {'error': 'AI service is busy'}
         
         if 'error' in chat_result:
+            if emergency_detected:
+                # Never leave an emergency without the 108 guidance
+                return jsonify({
+                    'success': True,
+                    'response': emergency_guidance(language),
+                    'language': language,
+                    'emergency_detected': True,
+                    'suggestions': [],
+                    'confidence': 'low',
+                    'voice_available': False
+                })
             if chat_result.get('needs_api_key'):
                 return jsonify({
                     'error': 'Health assistant requires API key',
@@ -147,19 +442,15 @@ def api_chat():
                 }), 503
             return jsonify({'error': chat_result['error']}), 500
         
-        # Save chat history
-        try:
-            chat_history = ChatHistory(
-                session_id=session_id,
-                user_message=message,
-                bot_response=chat_result['response'],
-                language=language,
-                timestamp=datetime.utcnow()
-            )
-            db.session.add(chat_history)
-            db.session.commit()
-        except Exception as db_error:
-            app.logger.warning(f"Failed to save chat history: {str(db_error)}")
+        # Queue chat history
+        history_writer.add(
+            ChatHistory,
+            session_id=session_id,
+            user_message=message,
+            bot_response=chat_result['response'],
+            language=language,
+            timestamp=datetime.utcnow()
+        )
         
         # Get voice synthesis for response
         voice_info = get_voice_synthesis_url(chat_result['response'], language)
@@ -168,7 +459,7 @@ def api_chat():
             'success': True,
             'response': chat_result['response'],
             'language': language,
-            'emergency_detected': chat_result.get('emergency_detected', False),
+            'emergency_detected': emergency_detected,
             'suggestions': chat_result.get('suggestions', []),
             'confidence': chat_result.get('confidence', 'medium'),
             'voice_available': voice_info.get('voice_available', False),
@@ -177,6 +468,8 @@ def api_chat():
         
         return jsonify(response_data)
         
+    except AIOverloadedError as e:
+        return _overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Chat API error: {str(e)}")
         return jsonify({
@@ -184,6 +477,125 @@ def api_chat():
             'message': 'For medical emergencies, call 108 immediately'
         }), 500
 
+@app.route('/api/emergency-check', methods=['POST'])
+def api_emergency_check():
+    """Flag emergency keywords in a message without calling the AI service"""
+    try:
+        data = request.get_json()
+        message = data.get('message', '')
+        language = data.get('language', 'en')
+        
+        matches = find_emergency_keywords(message)
+        return jsonify({
+            'emergency_detected': bool(matches),
+            'keywords': sorted({match.keyword for match in matches}),
+            'guidance': emergency_guidance(language) if matches else None
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Emergency check error: {str(e)}")
+        return jsonify({
+            'error': 'Emergency check failed',
+            'message': 'For medical emergencies, call 108 immediately'
+        }), 500
+
+def _sse(event, data):
+    """Format one Server-Sent Events message"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.route('/api/chat/stream', methods=['POST'])
+def api_chat_stream():
+    """Chatbot response streamed token by token over Server-Sent Events"""
+    try:
+        data = request.get_json()
+        message = data.get('message', '')
+        language = data.get('language', 'en')
+        
+        if not message.strip():
+            return jsonify({'error': 'Message is required'}), 400
+        
+        session_id = session.get('chat_session', str(uuid.uuid4()))
+        session['chat_session'] = session_id
+        
+        # Context comes from the stored conversation, not the client
+        context = conversation_context.build(session_id)
+        
+        def generate():
+            for event in stream_chatbot_response(message, language, context):
+                yield _sse(event['event'], event)
+                
+                if event['event'] == 'done':
+                    # Queue chat history once the full response is known
+                    history_writer.add(
+                        ChatHistory,
+                        session_id=session_id,
+                        user_message=message,
+                        bot_response=event['response'],
+                        language=language,
+                        timestamp=datetime.utcnow()
+                    )
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Chat stream API error: {str(e)}")
+        return jsonify({
+            'error': 'Health assistant temporarily unavailable',
+            'message': 'For medical emergencies, call 108 immediately'
+        }), 500
+
+def _chat_item(row, pending=False):
+    """Shape a ChatHistory row (or queued row dict) for the history API"""
+    get = row.get if pending else lambda key: getattr(row, key)
+    timestamp = get('timestamp')
+    return {
+        'id': None if pending else row.id,
+        'user_message': get('user_message'),
+        'bot_response': get('bot_response'),
+        'language': get('language'),
+        'timestamp': timestamp.isoformat() if timestamp else None,
+        'pending': pending
+    }
+
+@app.route('/api/chat/history', methods=['GET'])
+def api_chat_history():
+    """The caller's chat session messages, newest first, one cursor page at a time"""
+    try:
+        # Only the session cookie selects the conversation: chat history is health data
+        session_id = session.get('chat_session')
+        if not session_id:
+            return jsonify({'success': True, 'items': [], 'next_cursor': None, 'has_more': False})
+        cursor = request.args.get('cursor')
+        
+        query = ChatHistory.query.filter(ChatHistory.session_id == session_id)
+        rows, next_cursor = keyset_page(query, ChatHistory.timestamp, ChatHistory.id,
+                                        cursor, page_size(request.args.get('limit')))
+        
+        items = [_chat_item(row) for row in rows]
+        if not cursor:
+            # Messages still waiting in the write-behind queue are the newest
+            queued = history_writer.pending(ChatHistory, session_id=session_id)
+            items = [_chat_item(row, pending=True) for row in reversed(queued)] + items
+        
+        return jsonify({
+            'success': True,
+            'items': items,
+            'next_cursor': next_cursor,
+            'has_more': next_cursor is not None
+        })
+        
+    except InvalidCursor:
+        return jsonify({'error': 'Invalid cursor'}), 400
+    except Exception as e:
+        app.logger.error(f"Chat history API error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to load chat history',
+            'message': 'Please try again later'
+        }), 500
+
 @app.route('/api/scan-prescription', methods=['POST'])
 def api_scan_prescription():
     """Enhanced prescription scanning with better error handling"""
@@ -192,22 +604,28 @@ def api_scan_prescription():
             return jsonify({'error': 'No image provided'}), 400
         
         image_file = request.files['image']
-        if image_file.filename == '':
-            return jsonify({'error': 'No image selected'}), 400
-        
-        # Validate file type
-        allowed_extensions = {'png', 'jpg', 'jpeg', 'gif', 'bmp', 'tiff'}
-        filename = image_file.filename or ''
-        file_ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else ''
+        invalid = _invalid_image_response(image_file)
+        if invalid:
+            return invalid
+        filename = image_file.filename
         
-        if file_ext not in allowed_extensions:
-            return jsonify({
-                'error': 'Invalid file type',
-                'message': 'Please upload an image file (PNG, JPG, JPEG, GIF, BMP, TIFF)'
-            }), 400
+        # Job mode: queue the scan and let the client poll for the result
+        async_mode = request.values.get('async', '').lower() in ('1', 'true', 'yes')
+        if async_mode:
+            job = scan_jobs.submit(image_file.read(), filename)
+            status_url = url_for('api_scan_job', job_id=job.id)
+            response = jsonify({
+                'job_id': job.id,
+                'status': job.status,
+                'status_url': status_url
+            })
+            response.status_code = 202
+            response.headers['Location'] = status_url
+            return response
         
-        # Extract text from prescription
-        extracted_data = extract_prescription_text(image_file)
+        # Extract text from prescription, or reuse the result for a repeat upload
+        outcome = scan_prescription(image_file.read())
+        extracted_data = outcome.data
         
         if 'error' in extracted_data:
             if extracted_data.get('needs_api_key'):
@@ -219,22 +637,21 @@ def api_scan_prescription():
             return jsonify({'error': extracted_data['error']}), 400
         
         # Save scan results
-        try:
-            scan_result = PrescriptionScan(
-                extracted_text=extracted_data.get('raw_text', ''),
-                medications=json.dumps(extracted_data.get('medications', [])),
-                dosages=json.dumps(extracted_data.get('dosages', [])),
-                instructions=extracted_data.get('instructions', ''),
-                timestamp=datetime.utcnow()
-            )
-            db.session.add(scan_result)
-            db.session.commit()
-            extracted_data['scan_id'] = scan_result.id
-        except Exception as db_error:
-            app.logger.warning(f"Failed to save prescription scan: {str(db_error)}")
+        if not outcome.duplicate_of:
+            try:
+                scan_result = build_scan(extracted_data, outcome.fingerprint)
+                db.session.add(scan_result)
+                db.session.commit()
+                extracted_data['scan_id'] = scan_result.id
+            except Exception as db_error:
+                db.session.rollback()
+                app.logger.warning(f"Failed to save prescription scan: {str(db_error)}")
         
+        extracted_data['stage_timings'] = outcome.timings
         return jsonify(extracted_data)
         
+    except AIOverloadedError as e:
+        return _overloaded_response(e)
     except Exception as e:
         app.logger.error(f"Prescription scan error: {str(e)}")
         return jsonify({
@@ -242,6 +659,85 @@ def api_scan_prescription():
             'message': 'Please try again with a clearer image or enter details manually'
         }), 500
 
+@app.route('/api/scan-prescription/batch', methods=['POST'])
+def api_scan_prescription_batch():
+    """Scan a multi-page prescription uploaded as several images, in page order"""
+    try:
+        image_files = request.files.getlist('images')
+        if not image_files:
+            return jsonify({'error': 'No images provided'}), 400
+        if len(image_files) > MAX_SCAN_PAGES:
+            return jsonify({'error': f'At most {MAX_SCAN_PAGES} images per request'}), 400
+        
+        for image_file in image_files:
+            invalid = _invalid_image_response(image_file)
+            if invalid:
+                return invalid
+        
+        # OCR pages in parallel, then one analysis over the merged text
+        outcome = scan_prescription_pages([image_file.read() for image_file in image_files])
+        extracted_data = outcome.data
+        
+        if 'error' in extracted_data:
+            return jsonify({'error': extracted_data['error']}), 400
+        
+        # Save one scan covering all pages
+        if not outcome.duplicate_of:
+            try:
+                scan_result = build_scan(extracted_data, outcome.fingerprint)
+                db.session.add(scan_result)
+                db.session.commit()
+                extracted_data['scan_id'] = scan_result.id
+            except Exception as db_error:
+                db.session.rollback()
+                app.logger.warning(f"Failed to save prescription scan: {str(db_error)}")
+        
+        extracted_data['stage_timings'] = outcome.timings
+        return jsonify(extracted_data)
+        
+    except AIOverloadedError as e:
+        return _overloaded_response(e)
+    except Exception as e:
+        app.logger.error(f"Batch prescription scan error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to process prescription',
+            'message': 'Please try again with clearer images or enter details manually'
+        }), 500
+
+@app.route('/api/scan-prescription/<job_id>', methods=['GET'])
+def api_scan_job(job_id):
+    """Status, stage timings and result of a queued prescription scan"""
+    try:
+        job = db.session.get(ScanJob, job_id)
+        if not job:
+            return jsonify({'error': 'Scan job not found'}), 404
+        
+        data = {
+            'job_id': job.id,
+            'status': job.status,
+            'attempts': job.attempts,
+            'created_at': job.created_at.isoformat() if job.created_at else None,
+            'started_at': job.started_at.isoformat() if job.started_at else None,
+            'finished_at': job.finished_at.isoformat() if job.finished_at else None,
+            'stage_timings': json.loads(job.stage_timings) if job.stage_timings else {}
+        }
+        
+        if job.status == 'done':
+            data['scan_id'] = job.scan_id
+            data['result'] = json.loads(job.result) if job.result else None
+        elif job.status == 'failed':
+            data['error'] = job.error
+            result = json.loads(job.result) if job.result else {}
+            if result.get('needs_api_key'):
+                data['needs_setup'] = True
+                data['message'] = 'Please configure GOOGLE_API_KEY to enable AI prescription analysis'
+        
+        return jsonify(data)
+        
+    except Exception as e:
+        app.logger.error(f"Scan job status error: {str(e)}")
+        return jsonify({'error': 'Failed to load scan job'}), 500
+
 @app.route('/api/reminders', methods=['POST'])
 def api_add_reminder():
     """Add medication reminder with enhanced validation"""
@@ -260,6 +756,10 @@ def api_add_reminder():
         time_slots = data.get('time_slots', [])
         if not isinstance(time_slots, list) or not time_slots:
             return jsonify({'error': 'At least one time slot is required'}), 400
+        try:
+            minutes = sorted({parse_time_slot(slot) for slot in time_slots})
+        except (TypeError, ValueError):
+            return jsonify({'error': 'Time slots must be HH:MM times'}), 400
         
         reminder = MedicationReminder(
             medication_name=data.get('medication_name', ''),
@@ -273,8 +773,13 @@ def api_add_reminder():
         )
         
         db.session.add(reminder)
+        db.session.flush()
+        db.session.add_all(ReminderTimeSlot(reminder_id=reminder.id, minute_of_day=minute) for minute in minutes)
+        page_cache.bump('reminders')
         db.session.commit()
         
+        reminder_scheduler.add(reminder, minutes)
+        
         return jsonify({
             'success': True,
             'message': 'Medication reminder added successfully',
@@ -295,8 +800,11 @@ def api_delete_reminder(reminder_id):
     try:
         reminder = MedicationReminder.query.get_or_404(reminder_id)
         reminder.is_active = False
+        page_cache.bump('reminders')
         db.session.commit()
         
+        reminder_scheduler.remove(reminder_id)
+        
         return jsonify({
             'success': True,
             'message': 'Reminder deleted successfully'
@@ -309,6 +817,114 @@ def api_delete_reminder(reminder_id):
             'message': 'Please try again'
         }), 500
 
+@app.route('/api/reminders/due', methods=['GET'])
+def api_due_reminders():
+    """Doses due within the next window minutes (default 15), soonest first"""
+    try:
+        try:
+            window = int(request.args.get('window', 15))
+        except ValueError:
+            return jsonify({'error': 'window must be a number of minutes'}), 400
+        if not 0 < window <= REMINDER_MAX_WINDOW:
+            return jsonify({'error': f'window must be between 1 and {REMINDER_MAX_WINDOW} minutes'}), 400
+        
+        doses = reminder_scheduler.due(window)
+        return jsonify({
+            'success': True,
+            'window_minutes': window,
+            'due': [{
+                'reminder_id': dose.reminder.id,
+                'medication_name': dose.reminder.medication_name,
+                'dosage': dose.reminder.dosage,
+                'notes': dose.reminder.notes,
+                'time': dose.time,
+                'due_at': dose.due_at.isoformat()
+            } for dose in doses]
+        })
+        
+    except Exception as e:
+        app.logger.error(f"Due reminders error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to load due reminders',
+            'message': 'Please try again'
+        }), 500
+
+@app.route('/api/reminders/stream', methods=['GET'])
+def api_reminder_stream():
+    """
+    Due reminders pushed to the browser over Server-Sent Events. The stream
+    ends after REMINDER_STREAM_MAX_AGE seconds so it does not hold a worker
+    indefinitely; EventSource reconnects after the retry delay.
+    """
+    events = reminder_stream.subscribe()
+    closes_at = time.monotonic() + REMINDER_STREAM_MAX_AGE
+    
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            yield _sse('ready', {'push_available': bool(VAPID_PUBLIC_KEY)})
+            while True:
+                remaining = closes_at - time.monotonic()
+                if remaining <= 0:
+                    # Planned close: reconnect quickly
+                    yield "retry: 1000\n\n"
+                    return
+                try:
+                    event = events.get(timeout=min(15, remaining))
+                except queue.Empty:
+                    # Keep proxies from closing an idle connection
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event['id']}\n" + _sse('reminder', event)
+        finally:
+            reminder_stream.unsubscribe(events)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/push/public-key', methods=['GET'])
+def api_push_public_key():
+    """VAPID application server key for PushManager.subscribe"""
+    if not VAPID_PUBLIC_KEY:
+        return jsonify({'error': 'Push notifications are not configured'}), 404
+    return jsonify({'public_key': VAPID_PUBLIC_KEY})
+
+@app.route('/api/push/subscribe', methods=['POST', 'DELETE'])
+def api_push_subscribe():
+    """Store (POST) or remove (DELETE) a browser push subscription"""
+    try:
+        data = request.get_json() or {}
+        endpoint = data.get('endpoint', '')
+        if not isinstance(endpoint, str) or not push_sender.accepts(endpoint):
+            return jsonify({'error': 'A valid https push subscription endpoint is required'}), 400
+        
+        subscription = PushSubscription.query.filter_by(endpoint=endpoint).first()
+        if request.method == 'DELETE':
+            if subscription:
+                db.session.delete(subscription)
+                db.session.commit()
+            return jsonify({'success': True})
+        
+        keys = data.get('keys') or {}
+        if not subscription:
+            subscription = PushSubscription(endpoint=endpoint, created_at=datetime.utcnow())
+            db.session.add(subscription)
+        subscription.p256dh = keys.get('p256dh')
+        subscription.auth = keys.get('auth')
+        subscription.failures = 0
+        db.session.commit()
+        
+        return jsonify({'success': True, 'subscription_id': subscription.id})
+        
+    except Exception as e:
+        app.logger.error(f"Push subscription error: {str(e)}")
+        return jsonify({
+            'error': 'Failed to update push subscription',
+            'message': 'Please try again'
+        }), 500
+
 @app.route('/api/settings', methods=['GET', 'POST'])
 def api_settings():
     """Get or update user settings"""
@@ -316,49 +932,11 @@ def api_settings():
         user_id = session.get('user_id', 'anonymous')
         
         if request.method == 'GET':
-            settings = UserSettings.query.filter_by(user_id=user_id).first()
-            if not settings:
-                # Return default settings
-                return jsonify({
-                    'theme': 'light',
-                    'language': 'en',
-                    'voice_enabled': True,
-                    'notifications_enabled': True,
-                    'settings_data': '{}'
-                })
-            
-            return jsonify({
-                'theme': settings.theme,
-                'language': settings.language,
-                'voice_enabled': settings.voice_enabled,
-                'notifications_enabled': settings.notifications_enabled,
-                'settings_data': settings.settings_data or '{}'
-            })
+            return jsonify(settings_cache.get(user_id))
         
         elif request.method == 'POST':
-            data = request.get_json()
-            
-            settings = UserSettings.query.filter_by(user_id=user_id).first()
-            if not settings:
-                settings = UserSettings(
-                    user_id=user_id,
-                    theme=data.get('theme', 'light'),
-                    language=data.get('language', 'en'),
-                    voice_enabled=data.get('voice_enabled', True),
-                    notifications_enabled=data.get('notifications_enabled', True),
-                    settings_data=json.dumps(data.get('settings_data', {})),
-                    updated_at=datetime.utcnow()
-                )
-                db.session.add(settings)
-            else:
-                settings.theme = data.get('theme', settings.theme)
-                settings.language = data.get('language', settings.language)
-                settings.voice_enabled = data.get('voice_enabled', settings.voice_enabled)
-                settings.notifications_enabled = data.get('notifications_enabled', settings.notifications_enabled)
-                settings.settings_data = json.dumps(data.get('settings_data', {}))
-                settings.updated_at = datetime.utcnow()
-            
-            db.session.commit()
+            data = request.get_json() or {}
+            settings_cache.save(user_id, data)
             
             return jsonify({
                 'success': True,
@@ -428,19 +1006,55 @@ def api_offline_status():
             'error': str(e)
         }), 500
 
+def _service_stats():
+    """stats() of every cache and background service, shared by /api/stats and /metrics"""
+    return {
+        'translation_cache': translation_cache.stats(),
+        'ai_executor': ai_executor.stats(),
+        'single_flight': single_flight_stats(),
+        'ocr_pool': ocr_service.stats(),
+        'scan_jobs': scan_jobs.stats(),
+        'scan_dedup': scan_dedup.stats(),
+        'history_writer': history_writer.stats(),
+        'conversation_context': conversation_context.stats(),
+        'reminder_scheduler': reminder_scheduler.stats(),
+        'reminder_delivery': reminder_dispatcher.stats(),
+        'page_cache': page_cache.stats(),
+        'settings_cache': settings_cache.stats(),
+        'static_assets': static_assets.stats(),
+        'compression': response_compressor.stats()
+    }
+
+@app.route('/api/stats')
+def api_stats():
+    """Report cache and service counters"""
+    return jsonify(dict(_service_stats(), timestamp=datetime.now().isoformat()))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics: latency histograms plus the service counters as gauges"""
+    if not metrics.enabled:
+        return jsonify({'error': 'Metrics are disabled'}), 404
+    return Response(metrics.render(_service_stats()), mimetype='text/plain; version=0.0.4')
+
 # Error handlers
 @app.errorhandler(404)
 def not_found(error):
     """404 error handler"""
-    return render_template('404.html'), 404
+    return page_cache.page('404.html', status=404)
 
 @app.errorhandler(500)
 def internal_error(error):
     """500 error handler"""
     db.session.rollback()
-    return render_template('500.html'), 500
+    return page_cache.page('500.html', status=500)
+
+@app.errorhandler(AIOverloadedError)
+def ai_overloaded(error):
+    """AI concurrency limit reached"""
+    return _overloaded_response(error)
 
 @app.errorhandler(503)
 def service_unavailable(error):
     """503 error handler"""
-    return render_template('500.html'), 503
\ No newline at end of file
+    return page_cache.page('500.html', status=503)
\ No newline at end of file
@@ -0,0 +1,448 @@
+import os
+import json
+import hashlib
+import uuid
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from ai_executor import AIOverloadedError
+from ai_services import extract_prescription_text, analyze_prescription_text, ocr_error_result
+from image_preprocessing import Fingerprint, image_fingerprint, hash_distance
+from ocr_service import ocr_service
+
+# Scan job queue configuration
+SCAN_JOB_WORKERS = int(os.environ.get("SCAN_JOB_WORKERS", "2"))
+SCAN_JOB_POLL_INTERVAL = float(os.environ.get("SCAN_JOB_POLL_INTERVAL", "2"))
+SCAN_JOB_LEASE = int(os.environ.get("SCAN_JOB_LEASE", "180"))
+SCAN_JOB_MAX_ATTEMPTS = int(os.environ.get("SCAN_JOB_MAX_ATTEMPTS", "3"))
+
+# Repeat-upload deduplication. Perceptual (near-duplicate) matching is opt-in:
+# a false match would show another prescription's medicines.
+SCAN_DEDUP = os.environ.get("SCAN_DEDUP", "1").lower() in ('1', 'true', 'yes', 'on')
+SCAN_DEDUP_PERCEPTUAL = os.environ.get("SCAN_DEDUP_PERCEPTUAL", "0").lower() in ('1', 'true', 'yes', 'on')
+SCAN_DEDUP_MAX_DISTANCE = int(os.environ.get("SCAN_DEDUP_MAX_DISTANCE", "24"))
+
+# Upper bound on images accepted by /api/scan-prescription/batch
+MAX_SCAN_PAGES = int(os.environ.get("MAX_SCAN_PAGES", "10"))
+
+# data: extracted result; fingerprint: image_preprocessing.Fingerprint or None;
+# duplicate_of: id of the stored PrescriptionScan that was reused, if any
+ScanOutcome = namedtuple('ScanOutcome', ['data', 'timings', 'fingerprint', 'duplicate_of'])
+
+
+class ScanDedupIndex:
+    """
+    Lookup of earlier scans by image fingerprint.
+
+    Exact matches use the indexed content_hash column. Perceptual matches
+    compare against an in-process list of perceptual hashes that is topped
+    up from the table on each lookup, so scans stored by other processes are
+    seen too.
+    """
+
+    def __init__(self, perceptual=SCAN_DEDUP_PERCEPTUAL, max_distance=SCAN_DEDUP_MAX_DISTANCE):
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self._hashes = []
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self.lookups = 0
+        self.exact_hits = 0
+        self.perceptual_hits = 0
+
+    def lookup(self, fingerprint):
+        """Return (scan, match) for a stored scan with a reusable result, or (None, None)"""
+        from app import db
+        from models import PrescriptionScan
+
+        with self._lock:
+            self.lookups += 1
+
+        scan = (PrescriptionScan.query
+                .filter(PrescriptionScan.content_hash == fingerprint.content_hash,
+                        PrescriptionScan.result_json.isnot(None))
+                .order_by(PrescriptionScan.id.desc())
+                .first())
+        if scan:
+            with self._lock:
+                self.exact_hits += 1
+            return scan, 'exact'
+
+        if self.perceptual and fingerprint.perceptual_hash:
+            scan_id = self._nearest(fingerprint.perceptual_hash)
+            if scan_id:
+                scan = db.session.get(PrescriptionScan, scan_id)
+                with self._lock:
+                    self.perceptual_hits += 1
+                return scan, 'perceptual'
+        return None, None
+
+    def stats(self):
+        """Return lookup and hit counters"""
+        with self._lock:
+            hits = self.exact_hits + self.perceptual_hits
+            return {
+                'enabled': SCAN_DEDUP,
+                'perceptual': self.perceptual,
+                'lookups': self.lookups,
+                'exact_hits': self.exact_hits,
+                'perceptual_hits': self.perceptual_hits,
+                'misses': self.lookups - hits,
+                'hit_rate': round(hits / self.lookups, 3) if self.lookups else 0.0
+            }
+
+    def _nearest(self, perceptual_hash):
+        self._refresh()
+        best_id = None
+        best_distance = self.max_distance + 1
+        with self._lock:
+            for scan_id, stored_hash in self._hashes:
+                distance = hash_distance(perceptual_hash, stored_hash)
+                if distance < best_distance:
+                    best_id, best_distance = scan_id, distance
+        return best_id
+
+    def _refresh(self):
+        """Load perceptual hashes of scans stored since the last lookup"""
+        from models import PrescriptionScan
+
+        rows = (PrescriptionScan.query
+                .with_entities(PrescriptionScan.id, PrescriptionScan.perceptual_hash)
+                .filter(PrescriptionScan.id > self._last_id,
+                        PrescriptionScan.perceptual_hash.isnot(None),
+                        PrescriptionScan.result_json.isnot(None))
+                .order_by(PrescriptionScan.id)
+                .all())
+        with self._lock:
+            # Another thread may have loaded some of the rows meanwhile
+            rows = [row for row in rows if row.id > self._last_id]
+            self._hashes.extend((row.id, row.perceptual_hash) for row in rows)
+            if rows:
+                self._last_id = rows[-1].id
+
+
+scan_dedup = ScanDedupIndex()
+
+
+def scan_prescription(data):
+    """
+    Run the OCR and analysis stages over image bytes, or reuse the stored
+    result of an earlier scan of the same image. Returns a ScanOutcome with
+    stage timings in milliseconds.
+    """
+    timings = {}
+    fingerprint = None
+    if SCAN_DEDUP:
+        started = time.perf_counter()
+        try:
+            fingerprint = image_fingerprint(data, perceptual=scan_dedup.perceptual)
+            scan, match = scan_dedup.lookup(fingerprint)
+        except Exception as e:
+            # Undecodable images are reported by the OCR stage
+            logging.warning(f"Scan fingerprint error: {str(e)}")
+            scan = None
+        timings['dedup'] = round((time.perf_counter() - started) * 1000, 2)
+
+        if scan:
+            extracted_data = json.loads(scan.result_json)
+            extracted_data.update(scan_id=scan.id, deduplicated=match)
+            return ScanOutcome(extracted_data, timings, fingerprint, scan.id)
+
+    extracted_data = extract_prescription_text(data, timings)
+    return ScanOutcome(extracted_data, timings, fingerprint, None)
+
+
+def merge_pages(texts):
+    """Join per-page OCR text in page order, marking where each page starts"""
+    return '\n\n'.join(f"--- Page {number} ---\n{text.strip()}"
+                        for number, text in enumerate(texts, 1) if text.strip())
+
+
+def scan_prescription_pages(pages):
+    """
+    OCR the images of a multi-page prescription in parallel, merge the text
+    in page order and structure it with a single analysis call. Returns a
+    ScanOutcome; a repeat upload of the same pages in the same order reuses
+    the stored result.
+    """
+    timings = {}
+    fingerprint = None
+    if SCAN_DEDUP:
+        started = time.perf_counter()
+        try:
+            # The document is identified by the content hashes of its pages, in order
+            page_hashes = [image_fingerprint(data, perceptual=False).content_hash for data in pages]
+            digest = hashlib.sha256('|'.join(page_hashes).encode()).hexdigest()
+            fingerprint = Fingerprint(digest, None)
+            scan, match = scan_dedup.lookup(fingerprint)
+        except Exception as e:
+            logging.warning(f"Scan fingerprint error: {str(e)}")
+            scan = None
+        timings['dedup'] = round((time.perf_counter() - started) * 1000, 2)
+
+        if scan:
+            extracted_data = json.loads(scan.result_json)
+            extracted_data.update(scan_id=scan.id, deduplicated=match)
+            return ScanOutcome(extracted_data, timings, fingerprint, scan.id)
+
+    started = time.perf_counter()
+    try:
+        results = ocr_service.ocr_pages(pages)
+    except AIOverloadedError:
+        raise
+    except Exception as e:
+        logging.error(f"OCR extraction error: {str(e)}")
+        return ScanOutcome(ocr_error_result(e), timings, fingerprint, None)
+    timings['ocr'] = round((time.perf_counter() - started) * 1000, 2)
+    timings['pages'] = [preprocessing['timings'] for _, preprocessing in results]
+
+    started = time.perf_counter()
+    extracted_data = analyze_prescription_text(merge_pages(text for text, _ in results))
+    timings['analysis'] = round((time.perf_counter() - started) * 1000, 2)
+
+    extracted_data['page_count'] = len(pages)
+    return ScanOutcome(extracted_data, timings, fingerprint, None)
+
+
+def build_scan(extracted_data, fingerprint=None):
+    """
+    Build the PrescriptionScan row for a successful scan. Results produced
+    by Gemini are kept for reuse by repeat uploads of the same image.
+    """
+    from models import PrescriptionScan
+
+    scan = PrescriptionScan(
+        extracted_text=extracted_data.get('raw_text', ''),
+        medications=json.dumps(extracted_data.get('medications', [])),
+        dosages=json.dumps(extracted_data.get('dosages', [])),
+        instructions=extracted_data.get('instructions', ''),
+        timestamp=datetime.utcnow()
+    )
+    if fingerprint:
+        scan.content_hash = fingerprint.content_hash
+        scan.perceptual_hash = fingerprint.perceptual_hash
+        # Local-only fallback results are not reused once Gemini is configured
+        if not extracted_data.get('needs_api_key'):
+            scan.result_json = json.dumps(extracted_data)
+    return scan
+
+
+class ScanJobQueue:
+    """
+    Prescription scan jobs queued in the database.
+
+    Uploads are stored in the ScanJob table and picked up by worker threads,
+    which claim a job with a conditional UPDATE so several threads or
+    processes can share the table. A job left running past its lease (its
+    worker was restarted or killed) is put back in the queue.
+    """
+
+    def __init__(self, workers=SCAN_JOB_WORKERS, poll_interval=SCAN_JOB_POLL_INTERVAL,
+                 lease_seconds=SCAN_JOB_LEASE, max_attempts=SCAN_JOB_MAX_ATTEMPTS):
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self._app = None
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.recovered = 0
+
+    def init_app(self, app, start=True):
+        """Use the given Flask app and, unless start is False, start the worker threads"""
+        self._app = app
+        if start:
+            self.start()
+
+    def start(self):
+        """Start any missing worker threads in this process; call again in a forked child, which inherits none"""
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            for index in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f'scan-job-{index}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, data, filename=None):
+        """Queue image bytes for scanning and return the new ScanJob"""
+        from app import db
+        from models import ScanJob
+
+        job = ScanJob(id=str(uuid.uuid4()), status='queued', filename=filename, image_data=data,
+                      available_at=datetime.utcnow())
+        db.session.add(job)
+        db.session.commit()
+
+        with self._lock:
+            self.submitted += 1
+        self._wakeup.set()
+        return job
+
+    def stats(self):
+        """Return worker and job counters"""
+        with self._lock:
+            return {
+                'workers': len(self._threads),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'retried': self.retried,
+                'recovered': self.recovered
+            }
+
+    def _run(self):
+        while True:
+            try:
+                with self._app.app_context():
+                    job_id = self._claim()
+                    if job_id:
+                        self._process(job_id)
+                        continue
+            except Exception as e:
+                logging.error(f"Scan job worker error: {str(e)}")
+
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def _claim(self):
+        """Atomically move the oldest available job to running and return its id"""
+        from app import db
+        from models import ScanJob
+
+        now = datetime.utcnow()
+        self._recover_expired(now)
+
+        candidates = (db.session.query(ScanJob.id)
+                      .filter(ScanJob.status == 'queued', ScanJob.available_at <= now)
+                      .order_by(ScanJob.created_at)
+                      .limit(self.workers + 1)
+                      .all())
+        for (job_id,) in candidates:
+            result = db.session.execute(
+                update(ScanJob)
+                .where(ScanJob.id == job_id, ScanJob.status == 'queued')
+                .values(status='running', started_at=now, attempts=ScanJob.attempts + 1)
+            )
+            db.session.commit()
+            if result.rowcount == 1:
+                return job_id
+        return None
+
+    def _recover_expired(self, now):
+        """Requeue jobs whose lease ran out, or fail them once attempts run out"""
+        from app import db
+        from models import ScanJob
+
+        expired = (ScanJob.status == 'running') & (ScanJob.started_at < now - timedelta(seconds=self.lease_seconds))
+        # A job that keeps killing its worker must not be retried forever
+        failed = db.session.execute(
+            update(ScanJob)
+            .where(expired, ScanJob.attempts >= self.max_attempts)
+            .values(status='failed', error=f'Abandoned after {self.max_attempts} attempts',
+                    finished_at=now, image_data=None)
+        )
+        result = db.session.execute(
+            update(ScanJob)
+            .where(expired)
+            .values(status='queued', available_at=now)
+        )
+        db.session.commit()
+        if failed.rowcount:
+            logging.warning(f"Failed {failed.rowcount} scan jobs that ran out of attempts")
+            with self._lock:
+                self.failed += failed.rowcount
+        if result.rowcount:
+            logging.warning(f"Requeued {result.rowcount} abandoned scan jobs")
+            with self._lock:
+                self.recovered += result.rowcount
+
+    def _process(self, job_id):
+        from app import db
+        from models import ScanJob
+
+        job = db.session.get(ScanJob, job_id)
+        attempt = job.attempts
+        queue_wait = round((job.started_at - job.created_at).total_seconds() * 1000, 2)
+
+        try:
+            outcome = scan_prescription(job.image_data)
+        except AIOverloadedError as e:
+            self._retry(job_id, attempt, f'Service busy: {str(e)}', e.retry_after)
+            return
+        except Exception as e:
+            logging.error(f"Scan job {job_id} error: {str(e)}")
+            self._retry(job_id, attempt, str(e), self.poll_interval)
+            return
+
+        extracted_data = outcome.data
+        timings = dict(outcome.timings, queue_wait=queue_wait)
+        values = {'stage_timings': json.dumps(timings), 'finished_at': datetime.utcnow(), 'image_data': None}
+        if 'error' in extracted_data:
+            values.update(status='failed', error=extracted_data['error'], result=json.dumps(extracted_data))
+        elif outcome.duplicate_of:
+            values.update(status='done', scan_id=outcome.duplicate_of, result=json.dumps(extracted_data))
+        else:
+            scan = build_scan(extracted_data, outcome.fingerprint)
+            db.session.add(scan)
+            db.session.flush()
+            extracted_data['scan_id'] = scan.id
+            values.update(status='done', scan_id=scan.id, result=json.dumps(extracted_data))
+
+        if self._finish(job_id, attempt, values):
+            with self._lock:
+                if values['status'] == 'done':
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _retry(self, job_id, attempt, error, delay):
+        """Requeue a job after a transient failure, or fail it once attempts run out"""
+        if attempt >= self.max_attempts:
+            values = {'status': 'failed', 'error': error, 'finished_at': datetime.utcnow(), 'image_data': None}
+            if self._finish(job_id, attempt, values):
+                with self._lock:
+                    self.failed += 1
+            return
+
+        values = {'status': 'queued', 'error': error, 'available_at': datetime.utcnow() + timedelta(seconds=delay)}
+        if self._finish(job_id, attempt, values):
+            with self._lock:
+                self.retried += 1
+
+    def _finish(self, job_id, attempt, values):
+        """
+        Write the outcome of an attempt. Nothing is written if the job was
+        recovered and claimed again meanwhile.
+        """
+        from app import db
+        from models import ScanJob
+
+        try:
+            result = db.session.execute(
+                update(ScanJob)
+                .where(ScanJob.id == job_id, ScanJob.status == 'running', ScanJob.attempts == attempt)
+                .values(**values)
+            )
+            if result.rowcount != 1:
+                db.session.rollback()
+                logging.warning(f"Scan job {job_id} was reclaimed; discarding attempt {attempt}")
+                return False
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            logging.error(f"Scan job {job_id} update error: {str(e)}")
+            return False
+
+
+scan_jobs = ScanJobQueue()
@@ -0,0 +1,86 @@
+"""
+Local stand-in for a Web Push service.
+
+Accepts pushes at http://HOST:PORT/push/<token> and prints them, so reminder
+delivery can be exercised without a browser vendor's push service. Run the
+app with PUSH_TRANSPORT=plain and register a subscription pointing here:
+
+    python scripts/push_standin.py --port 8765
+    curl -X POST localhost:5000/api/push/subscribe -H 'Content-Type: application/json' \\
+         -d '{"endpoint": "http://localhost:8765/push/phone-1"}'
+
+Tokens listed with --gone answer 410 Gone, as a real push service does for
+an expired subscription. GET /messages returns everything received.
+
+Usage: python scripts/push_standin.py [--host H] [--port N] [--gone TOKEN ...]
+"""
+import argparse
+import json
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+received = []
+lock = threading.Lock()
+
+
+def make_handler(gone_tokens):
+    class PushHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            if not self.path.startswith('/push/'):
+                self.send_error(404)
+                return
+            token = self.path[len('/push/'):]
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if token in gone_tokens:
+                print(f"{datetime.now():%H:%M:%S} {token}: 410 Gone")
+                self.send_response(410)
+                self.end_headers()
+                return
+
+            try:
+                payload = json.loads(body or b'{}')
+            except ValueError:
+                payload = {'raw': body.decode('utf-8', 'replace')}
+            with lock:
+                received.append({'token': token, 'received_at': datetime.now().isoformat(),
+                                 'ttl': self.headers.get('TTL'), 'payload': payload})
+            print(f"{datetime.now():%H:%M:%S} {token}: {payload.get('body') or payload}")
+            self.send_response(201)
+            self.end_headers()
+
+        def do_GET(self):
+            if self.path != '/messages':
+                self.send_error(404)
+                return
+            with lock:
+                body = json.dumps(received, ensure_ascii=False).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return PushHandler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--gone', nargs='*', default=[], help='tokens that answer 410 Gone')
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(set(args.gone)))
+    print(f"Push stand-in listening on http://{args.host}:{args.port}/push/<token>")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from time import monotonic
+
+from sqlalchemy.exc import IntegrityError
+
+# Settings cache configuration
+SETTINGS_CACHE_SIZE = int(os.environ.get("SETTINGS_CACHE_SIZE", "1024"))
+SETTINGS_CACHE_TTL = float(os.environ.get("SETTINGS_CACHE_TTL", "30"))
+
+DEFAULT_SETTINGS = {
+    'theme': 'light',
+    'language': 'en',
+    'voice_enabled': True,
+    'notifications_enabled': True,
+    'settings_data': '{}'
+}
+
+# Columns a POST may change; anything left out keeps its stored value
+SETTINGS_FIELDS = ('theme', 'language', 'voice_enabled', 'notifications_enabled')
+
+
+def settings_values(data):
+    """UserSettings column values from a settings POST body, limited to the fields it sends"""
+    values = {field: data[field] for field in SETTINGS_FIELDS if field in data}
+    values['settings_data'] = json.dumps(data.get('settings_data', {}))
+    values['updated_at'] = datetime.utcnow()
+    return values
+
+
+class SettingsCache:
+    """
+    Read-through cache of UserSettings per user.
+
+    Reads are served from a bounded in-process LRU and fall back to a single
+    indexed lookup. Saves are one INSERT ... ON CONFLICT DO UPDATE statement
+    on PostgreSQL and SQLite, so concurrent first-time saves for the same
+    user cannot collide on the unique user_id, and invalidate the user's
+    entry once committed. Invalidations bump a generation counter, and a
+    read only fills the cache if no invalidation happened while it loaded,
+    so a read that saw the row before a save cannot store it afterwards.
+    Entries expire after SETTINGS_CACHE_TTL seconds, which bounds how long
+    another process can serve settings saved elsewhere.
+    """
+
+    def __init__(self, max_entries=SETTINGS_CACHE_SIZE, ttl_seconds=SETTINGS_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+
+    def get(self, user_id):
+        """Settings for user_id as returned by GET /api/settings (defaults for a new user)"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+            generation = self._generation
+
+        settings = self._load(user_id)
+        with self._lock:
+            if generation != self._generation:
+                # Invalidated while loading: what was read may predate the save
+                return dict(settings)
+            self._entries[user_id] = (monotonic(), settings)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return dict(settings)
+
+    def save(self, user_id, data):
+        """Insert or update the user's settings and commit"""
+        from app import db
+
+        self.upsert(db.session, user_id, settings_values(data))
+        db.session.commit()
+        self.invalidate(user_id)
+        with self._lock:
+            self.saves += 1
+
+    def upsert(self, session, user_id, values):
+        """Write values for user_id in one statement where the dialect supports it"""
+        from models import UserSettings
+
+        dialect = session.get_bind().dialect.name
+        if dialect in ('postgresql', 'sqlite'):
+            if dialect == 'postgresql':
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+
+            row = dict(DEFAULT_SETTINGS, **values)
+            row['user_id'] = user_id
+            statement = insert(UserSettings).values(**row)
+            session.execute(statement.on_conflict_do_update(
+                index_elements=[UserSettings.user_id],
+                set_={field: statement.excluded[field] for field in values}))
+            return
+
+        # Other dialects: update, then insert, and update again if a
+        # concurrent save inserted the row first
+        query = UserSettings.query.filter_by(user_id=user_id)
+        if query.update(values, synchronize_session=False):
+            return
+        try:
+            with session.begin_nested():
+                session.add(UserSettings(user_id=user_id, **dict(DEFAULT_SETTINGS, **values)))
+        except IntegrityError:
+            query.update(values, synchronize_session=False)
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        """Return cache size and hit counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'hits': self.hits,
+                'misses': self.misses,
+                'saves': self.saves,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _load(self, user_id):
+        from models import UserSettings
+
+        settings = UserSettings.query.filter_by(user_id=user_id).first()
+        if not settings:
+            return dict(DEFAULT_SETTINGS)
+        return {
+            'theme': settings.theme,
+            'language': settings.language,
+            'voice_enabled': settings.voice_enabled,
+            'notifications_enabled': settings.notifications_enabled,
+            'settings_data': settings.settings_data or '{}'
+        }
+
+
+settings_cache = SettingsCache()
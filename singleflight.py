@@ -0,0 +1,86 @@
+import copy
+import threading
+from functools import wraps
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key.
+
+    The first caller for a key runs the function; callers arriving while it is
+    in flight wait for it and receive the same result (or exception).
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.saved = 0
+
+    def do(self, key, fn, *args, **kwargs):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                call.waiters += 1
+                self.saved += 1
+
+        if leader:
+            try:
+                call.result = fn(*args, **kwargs)
+            except Exception as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        call.done.wait()
+        if call.error is not None:
+            raise call.error
+        # Followers get their own copy so callers can annotate results safely
+        return copy.copy(call.result)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'saved': self.saved,
+                'in_flight': len(self._calls)
+            }
+
+
+_groups = {}
+
+
+def coalesce(name, key_func):
+    """Decorator running concurrent calls with the same key_func(*args) only once"""
+    group = _groups.setdefault(name, SingleFlight(name))
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return group.do(key_func(*args, **kwargs), fn, *args, **kwargs)
+        wrapper.single_flight = group
+        return wrapper
+    return decorator
+
+
+def single_flight_stats():
+    """Return coalescing counters for every group"""
+    return {name: group.stats() for name, group in _groups.items()}
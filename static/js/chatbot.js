@@ -155,6 +155,11 @@ class HealthAssistant {
         this.showTypingIndicator();
 
         try {
+            if (this.supportsStreaming()) {
+                await this.streamMessage(userMessage);
+                return;
+            }
+
             const response = await fetch('/api/chat', {
                 method: 'POST',
                 headers: {
@@ -162,8 +167,7 @@ class HealthAssistant {
                 },
                 body: JSON.stringify({
                     message: userMessage,
-                    language: document.documentElement.lang || 'en',
-                    context: this.getConversationContext()
+                    language: document.documentElement.lang || 'en'
                 })
             });
 
@@ -205,10 +209,111 @@ class HealthAssistant {
         }
     }
 
-    getConversationContext() {
-        // Get last few messages for context
-        const recentMessages = this.chatHistory.slice(-5);
-        return recentMessages.map(msg => `${msg.sender}: ${msg.message}`).join('\n');
+    supportsStreaming() {
+        return 'ReadableStream' in window && 'TextDecoder' in window;
+    }
+
+    async streamMessage(userMessage) {
+        const response = await fetch('/api/chat/stream', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
+            body: JSON.stringify({
+                message: userMessage,
+                language: document.documentElement.lang || 'en'
+            })
+        });
+
+        if (!response.ok || !response.body) {
+            throw new Error('Chat stream unavailable');
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let streamingBubble = null;
+        let streamedText = '';
+
+        const handleEvent = (event, data) => {
+            if (event === 'meta') {
+                // Emergency guidance arrives before any model output
+                if (data.emergency_detected && data.guidance) {
+                    this.hideTypingIndicator();
+                    this.addMessage('emergency', data.guidance, true);
+                    this.showTypingIndicator();
+                }
+            } else if (event === 'token') {
+                if (!streamingBubble) {
+                    this.hideTypingIndicator();
+                    streamingBubble = this.createStreamingMessage();
+                }
+                streamedText += data.text;
+                streamingBubble.textContent = streamedText;
+                this.scrollToBottom();
+            } else if (event === 'done') {
+                this.hideTypingIndicator();
+                this.removeStreamingMessage(streamingBubble);
+                this.addMessage('bot', data.response, data.emergency_detected);
+
+                if (MediTranslate.settings.autoSpeak) {
+                    this.speakMessage(data.response);
+                }
+                if (data.suggestions && data.suggestions.length > 0) {
+                    this.showSuggestions(data.suggestions);
+                }
+            } else if (event === 'error') {
+                this.hideTypingIndicator();
+                this.removeStreamingMessage(streamingBubble);
+                this.addMessage('bot', data.response);
+                if (data.needs_api_key) {
+                    this.showAPISetupNotice('Please configure GOOGLE_API_KEY to enable AI health assistance');
+                }
+            }
+        };
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const messages = buffer.split('\n\n');
+            buffer = messages.pop();
+
+            messages.forEach(message => {
+                let event = 'message';
+                let data = '';
+                message.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                if (data) handleEvent(event, JSON.parse(data));
+            });
+        }
+    }
+
+    createStreamingMessage() {
+        const chatMessages = document.getElementById('chatMessages');
+        const messageElement = document.createElement('div');
+        messageElement.className = 'message bot-message streaming-message';
+        messageElement.innerHTML = `
+            <div class="message-avatar">
+                <i class="fas fa-robot"></i>
+            </div>
+            <div class="message-content">
+                <div class="message-bubble">
+                    <p class="mb-1"></p>
+                </div>
+            </div>
+        `;
+        if (chatMessages) chatMessages.appendChild(messageElement);
+        return messageElement.querySelector('p');
+    }
+
+    removeStreamingMessage(bubble) {
+        const messageElement = bubble && bubble.closest('.streaming-message');
+        if (messageElement) messageElement.remove();
     }
 
     showSuggestions(suggestions) {
@@ -258,7 +363,7 @@ class HealthAssistant {
         }
     }
 
-    addMessage(sender, message, isSystemMessage = false) {
+    addMessage(sender, message, isSystemMessage = false, save = true) {
         const chatMessages = document.getElementById('chatMessages');
         if (!chatMessages) return;
 
@@ -310,7 +415,7 @@ class HealthAssistant {
         chatMessages.appendChild(messageElement);
 
         // Save to history (except system messages)
-        if (!isSystemMessage) {
+        if (!isSystemMessage && save) {
             const chatItem = {
                 sender,
                 message,
@@ -515,8 +620,25 @@ class HealthAssistant {
     }
 
     loadChatHistory() {
-        // Load recent chat history for current session display
-        const recentChats = this.chatHistory.slice(-10);
+        // Prefer the server copy of this session, which survives across devices;
+        // fall back to the local copy when offline
+        fetch('/api/chat/history?limit=10')
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (data && data.items && data.items.length) {
+                    const chats = data.items.slice().reverse().flatMap(item => [
+                        { sender: 'user', message: item.user_message },
+                        { sender: 'bot', message: item.bot_response }
+                    ]);
+                    this.renderChatHistory(chats);
+                } else {
+                    this.renderChatHistory(this.chatHistory.slice(-10));
+                }
+            })
+            .catch(() => this.renderChatHistory(this.chatHistory.slice(-10)));
+    }
+
+    renderChatHistory(recentChats) {
         const chatMessages = document.getElementById('chatMessages');
         
         if (chatMessages && recentChats.length > 1) {
@@ -527,10 +649,10 @@ class HealthAssistant {
                 chatMessages.appendChild(welcomeMessage);
             }
             
-            // Add recent messages
+            // Add recent messages without saving them again
             recentChats.forEach(chat => {
                 if (chat.sender && chat.message) {
-                    this.addMessage(chat.sender, chat.message, false);
+                    this.addMessage(chat.sender, chat.message, false, false);
                 }
             });
         }
@@ -234,14 +234,18 @@ class PrescriptionScanner {
             // Create FormData
             const formData = new FormData();
             formData.append('image', blob, 'prescription.jpg');
+            formData.append('async', '1');
 
-            // Send to server
+            // Queue the scan, then poll until the job finishes
             const response = await fetch('/api/scan-prescription', {
                 method: 'POST',
                 body: formData
             });
 
-            const data = await response.json();
+            let data = await response.json();
+            if (response.status === 202) {
+                data = await this.waitForScanJob(data.status_url);
+            }
 
             if (response.ok && !data.error) {
                 this.displayScanResults(data);
@@ -260,6 +264,33 @@ class PrescriptionScanner {
         }
     }
 
+    async waitForScanJob(statusUrl, timeoutMs = 180000) {
+        const deadline = Date.now() + timeoutMs;
+
+        while (Date.now() < deadline) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+
+            const response = await fetch(statusUrl);
+            const job = await response.json();
+
+            if (!response.ok) {
+                throw new Error(job.error || 'Scan job lookup failed');
+            }
+            if (job.status === 'done') {
+                return job.result;
+            }
+            if (job.status === 'failed') {
+                return {
+                    error: job.error || 'Scanning failed',
+                    needs_setup: job.needs_setup,
+                    message: job.message
+                };
+            }
+        }
+
+        throw new Error('Scanning timed out');
+    }
+
     showAPISetupNotice(message) {
         const noticeHtml = `
             <div class="alert alert-warning alert-dismissible fade show" role="alert">
@@ -4,7 +4,7 @@ class MedicationReminders {
     constructor() {
         this.reminders = JSON.parse(localStorage.getItem('medicationReminders') || '[]');
         this.todaysDoses = [];
-        this.notifications = [];
+        this.reminderStream = null;
         this.init();
     }
 
@@ -15,7 +15,8 @@ class MedicationReminders {
         this.loadTodaysSchedule();
         this.checkPendingReminders();
         this.setupNotifications();
-        this.scheduleNotifications();
+        this.syncRemindersToServer();
+        this.connectReminderStream();
     }
 
     setupEventListeners() {
@@ -247,8 +248,37 @@ class MedicationReminders {
         this.reminders.push(reminder);
         localStorage.setItem('medicationReminders', JSON.stringify(this.reminders));
 
-        // Schedule notifications for this reminder
-        this.scheduleReminderNotifications(reminder);
+        // The server schedules and delivers the notifications
+        this.uploadReminder(reminder);
+    }
+
+    uploadReminder(reminder) {
+        return fetch('/api/reminders', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                medication_name: reminder.medication_name,
+                dosage: reminder.dosage,
+                frequency: reminder.frequency || 'daily',
+                time_slots: reminder.time_slots,
+                notes: reminder.notes || ''
+            })
+        })
+            .then(response => response.ok ? response.json() : null)
+            .then(data => {
+                if (data && data.reminder_id) {
+                    reminder.server_id = data.reminder_id;
+                    localStorage.setItem('medicationReminders', JSON.stringify(this.reminders));
+                }
+            })
+            .catch(error => console.log('Reminder upload failed, will retry on next visit:', error));
+    }
+
+    syncRemindersToServer() {
+        // Reminders saved before server delivery existed, or while offline
+        this.reminders
+            .filter(reminder => !reminder.server_id && reminder.time_slots && reminder.time_slots.length)
+            .forEach(reminder => this.uploadReminder(reminder));
     }
 
     clearForm() {
@@ -481,6 +511,12 @@ class MedicationReminders {
             }
         }
 
+        const reminder = this.reminders.find(r => r.id === reminderId);
+        if (reminder && reminder.server_id) {
+            fetch(`/api/reminders/${reminder.server_id}`, { method: 'DELETE' })
+                .catch(error => console.log('Reminder delete failed:', error));
+        }
+
         this.reminders = this.reminders.filter(r => r.id !== reminderId);
         localStorage.setItem('medicationReminders', JSON.stringify(this.reminders));
 
@@ -510,40 +546,59 @@ class MedicationReminders {
         }
     }
 
-    scheduleNotifications() {
-        // Clear existing notifications
-        this.notifications.forEach(notification => clearTimeout(notification));
-        this.notifications = [];
+    connectReminderStream() {
+        // Due doses are pushed by the server; EventSource reconnects on its own
+        if (!('EventSource' in window)) return;
 
-        // Schedule notifications for today
-        this.reminders.forEach(reminder => {
-            this.scheduleReminderNotifications(reminder);
+        this.reminderStream = new EventSource('/api/reminders/stream');
+        this.reminderStream.addEventListener('reminder', (event) => {
+            // Same notification tag as the Web Push message, so the browser shows one
+            const dose = JSON.parse(event.data);
+            dose.id = dose.reminder_id;
+            this.showReminderAlert(dose);
+            this.sendNotification(dose, dose.time);
+        });
+        this.reminderStream.addEventListener('ready', (event) => {
+            // Sent again on every reconnect; one subscription per page is enough
+            if (JSON.parse(event.data).push_available && !this.pushSubscribed) {
+                this.pushSubscribed = true;
+                this.subscribeToPush();
+            }
         });
     }
 
-    scheduleReminderNotifications(reminder) {
-        if (!reminder.time_slots) return;
-
-        reminder.time_slots.forEach(time => {
-            const [hours, minutes] = time.split(':').map(Number);
-            const now = new Date();
-            const scheduleTime = new Date();
-            scheduleTime.setHours(hours, minutes, 0, 0);
-
-            // If time has passed today, schedule for tomorrow
-            if (scheduleTime <= now) {
-                scheduleTime.setDate(scheduleTime.getDate() + 1);
+    async subscribeToPush() {
+        // Web Push reaches the device even when no tab is open
+        if (!('serviceWorker' in navigator) || !('PushManager' in window)) return;
+        if (!('Notification' in window) || Notification.permission !== 'granted') return;
+
+        try {
+            const registration = await navigator.serviceWorker.ready;
+            let subscription = await registration.pushManager.getSubscription();
+            if (!subscription) {
+                const response = await fetch('/api/push/public-key');
+                if (!response.ok) return;
+                const { public_key } = await response.json();
+                subscription = await registration.pushManager.subscribe({
+                    userVisibleOnly: true,
+                    applicationServerKey: this.urlBase64ToUint8Array(public_key)
+                });
             }
 
-            const delay = scheduleTime.getTime() - now.getTime();
-
-            const timeoutId = setTimeout(() => {
-                this.showReminderAlert(reminder);
-                this.sendNotification(reminder, time);
-            }, delay);
+            await fetch('/api/push/subscribe', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(subscription.toJSON())
+            });
+        } catch (error) {
+            console.log('Push subscription failed:', error);
+        }
+    }
 
-            this.notifications.push(timeoutId);
-        });
+    urlBase64ToUint8Array(value) {
+        const padding = '='.repeat((4 - value.length % 4) % 4);
+        const raw = atob((value + padding).replace(/-/g, '+').replace(/_/g, '/'));
+        return Uint8Array.from(raw, char => char.charCodeAt(0));
     }
 
     showReminderAlert(reminder) {
@@ -1,24 +1,14 @@
 // MediTranslate+ Service Worker for PWA functionality
 
-const CACHE_NAME = 'meditranslate-v2.0.0';
-const STATIC_CACHE = 'meditranslate-static-v2.0.0';
+// ASSET_VERSION and PRECACHE_URLS are prepended by the /sw.js route from the
+// static asset manifest, so any changed asset renames the static cache.
+const ASSET_VERSION = self.ASSET_VERSION || 'dev';
+const STATIC_CACHE = `meditranslate-static-${ASSET_VERSION}`;
 const DYNAMIC_CACHE = 'meditranslate-dynamic-v2.0.0';
 
 // Files to cache for offline functionality
 const STATIC_FILES = [
-    '/',
-    '/static/css/style.css',
-    '/static/css/themes.css',
-    '/static/css/animations.css',
-    '/static/js/app.js',
-    '/static/js/theme.js',
-    '/static/js/animations.js',
-    '/static/js/translator.js',
-    '/static/js/chatbot.js',
-    '/static/js/prescription.js',
-    '/static/js/reminders.js',
-    '/static/js/settings.js',
-    '/static/manifest.json',
+    ...(self.PRECACHE_URLS || ['/']),
     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/css/bootstrap.min.css',
     'https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.4.0/css/all.min.css',
     'https://cdn.jsdelivr.net/npm/bootstrap@5.3.0/dist/js/bootstrap.bundle.min.js'
@@ -453,14 +443,21 @@ self.addEventListener('push', event => {
         ]
     };
     
+    let title = 'MediTranslate+ Reminder';
     if (event.data) {
         const notificationData = event.data.json();
+        title = notificationData.title || title;
         options.body = notificationData.body || options.body;
+        // Matches the tag of the in-page notification, so a dose shows once
+        if (notificationData.tag) {
+            options.tag = notificationData.tag;
+            options.requireInteraction = true;
+        }
         options.data = { ...options.data, ...notificationData };
     }
     
     event.waitUntil(
-        self.registration.showNotification('MediTranslate+ Reminder', options)
+        self.registration.showNotification(title, options)
     );
 });
 
@@ -0,0 +1,187 @@
+import os
+import json
+import hashlib
+import logging
+import mimetypes
+import threading
+from collections import namedtuple
+
+from flask import Response, request, url_for
+
+from compression import is_compressible, supported_encodings, choose_encoding, compress, COMPRESS_MIN_SIZE
+
+# Static asset configuration
+STATIC_FINGERPRINT = os.environ.get("STATIC_FINGERPRINT", "1").lower() in ('1', 'true', 'yes', 'on')
+STATIC_MAX_AGE = int(os.environ.get("STATIC_MAX_AGE", str(365 * 24 * 3600)))
+
+# Files the service worker caches on install
+PRECACHE_EXTENSIONS = ('.css', '.js', '.json')
+SERVICE_WORKER = 'sw.js'
+
+Asset = namedtuple('Asset', ['filename', 'fingerprinted', 'mimetype', 'digest', 'data', 'variants'])
+
+
+def fingerprint(filename, digest):
+    """css/style.css -> css/style.<digest>.css"""
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest}{ext}"
+
+
+class StaticAssets:
+    """
+    Fingerprinted, precompressed static files served from memory.
+
+    At startup every file under the static folder is read once, named after
+    a hash of its content (css/style.<hash>.css) and compressed with every
+    supported encoding at the highest level. url_for('static', ...) emits the
+    fingerprinted name, which is served with a far-future immutable
+    Cache-Control; the plain name still works and is revalidated. The
+    service worker at /sw.js gets its precache list and cache name from the
+    same manifest, so a deploy that changes any asset updates it.
+
+    Assets are read at startup; restart the app after editing static files.
+    """
+
+    def __init__(self, enabled=STATIC_FINGERPRINT, max_age=STATIC_MAX_AGE):
+        self.enabled = enabled
+        self.max_age = max_age
+        self.manifest = {}
+        self.version = None
+        self._assets = {}
+        self._app = None
+        self._lock = threading.Lock()
+        self.served = 0
+        self.served_compressed = 0
+        self.not_modified = 0
+
+    def init_app(self, app):
+        """Build the manifest and take over the app's static endpoint"""
+        self._app = app
+        self.build(app.static_folder)
+        app.url_defaults(self._url_defaults)
+        app.view_functions['static'] = self.send_static
+        app.add_url_rule('/' + SERVICE_WORKER, 'service_worker', self.service_worker)
+
+    def build(self, folder):
+        """Read, hash and precompress every file under folder"""
+        manifest = {}
+        assets = {}
+        for directory, _, files in os.walk(folder):
+            for name in sorted(files):
+                path = os.path.join(directory, name)
+                filename = os.path.relpath(path, folder).replace(os.sep, '/')
+                try:
+                    with open(path, 'rb') as handle:
+                        data = handle.read()
+                except OSError as e:
+                    logging.warning(f"Skipping static file {filename}: {str(e)}")
+                    continue
+
+                mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                digest = hashlib.sha256(data).hexdigest()[:12]
+                variants = {}
+                if is_compressible(mimetype) and len(data) >= COMPRESS_MIN_SIZE:
+                    for encoding in supported_encodings():
+                        variants[encoding] = compress(data, encoding, level=11 if encoding == 'br' else 9)
+
+                asset = Asset(filename, fingerprint(filename, digest), mimetype, digest, data, variants)
+                manifest[filename] = asset.fingerprinted
+                assets[filename] = asset
+                assets[asset.fingerprinted] = asset
+
+        with self._lock:
+            self.manifest = manifest
+            self._assets = assets
+            self.version = hashlib.sha256(json.dumps(manifest, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+        logging.info(f"Static assets: {len(manifest)} files, version {self.version}")
+
+    def url(self, filename):
+        """Fingerprinted name of a static file, or the name itself when unknown"""
+        if not self.enabled:
+            return filename
+        return self.manifest.get(filename, filename)
+
+    def precache_urls(self):
+        """URLs the service worker caches on install: the home page and the fingerprinted assets"""
+        names = sorted(filename for filename in self.manifest
+                       if filename.endswith(PRECACHE_EXTENSIONS) and filename != SERVICE_WORKER)
+        return [url_for('home')] + [url_for('static', filename=filename) for filename in names]
+
+    def send_static(self, filename):
+        """View for /static/<filename>"""
+        asset = self._assets.get(filename)
+        if asset is None:
+            # Added after startup, or not a regular file
+            return self._app.send_static_file(filename)
+
+        immutable = filename == asset.fingerprinted
+        encoding = choose_encoding(list(asset.variants)) if asset.variants else None
+        response = Response(asset.variants[encoding] if encoding else asset.data, mimetype=asset.mimetype)
+        if asset.variants:
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        # Each encoding is a different representation with its own tag
+        response.set_etag(f"{asset.digest}-{encoding}" if encoding else asset.digest)
+
+        response.cache_control.public = True
+        if immutable:
+            response.cache_control.max_age = self.max_age
+            response.cache_control.immutable = True
+        else:
+            response.cache_control.no_cache = True
+        return self._finish(response, encoding)
+
+    def service_worker(self):
+        """Serve sw.js from the site root with the asset manifest prepended"""
+        asset = self._assets.get(SERVICE_WORKER)
+        if asset is None:
+            return Response('Service worker not found', status=404, mimetype='text/plain')
+
+        prelude = (f"// Generated from the static asset manifest\n"
+                   f"self.ASSET_VERSION = {json.dumps(self.version)};\n"
+                   f"self.PRECACHE_URLS = {json.dumps(self.precache_urls())};\n\n")
+        body = prelude.encode('utf-8') + asset.data
+        response = Response(body, mimetype='application/javascript')
+        response.set_etag(hashlib.sha256(body).hexdigest()[:16])
+        # Browsers must pick up a new manifest on their next update check
+        response.cache_control.no_cache = True
+        response.headers['Service-Worker-Allowed'] = '/'
+        return self._finish(response, None)
+
+    def stats(self):
+        """Return manifest size and serving counters"""
+        with self._lock:
+            assets = list(self.manifest)
+            original = sum(len(self._assets[name].data) for name in assets)
+            smallest = sum(min([len(self._assets[name].data)] +
+                               [len(data) for data in self._assets[name].variants.values()])
+                           for name in assets)
+            return {
+                'fingerprinted': self.enabled,
+                'version': self.version,
+                'assets': len(assets),
+                'bytes': original,
+                'compressed_bytes': smallest,
+                'served': self.served,
+                'served_compressed': self.served_compressed,
+                'not_modified': self.not_modified
+            }
+
+    def _url_defaults(self, endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = self.url(values['filename'])
+
+    def _finish(self, response, encoding):
+        response.make_conditional(request)
+        with self._lock:
+            if response.status_code == 304:
+                self.not_modified += 1
+            else:
+                self.served += 1
+                if encoding:
+                    self.served_compressed += 1
+        return response
+
+
+static_assets = StaticAssets()
@@ -0,0 +1,216 @@
+import json
+import logging
+import re
+from collections import namedtuple
+
+Span = namedtuple('Span', ['kind', 'text', 'start', 'end', 'label'])
+
+# Named alternatives of the combined pattern, in priority order. Alternatives
+# earlier in the list win when two could start at the same position. The
+# patterns are matched against an ASCII-lowercased copy of the text, so they
+# are written in lowercase and compiled without re.IGNORECASE.
+_PATTERNS = [
+    ('drug_form', r'(?:tab|tablet|cap|capsule|syrup|injection)\s+(?P<drug_form_name>[a-z]+(?:\s+[a-z]+)?)\b'),
+    ('frequency', r'(?:(?:once|twice|thrice|(?:three|four)\s+times)\s+(?:a\s+)?(?:day|daily)'
+                  r'|every\s+\d+\s*(?:hours?|hrs?)'
+                  r'|(?:before|after)\s+(?:meals?|food|breakfast|lunch|dinner)'
+                  r'|at\s+bedtime'
+                  r'|[01]\s*-\s*[01]\s*-\s*[01]'
+                  r'|od|bd|bid|tds|tid|qid|qds|hs|sos|prn|daily|weekly)\b'),
+    ('dose_ratio', r'\d+/\d+\s*(?P<dose_ratio_unit>mg|ml|g|mcg)\b'),
+    ('dose', r'\d+\s*(?P<dose_unit>mg|ml|g|mcg|units?)\b'),
+    ('drug_suffix', r'[a-z]+(?:cillin|mycin|pril|sartan|olol|pine|zide|statin)\b'),
+]
+
+# Suggestion phrases run to the end of the sentence, so in the combined pass
+# they would swallow the drugs and doses inside them. Each is scanned on its
+# own instead, without a leading word boundary, as the original patterns were.
+_SUGGESTION_PATTERNS = [
+    ('suggestion_try', r'try\s+(?P<text>[^.]+)'),
+    ('suggestion_consider', r'consider\s+(?P<text>[^.]+)'),
+    ('suggestion_should', r'you\s+(?:should|could|might)\s+(?P<text>[^.]+)'),
+]
+
+_LOWERCASE_ASCII = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ', 'abcdefghijklmnopqrstuvwxyz')
+
+_KINDS = {
+    'suggestion_try': 'suggestion',
+    'suggestion_consider': 'suggestion',
+    'suggestion_should': 'suggestion',
+    'drug_form': 'drug',
+    'drug_suffix': 'drug',
+    'frequency': 'frequency',
+    'dose_ratio': 'dose',
+    'dose': 'dose',
+}
+
+# Group holding the span text when it is narrower than the whole match
+_VALUE_GROUPS = {
+    'drug_form': 'drug_form_name',
+}
+
+# A match can contain shorter terms the original per-pattern scans also
+# reported (the drug in "Tab Amoxicillin Clavulanate", the "2 ml" in
+# "1/2 ml"); those patterns are rerun inside the match
+_NESTED = {
+    'drug_form': ('drug_suffix', 'frequency'),
+    'dose_ratio': ('dose',),
+}
+
+_UNIT_GROUPS = {
+    'dose_ratio': 'dose_ratio_unit',
+    'dose': 'dose_unit',
+}
+
+
+class ExtractionEngine:
+    """
+    Single-pass extractor for prescription OCR text and chatbot responses.
+
+    The drug, dose and frequency patterns are compiled once into one
+    alternation, so the text is scanned a single time for them. Suggestion
+    phrases, which overlap those matches, are scanned separately. Each match
+    is emitted as a typed Span (drug, dose, unit, frequency or suggestion).
+    """
+
+    def __init__(self, patterns=_PATTERNS, suggestion_patterns=_SUGGESTION_PATTERNS):
+        # Every alternative starts at a word boundary, so the shared \b is
+        # hoisted out of the alternation
+        alternatives = '|'.join(f'(?P<{name}>{regex})' for name, regex in patterns)
+        self.pattern = re.compile(rf'\b(?:{alternatives})')
+        self.suggestion_patterns = [(name, re.compile(regex)) for name, regex in suggestion_patterns]
+        regexes = dict(patterns)
+        self.nested_patterns = {label: [re.compile(rf'\b(?P<{name}>{regexes[name]})') for name in names]
+                                for label, names in _NESTED.items() if label in regexes}
+
+    def extract(self, text, suggestions=True):
+        """Return the typed spans found in text, in order of appearance"""
+        if not text:
+            return []
+        # Lowercasing ASCII keeps offsets aligned with the original text
+        lowered = text.translate(_LOWERCASE_ASCII)
+        spans = self._extract_terms(text, lowered)
+        if suggestions:
+            for label, pattern in self.suggestion_patterns:
+                spans.extend(self._suggestions(text, lowered, label, pattern))
+        spans.sort(key=lambda span: span.start)
+        return spans
+
+    def suggestions(self, text, per_pattern=None):
+        """Suggestion spans grouped by phrase, at most per_pattern of each"""
+        if not text:
+            return []
+        lowered = text.translate(_LOWERCASE_ASCII)
+        spans = []
+        for label, pattern in self.suggestion_patterns:
+            spans.extend(self._suggestions(text, lowered, label, pattern)[:per_pattern])
+        return spans
+
+    def _suggestions(self, text, lowered, label, pattern):
+        return [Span('suggestion', text[match.start('text'):match.end('text')],
+                     match.start('text'), match.end('text'), label)
+                for match in pattern.finditer(lowered)]
+
+    def _extract_terms(self, text, lowered):
+        spans = []
+        for match in self.pattern.finditer(lowered):
+            self._add_match(spans, text, match)
+            for pattern in self.nested_patterns.get(match.lastgroup, ()):
+                for nested in pattern.finditer(lowered, match.start() + 1, match.end()):
+                    self._add_match(spans, text, nested)
+        return spans
+
+    def _add_match(self, spans, text, match):
+        label = match.lastgroup
+        value_group = _VALUE_GROUPS.get(label)
+        group = value_group or label
+        start, end = match.span(group)
+        spans.append(Span(_KINDS[label], text[start:end], start, end, label))
+
+        unit_group = _UNIT_GROUPS.get(label)
+        if unit_group:
+            start, end = match.span(unit_group)
+            spans.append(Span('unit', text[start:end], start, end, label))
+
+    def extract_grouped(self, text, suggestions=True):
+        """Return span texts grouped by kind"""
+        grouped = {'drug': [], 'dose': [], 'unit': [], 'frequency': [], 'suggestion': []}
+        for span in self.extract(text, suggestions):
+            grouped[span.kind].append(span.text)
+        return grouped
+
+    def extract_batch(self, texts, suggestions=True):
+        """Extract grouped spans for many texts"""
+        extract_grouped = self.extract_grouped
+        return [extract_grouped(text, suggestions) for text in texts]
+
+
+extraction_engine = ExtractionEngine()
+
+
+def extract_medications(text):
+    """Unique medication names"""
+    return list({span.text for span in extraction_engine.extract(text, False) if span.kind == 'drug'})
+
+
+def extract_dosages(text):
+    """Unique dosages with units"""
+    return list({span.text for span in extraction_engine.extract(text, False) if span.kind == 'dose'})
+
+
+def extract_frequencies(text):
+    """Dosing frequencies in order of appearance"""
+    return [span.text for span in extraction_engine.extract(text, False) if span.kind == 'frequency']
+
+
+def extract_suggestions(text, per_pattern=3):
+    """Actionable suggestions, at most per_pattern for each suggestion phrase"""
+    return [span.text.strip() for span in extraction_engine.suggestions(text, per_pattern)]
+
+
+def backfill_prescription_scans(batch_size=500, overwrite=False):
+    """
+    Re-run extraction over stored PrescriptionScan rows and fill in the
+    medications/dosages columns. Rows are read in id order in fixed-size
+    batches and each batch is written back in one commit. Requires an app
+    context. Returns the number of rows updated.
+    """
+    from sqlalchemy import update
+    from app import db
+    from models import PrescriptionScan
+
+    updated = 0
+    last_id = 0
+    while True:
+        rows = (db.session.query(PrescriptionScan.id, PrescriptionScan.extracted_text,
+                                 PrescriptionScan.medications, PrescriptionScan.dosages)
+                .filter(PrescriptionScan.id > last_id)
+                .order_by(PrescriptionScan.id)
+                .limit(batch_size)
+                .all())
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        results = extraction_engine.extract_batch((row.extracted_text for row in rows), suggestions=False)
+        changes = []
+        for row, result in zip(rows, results):
+            if not overwrite and row.medications not in (None, '', '[]') and row.dosages not in (None, '', '[]'):
+                continue
+            changes.append({
+                'id': row.id,
+                'medications': json.dumps(sorted(set(result['drug']))),
+                'dosages': json.dumps(sorted(set(result['dose'])))
+            })
+
+        if changes:
+            try:
+                db.session.execute(update(PrescriptionScan), changes)
+                db.session.commit()
+                updated += len(changes)
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Prescription backfill error: {str(e)}")
+                raise
+
+    return updated
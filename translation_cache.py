@@ -0,0 +1,161 @@
+import os
+import hashlib
+import logging
+import threading
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from time import monotonic
+
+# Translation cache configuration
+TRANSLATION_CACHE_SIZE = int(os.environ.get("TRANSLATION_CACHE_SIZE", "2048"))
+TRANSLATION_CACHE_TTL = int(os.environ.get("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600)))
+
+
+def normalize_text(text):
+    """Normalize text so trivially different inputs share a cache entry"""
+    text = unicodedata.normalize('NFC', text or '')
+    return ' '.join(text.split())
+
+
+def hash_text(text):
+    """Stable hash of the normalized, casefolded text, used to index TranslationHistory"""
+    return hashlib.sha256(normalize_text(text).casefold().encode('utf-8')).hexdigest()
+
+
+def make_cache_key(text, source_lang, target_lang):
+    """Build the cache key for a text and language pair"""
+    return (normalize_text(text).casefold(), source_lang, target_lang)
+
+
+class TranslationCache:
+    """
+    Two-tier translation cache.
+
+    The first tier is a bounded in-process LRU. The second tier reuses the
+    TranslationHistory table, so translations saved by any worker (or before a
+    restart) can be served without another Gemini round trip.
+    """
+
+    def __init__(self, max_entries=TRANSLATION_CACHE_SIZE, ttl_seconds=TRANSLATION_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._app = None
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def init_app(self, app):
+        """Enable the persistent tier for the given Flask app"""
+        self._app = app
+
+    def get(self, text, source_lang, target_lang):
+        """Return a cached translation result or None"""
+        key = make_cache_key(text, source_lang, target_lang)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, result = entry
+                if monotonic() - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self.memory_hits += 1
+                    return dict(result, cached=True)
+                del self._entries[key]
+                self.expirations += 1
+
+        result = self._get_persistent(text, source_lang, target_lang)
+        if result is not None:
+            self._store(key, result)
+            with self._lock:
+                self.persistent_hits += 1
+            return dict(result, cached=True)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, text, source_lang, target_lang, result):
+        """Store a successful translation result in the in-process tier"""
+        if not result or 'error' in result:
+            return
+        self._store(make_cache_key(text, source_lang, target_lang), result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Return hit/miss counters for the cache"""
+        with self._lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'memory_hits': self.memory_hits,
+                'persistent_hits': self.persistent_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0
+            }
+
+    def _store(self, key, result):
+        entry = {k: v for k, v in result.items() if k != 'cached'}
+        with self._lock:
+            self._entries[key] = (monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _get_persistent(self, text, source_lang, target_lang):
+        """Look the translation up in TranslationHistory"""
+        if self._app is None:
+            return None
+
+        try:
+            from flask import has_app_context
+            if has_app_context():
+                return self._query_history(text, source_lang, target_lang)
+            with self._app.app_context():
+                return self._query_history(text, source_lang, target_lang)
+        except Exception as e:
+            logging.warning(f"Translation cache lookup failed: {str(e)}")
+            return None
+
+    def _query_history(self, text, source_lang, target_lang):
+        from models import TranslationHistory
+        from ai_services import LANGUAGE_MAPPING
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+
+        # Served by the (source, target, text_hash, timestamp) index
+        row = (TranslationHistory.query
+               .filter(TranslationHistory.source_language == source_lang,
+                       TranslationHistory.target_language == target_lang,
+                       TranslationHistory.text_hash == hash_text(text),
+                       TranslationHistory.timestamp >= cutoff)
+               .order_by(TranslationHistory.timestamp.desc())
+               .first())
+        if row is None:
+            return None
+
+        return {
+            'translated_text': row.translated_text,
+            'source_lang': source_lang,
+            'target_lang': target_lang,
+            'source_name': LANGUAGE_MAPPING.get(source_lang, 'English'),
+            'target_name': LANGUAGE_MAPPING.get(target_lang, 'Hindi'),
+            'confidence': 'high',
+            'timestamp': row.timestamp.isoformat() if row.timestamp else datetime.now().isoformat()
+        }
+
+
+translation_cache = TranslationCache()